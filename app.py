@@ -1,10 +1,15 @@
 import streamlit as st
-import asyncio
-from langgraph_implementation.personal_assistant import Sidekick
+from langgraph_implementation.resource_manager import get_resource_manager
+from langgraph_implementation.sandbox_index import get_sandbox_index
+from langgraph_implementation.prefetch import get_prefetcher
+from langgraph_implementation.tool_slo import get_slos
+from langgraph_implementation import metrics
+from langgraph_implementation.profiler import list_profiles, read_summary
+from langgraph_implementation.session_store import export_session, restore_session, snapshot_path
 import uuid
 from datetime import datetime
 import time
-import json
+import io
 import os
 import zipfile
 from pathlib import Path
@@ -18,8 +23,11 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for modern styling
-st.markdown("""
+# Static content is built once per process rather than on every rerun
+@st.cache_data
+def load_app_css():
+    """Custom CSS for modern styling"""
+    return """
 <style>
     .main-header {
         background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
@@ -119,7 +127,9 @@ st.markdown("""
         gap: 0.5rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(load_app_css(), unsafe_allow_html=True)
 
 # Initialize session state
 if 'sidekick' not in st.session_state:
@@ -193,6 +203,35 @@ def read_file_content(file_path):
                 content = f.read()
                 return f"Binary file ({len(content)} bytes)\n\nHex preview:\n{content[:200].hex()}"
 
+def load_file_content(file_path):
+    """File content for the viewer, kept per session; when a file has only been
+    appended to since it was last shown, just the new bytes are read"""
+    cache = st.session_state.setdefault('file_contents', {})
+    cached = cache.get(file_path)
+    generation = get_sandbox_index().generation(file_path)
+    size = os.path.getsize(file_path)
+    if cached and generation is not None and cached['generation'] == generation and size >= cached['size']:
+        if size == cached['size']:
+            return cached['content']
+        with open(file_path, 'rb') as f:
+            f.seek(cached['size'])
+            tail = f.read(size - cached['size'])
+        try:
+            cached['content'] += tail.decode('utf-8')
+            cached['size'] = size
+            return cached['content']
+        except UnicodeDecodeError:
+            pass
+    
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read().decode('utf-8')
+    except UnicodeDecodeError:
+        # Not UTF-8: shown with the fallbacks below and never extended in place
+        content, generation = read_file_content(file_path), None
+    cache[file_path] = {'generation': generation, 'size': size, 'content': content}
+    return content
+
 def create_zip_archive(files):
     """Create a zip archive of selected files"""
     sandbox_path = Path("sandbox")
@@ -206,42 +245,30 @@ def create_zip_archive(files):
     
     return zip_path
 
-# Async function wrappers
-import threading
-import concurrent.futures
-
+# Session lifecycle goes through the process-wide resource manager, which sets
+# up and runs every Sidekick on one shared background loop (so the browser it
+# launches keeps a live owning loop) and evicts idle sessions
 def setup_sidekick_sync():
-    """Initialize the Personal assistant in a separate thread"""
-    def _setup():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            sidekick = Sidekick()
-            result = loop.run_until_complete(sidekick.setup())
-            return sidekick
-        finally:
-            loop.close()
-    
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(_setup)
-        return future.result()
+    """Initialize the Personal assistant on the shared background loop"""
+    return get_resource_manager().create(st.session_state.session_id)
 
 def process_message_sync(sidekick, message, success_criteria, history):
-    """Process a message through the assistant in a separate thread"""
-    def _process():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(
-                sidekick.run_superstep(message, success_criteria, history)
-            )
-            return result
-        finally:
-            loop.close()
-    
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(_process)
-        return future.result()
+    """Process a message through the assistant on the shared background loop"""
+    return get_resource_manager().run_turn(st.session_state.session_id, message, success_criteria, history)
+
+# A session evicted while idle is dropped here; its snapshot, if one was
+# written, is restored when the assistant is initialized again
+if st.session_state.setup_complete:
+    manager = get_resource_manager()
+    evicted, evicted_snapshot = manager.take_eviction(st.session_state.session_id)
+    if evicted:
+        st.session_state.sidekick = None
+        st.session_state.setup_complete = False
+        if evicted_snapshot is not None:
+            st.session_state.pending_snapshot = Path(evicted_snapshot).read_bytes()
+        st.info("This session was idle and its resources were released. Initialize the assistant to resume it.")
+    else:
+        manager.touch(st.session_state.session_id, st.session_state.chat_history)
 
 # Main header
 st.markdown("""
@@ -251,92 +278,65 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Create tabs for different sections
-tab1, tab2, tab3 = st.tabs(["💬 Chat Interface", "📁 File Manager", "🛠️ Tools & Info"])
-
-with tab1:
-    # Sidebar
-    with st.sidebar:
-        st.header("🎛️ Control Panel")
-        
-        # Status indicator
-        status = "Active" if st.session_state.setup_complete else "Inactive"
-        status_class = "status-active" if st.session_state.setup_complete else "status-inactive"
-        st.markdown(f'<span class="status-indicator {status_class}">Status: {status}</span>', 
-                    unsafe_allow_html=True)
-        
-        st.markdown("---")
-        
-        # Session info
-        st.subheader("📊 Session Info")
-        st.text(f"Session ID: {st.session_state.session_id[:8]}...")
-        st.text(f"Messages: {len(st.session_state.chat_history)}")
-        st.text(f"Started: {datetime.now().strftime('%H:%M:%S')}")
-        
-        st.markdown("---")
-        
-        # Controls
-        if st.button("🔄 Reset Session", type="secondary", key="reset_session_sidebar"):
-            if st.session_state.sidekick:
-                st.session_state.sidekick.cleanup()
-            st.session_state.sidekick = None
-            st.session_state.chat_history = []
-            st.session_state.session_id = str(uuid.uuid4())
-            st.session_state.setup_complete = False
-            st.session_state.clear_inputs = False
-            st.rerun()
-        
-        if st.button("🚀 Initialize Personal Assistant", type="primary", key="init_assistant_sidebar"):
-            if not st.session_state.setup_complete:
-                with st.spinner("Setting up Personal Assistant..."):
-                    try:
-                        st.session_state.sidekick = setup_sidekick_sync()
-                        st.session_state.setup_complete = True
-                        st.success("Personal Assistant initialized successfully!")
-                        st.rerun()
-                    except Exception as e:
-                        st.error(f"Failed to initialize: {str(e)}")
-                        st.error("Please ensure Playwright is properly installed: `playwright install chromium`")
-        
-        st.markdown("---")
-        
-        # Quick actions
-        st.subheader("⚡ Quick Actions")
-        if st.button("📋 Clear Chat", key="clear_chat_sidebar"):
-            st.session_state.chat_history = []
-            st.rerun()
-        
-        if st.button("💾 Export Chat", key="export_chat_sidebar"):
-            if st.session_state.chat_history:
-                chat_data = {
-                    "session_id": st.session_state.session_id,
-                    "timestamp": datetime.now().isoformat(),
-                    "messages": st.session_state.chat_history
-                }
-                st.download_button(
-                    label="Download Chat History",
-                    data=json.dumps(chat_data, indent=2),
-                    file_name=f"sidekick_chat_{st.session_state.session_id[:8]}.json",
-                    mime="application/json",
-                    key="download_chat_history"
-                )
-        
-        if st.button("🔄 Refresh Files", key="refresh_files_sidebar"):
-            st.session_state.refresh_files = True
-            st.rerun()
+def fragment(func):
+    """Run ``func`` as a Streamlit fragment where supported, so its widgets rerun only it"""
+    return st.fragment(func) if hasattr(st, 'fragment') else func
 
-    # Chat interface
+def list_sandbox_files():
+    """Sandbox listing, rescanned only when refresh_files is set"""
+    if st.session_state.refresh_files or 'sandbox_files' not in st.session_state:
+        st.session_state.sandbox_files = get_sandbox_files()
+        st.session_state.refresh_files = False
+    return st.session_state.sandbox_files
+
+@st.cache_data
+def load_tools_info():
+    """Descriptions shown on the Tools & Info view"""
+    return [
+        {
+            "name": "🌐 Web Browser",
+            "description": "Navigate websites, click elements, fill forms, and extract information from web pages using Playwright automation.",
+            "capabilities": ["Page navigation", "Element interaction", "Data extraction", "Form filling"]
+        },
+        {
+            "name": "🔍 Web Search",
+            "description": "Search the internet using Google's search API to find current information and answers.",
+            "capabilities": ["Real-time search", "Current events", "Fact checking", "Research"]
+        },
+        {
+            "name": "🐍 Python REPL",
+            "description": "Execute Python code for calculations, data analysis, and complex problem solving.",
+            "capabilities": ["Mathematical computations", "Data analysis", "Visualization", "Algorithm implementation"]
+        },
+        {
+            "name": "📁 File Management",
+            "description": "Create, read, write, search, and manage files in the sandbox directory.",
+            "capabilities": ["File creation", "Content editing", "Directory management", "File operations", "Full-text search"]
+        },
+        {
+            "name": "📚 Wikipedia",
+            "description": "Query Wikipedia for encyclopedic information and knowledge.",
+            "capabilities": ["Knowledge lookup", "Research", "Fact verification", "Educational content"]
+        },
+        {
+            "name": "📱 Push Notifications",
+            "description": "Send push notifications to your devices using Pushover service.",
+            "capabilities": ["Alert notifications", "Task completion alerts", "Status updates"]
+        }
+    ]
+
+def render_chat():
     col1, col2 = st.columns([3, 2])
 
     with col1:
         st.header("💬 Chat Interface")
-        
+
         # Input area
         with st.container():
             # Use keys and handle clear state
             message_key = "message_input"
             criteria_key = "criteria_input"
-            
+
             # Clear inputs if flag is set
             if st.session_state.clear_inputs:
                 if message_key in st.session_state:
@@ -344,7 +344,7 @@ with tab1:
                 if criteria_key in st.session_state:
                     del st.session_state[criteria_key]
                 st.session_state.clear_inputs = False
-            
+
             message = st.text_area(
                 "Your Request",
                 placeholder="Ask me anything! I can browse the web, run Python code, manage files, and more...",
@@ -352,7 +352,7 @@ with tab1:
                 key=message_key,
                 value="" if st.session_state.clear_inputs else st.session_state.get(message_key, "")
             )
-            
+
             success_criteria = st.text_input(
                 "Success Criteria (Optional)",
                 placeholder="What defines a successful response?",
@@ -360,7 +360,7 @@ with tab1:
                 key=criteria_key,
                 value="" if st.session_state.clear_inputs else st.session_state.get(criteria_key, "")
             )
-            
+
             col_send, col_clear = st.columns([1, 1])
             with col_send:
                 send_button = st.button("📤 Send Message", type="primary", use_container_width=True, key="send_message_main")
@@ -368,7 +368,7 @@ with tab1:
                 if st.button("🗑️ Clear Input", use_container_width=True, key="clear_input_main"):
                     st.session_state.clear_inputs = True
                     st.rerun()
-        
+
         # Process message
         if send_button and message.strip():
             if not st.session_state.setup_complete:
@@ -383,7 +383,7 @@ with tab1:
                             st.session_state.chat_history
                         )
                         st.session_state.chat_history = results
-                        
+
                         # Clear inputs after successful send
                         st.session_state.clear_inputs = True
                         # Refresh files as they might have been modified
@@ -393,10 +393,10 @@ with tab1:
                         st.error(f"Error processing message: {str(e)}")
                         if "playwright" in str(e).lower():
                             st.error("Playwright browser issue detected. Try resetting the session.")
-        
+
         # Chat history
         st.subheader("📜 Conversation History")
-        
+
         if st.session_state.chat_history:
             for i, msg in enumerate(st.session_state.chat_history):
                 if msg["role"] == "user":
@@ -426,10 +426,10 @@ with tab1:
 
     with col2:
         st.header("📁 Quick File Access")
-        
+
         # Show recent files in sidebar
         try:
-            files = get_sandbox_files()
+            files = list_sandbox_files()
             if files:
                 st.subheader("Recent Files")
                 for i, file_info in enumerate(files[:5]):  # Added enumerate to get index
@@ -442,7 +442,7 @@ with tab1:
                             </div>
                         </div>
                         """, unsafe_allow_html=True)
-                        
+
                         # Quick download button
                         with open(file_info['full_path'], 'rb') as file:
                             st.download_button(
@@ -453,7 +453,7 @@ with tab1:
                                 key=f"quick_download_{file_info['name']}_{i}",
                                 use_container_width=True
                             )
-                
+
                 if len(files) > 5:
                     st.info(f"Showing 5 of {len(files)} files. Go to File Manager tab for complete view.")
             else:
@@ -461,35 +461,36 @@ with tab1:
         except Exception as e:
             st.error(f"Error accessing files: {e}")
 
-with tab2:
+@fragment
+def render_file_manager():
     st.header("📁 File Manager")
     st.markdown("Manage files created by your AI Assistant in the sandbox directory.")
-    
+
     # File management controls
     col1, col2, col3 = st.columns([2, 1, 1])
-    
+
     with col1:
         if st.button("🔄 Refresh Files", type="secondary", key="refresh_files_file_manager"):
             st.session_state.refresh_files = True
             st.rerun()
-    
+
     with col2:
         # Create new file
         if st.button("📝 Create New File", key="create_new_file_button"):
             st.session_state.show_create_form = True
-    
+
     with col3:
         # Bulk operations
         if st.button("📦 Create Archive", key="create_archive_button"):
             st.session_state.show_archive_form = True
-    
+
     # Create new file form
     if st.session_state.get('show_create_form', False):
         with st.form("create_file_form"):
             st.subheader("Create New File")
             new_filename = st.text_input("Filename", placeholder="example.txt")
             new_content = st.text_area("File Content", height=200)
-            
+
             col1, col2 = st.columns(2)
             with col1:
                 if st.form_submit_button("Create File", type="primary"):
@@ -497,13 +498,14 @@ with tab2:
                         try:
                             sandbox_path = ensure_sandbox_dir()
                             file_path = sandbox_path / new_filename
-                            
+
                             # Create subdirectories if needed
                             file_path.parent.mkdir(parents=True, exist_ok=True)
-                            
+
                             with open(file_path, 'w', encoding='utf-8') as f:
                                 f.write(new_content)
-                            
+                            get_sandbox_index().update(file_path)
+
                             st.success(f"File '{new_filename}' created successfully!")
                             st.session_state.show_create_form = False
                             st.session_state.refresh_files = True
@@ -512,37 +514,58 @@ with tab2:
                             st.error(f"Error creating file: {e}")
                     else:
                         st.error("Please provide both filename and content.")
-            
+
             with col2:
                 if st.form_submit_button("Cancel"):
                     st.session_state.show_create_form = False
                     st.rerun()
-    
+
+    # Full-text search over sandbox files
+    search_query = st.text_input(
+        "🔎 Search Files",
+        placeholder="Search the contents of sandbox files...",
+        key="file_search_query"
+    )
+    if search_query.strip():
+        try:
+            search_results = get_sandbox_index().search(search_query, k=10)
+            if search_results:
+                st.caption(f"{len(search_results)} matching files")
+                for result in search_results:
+                    st.markdown(f"**{result['path']}** · score {result['score']}")
+                    for snippet in result['snippets']:
+                        st.text(f"  {snippet['line']:>5}: {snippet['text']}")
+            else:
+                st.info("No files match your search.")
+        except Exception as e:
+            st.error(f"Error searching files: {e}")
+        st.markdown("---")
+
     # Display files
     try:
-        files = get_sandbox_files()
-        
+        files = list_sandbox_files()
+
         if files:
             st.subheader(f"Files in Sandbox ({len(files)} files)")
-            
+
             # File selection for bulk operations
             selected_files = []
-            
+
             for i, file_info in enumerate(files):
                 with st.container():
                     col1, col2, col3, col4, col5 = st.columns([0.5, 3, 1, 1, 1])
-                    
+
                     with col1:
                         select = st.checkbox("", key=f"select_file_{i}")
                         if select:
                             selected_files.append(file_info)
-                    
+
                     with col2:
                         st.markdown(f"""
                         **{file_info['name']}**  
                         {format_file_size(file_info['size'])} • Modified: {file_info['modified'].strftime('%Y-%m-%d %H:%M:%S')}
                         """)
-                    
+
                     with col3:
                         # Download button
                         with open(file_info['full_path'], 'rb') as file:
@@ -554,27 +577,29 @@ with tab2:
                                 key=f"download_file_{i}",
                                 help="Download file"
                             )
-                    
+
                     with col4:
                         # View button
                         if st.button("👁️", key=f"view_file_{i}", help="View file content"):
                             st.session_state[f'show_content_{i}'] = not st.session_state.get(f'show_content_{i}', False)
-                    
+
                     with col5:
                         # Delete button
                         if st.button("🗑️", key=f"delete_file_{i}", help="Delete file"):
                             try:
                                 os.remove(file_info['full_path'])
+                                get_sandbox_index().remove(file_info['full_path'])
+                                st.session_state.refresh_files = True
                                 st.success(f"Deleted {file_info['name']}")
                                 st.rerun()
                             except Exception as e:
                                 st.error(f"Error deleting file: {e}")
-                    
+
                     # Show file content if requested
                     if st.session_state.get(f'show_content_{i}', False):
                         try:
-                            content = read_file_content(file_info['full_path'])
-                            
+                            content = load_file_content(file_info['full_path'])
+
                             # Determine if it's a code file for syntax highlighting
                             if file_info['extension'] in ['.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml']:
                                 language = {
@@ -587,7 +612,7 @@ with tab2:
                                     '.yaml': 'yaml',
                                     '.yml': 'yaml'
                                 }.get(file_info['extension'], 'text')
-                                
+
                                 st.code(content, language=language)
                             else:
                                 st.text_area(
@@ -599,19 +624,20 @@ with tab2:
                                 )
                         except Exception as e:
                             st.error(f"Error reading file: {e}")
-                
+
                 st.markdown("---")
-            
+
             # Bulk operations
             if selected_files:
                 st.subheader(f"Bulk Operations ({len(selected_files)} files selected)")
-                
+
                 col1, col2 = st.columns(2)
-                
+
                 with col1:
                     if st.button("📦 Download Selected as ZIP", key="download_zip_bulk"):
                         try:
                             zip_path = create_zip_archive(selected_files)
+                            st.session_state.refresh_files = True
                             with open(zip_path, 'rb') as zip_file:
                                 st.download_button(
                                     label="📥 Download ZIP Archive",
@@ -622,19 +648,21 @@ with tab2:
                                 )
                         except Exception as e:
                             st.error(f"Error creating archive: {e}")
-                
+
                 with col2:
                     if st.button("🗑️ Delete Selected Files", type="secondary", key="delete_selected_files"):
                         try:
                             for file_info in selected_files:
                                 os.remove(file_info['full_path'])
+                                get_sandbox_index().remove(file_info['full_path'])
+                            st.session_state.refresh_files = True
                             st.success(f"Deleted {len(selected_files)} files")
                             st.rerun()
                         except Exception as e:
                             st.error(f"Error deleting files: {e}")
         else:
             st.info("No files found in sandbox directory. Your AI Assistant will create files here when processing requests.")
-            
+
             # Show example commands
             st.markdown("""
             ### Example Commands to Create Files:
@@ -643,47 +671,14 @@ with tab2:
             - "Generate a CSV file with sample data"
             - "Create an HTML page with a simple form"
             """)
-    
+
     except Exception as e:
         st.error(f"Error accessing sandbox directory: {e}")
 
-with tab3:
+def render_tools_info():
     st.header("🛠️ Available Tools")
-    
-    tools_info = [
-        {
-            "name": "🌐 Web Browser",
-            "description": "Navigate websites, click elements, fill forms, and extract information from web pages using Playwright automation.",
-            "capabilities": ["Page navigation", "Element interaction", "Data extraction", "Form filling"]
-        },
-        {
-            "name": "🔍 Web Search",
-            "description": "Search the internet using Google's search API to find current information and answers.",
-            "capabilities": ["Real-time search", "Current events", "Fact checking", "Research"]
-        },
-        {
-            "name": "🐍 Python REPL",
-            "description": "Execute Python code for calculations, data analysis, and complex problem solving.",
-            "capabilities": ["Mathematical computations", "Data analysis", "Visualization", "Algorithm implementation"]
-        },
-        {
-            "name": "📁 File Management",
-            "description": "Create, read, write, and manage files in the sandbox directory.",
-            "capabilities": ["File creation", "Content editing", "Directory management", "File operations"]
-        },
-        {
-            "name": "📚 Wikipedia",
-            "description": "Query Wikipedia for encyclopedic information and knowledge.",
-            "capabilities": ["Knowledge lookup", "Research", "Fact verification", "Educational content"]
-        },
-        {
-            "name": "📱 Push Notifications",
-            "description": "Send push notifications to your devices using Pushover service.",
-            "capabilities": ["Alert notifications", "Task completion alerts", "Status updates"]
-        }
-    ]
-    
-    for tool in tools_info:
+
+    for tool in load_tools_info():
         with st.expander(tool["name"]):
             st.write(tool["description"])
             st.write("**Capabilities:**")
@@ -691,9 +686,9 @@ with tab3:
                 st.write(f"• {cap}")
 
     st.markdown("---")
-    
+
     st.header("🏗️ Architecture")
-    
+
     st.markdown("""
     <div class="architecture-box">
         <h4>🔄 LangGraph Workflow</h4>
@@ -706,7 +701,7 @@ with tab3:
         <p>The system continues iterating until success criteria are met or user input is needed.</p>
     </div>
     """, unsafe_allow_html=True)
-    
+
     # Usage guide
     with st.expander("📖 Usage Guide"):
         st.markdown("""
@@ -715,19 +710,19 @@ with tab3:
         2. Type your request in the message box
         3. Optionally specify success criteria
         4. Click "Send Message" to get started
-        
+
         **💡 Tips for Better Results**
         - Be specific with your requests
         - Define clear success criteria
         - Break down complex tasks
         - Monitor the assistant's responses for insights
-        
+
         **🔧 Advanced Features**
         - Multi-step task handling
         - Automatic error recovery
         - Session memory maintenance
         - Comprehensive tool integration
-        
+
         **📁 File Management**
         - Files are stored in the 'sandbox' directory
         - Use the File Manager tab to view, download, and manage files
@@ -735,6 +730,202 @@ with tab3:
         - Bulk operations available for multiple files
         """)
 
+# Sidebar
+with st.sidebar:
+    st.header("🎛️ Control Panel")
+
+    # Status indicator
+    status = "Active" if st.session_state.setup_complete else "Inactive"
+    status_class = "status-active" if st.session_state.setup_complete else "status-inactive"
+    st.markdown(f'<span class="status-indicator {status_class}">Status: {status}</span>', 
+                unsafe_allow_html=True)
+
+    st.markdown("---")
+
+    # Session info
+    st.subheader("📊 Session Info")
+    st.text(f"Session ID: {st.session_state.session_id[:8]}...")
+    st.text(f"Messages: {len(st.session_state.chat_history)}")
+    st.text(f"Started: {datetime.now().strftime('%H:%M:%S')}")
+    if st.session_state.setup_complete:
+        usage = get_resource_manager().memory_usage(st.session_state.session_id)
+        st.text(f"Memory: ~{usage.get('total', 0) / (1024 * 1024):.1f} MB")
+        caches = get_resource_manager().cache_stats(st.session_state.session_id)
+        tool_cache = caches.get("tool_cache")
+        if tool_cache and tool_cache["hits"] + tool_cache["misses"]:
+            st.text(
+                f"Tool cache (last turn): {tool_cache['hits']} of "
+                f"{tool_cache['hits'] + tool_cache['misses']} calls ({tool_cache['hit_rate']:.0%})"
+            )
+        prompt_cache = caches.get("prompt_cache", {}).get("all")
+        if prompt_cache and prompt_cache["prompt_tokens"]:
+            st.text(
+                f"Prompt cache: {prompt_cache['cached_tokens']:,} of "
+                f"{prompt_cache['prompt_tokens']:,} tokens ({prompt_cache['hit_rate']:.0%})"
+            )
+    if get_prefetcher().enabled:
+        prefetch = get_prefetcher().stats()
+        st.text(f"Prefetch: {prefetch['hit_ratio']:.0%} hits, {prefetch['waste_ratio']:.0%} wasted")
+    for tool, latency in get_slos().stats().items():
+        if latency["calls"]:
+            st.text(
+                f"{tool}: p95 {latency['p95']:.1f}s, {latency['hedges']} hedged, "
+                f"{latency['deadline_misses']} past deadline"
+            )
+    counters = metrics.snapshot()["counters"]
+    if counters.get("tool_outputs.oversized"):
+        st.text(
+            f"Oversized tool outputs: {counters['tool_outputs.oversized']:.0f} "
+            f"({counters.get('tool_outputs.spilled_bytes', 0) / 1024:.0f} KB spilled)"
+        )
+    with st.expander("All metrics"):
+        st.json(metrics.snapshot())
+
+    # Profiling
+    if st.session_state.setup_complete:
+        st.markdown("---")
+        st.subheader("🔬 Profiling")
+        manager = get_resource_manager()
+        st.checkbox(
+            "Profile every turn",
+            key="profile_every_turn",
+            help="Sample each turn and save its stacks to profiles/ (see the Profiles view)",
+            on_change=lambda: manager.set_profiling(
+                st.session_state.session_id, "session" if st.session_state.profile_every_turn else "off"
+            )
+        )
+        if not st.session_state.get('profile_every_turn') and st.button("Profile next turn", key="profile_next_turn"):
+            manager.set_profiling(st.session_state.session_id, "turn")
+            st.toast("The next turn will be profiled")
+
+    st.markdown("---")
+
+    # Controls
+    if st.button("🔄 Reset Session", type="secondary", key="reset_session_sidebar"):
+        if st.session_state.sidekick:
+            get_resource_manager().close(st.session_state.session_id)
+        st.session_state.sidekick = None
+        st.session_state.chat_history = []
+        st.session_state.session_id = str(uuid.uuid4())
+        st.session_state.setup_complete = False
+        st.session_state.clear_inputs = False
+        st.session_state.pop('profile_every_turn', None)
+        st.rerun()
+
+    if st.button("🚀 Initialize Personal Assistant", type="primary", key="init_assistant_sidebar"):
+        if not st.session_state.setup_complete:
+            with st.spinner("Setting up Personal Assistant..."):
+                try:
+                    st.session_state.sidekick = setup_sidekick_sync()
+                    st.session_state.setup_complete = True
+                    if st.session_state.get('pending_snapshot'):
+                        restore_session(io.BytesIO(st.session_state.pending_snapshot), st.session_state.sidekick)
+                        st.session_state.pending_snapshot = None
+                    st.success("Personal Assistant initialized successfully!")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Failed to initialize: {str(e)}")
+                    st.error("Please ensure Playwright is properly installed: `playwright install chromium`")
+
+    st.markdown("---")
+
+    # Quick actions
+    st.subheader("⚡ Quick Actions")
+    if st.button("📋 Clear Chat", key="clear_chat_sidebar"):
+        st.session_state.chat_history = []
+        st.rerun()
+
+    if st.button("💾 Export Session", key="export_chat_sidebar"):
+        if st.session_state.chat_history:
+            try:
+                # Streamed to disk record by record, then offered for download
+                snapshot_file = export_session(
+                    snapshot_path(st.session_state.session_id),
+                    st.session_state.session_id,
+                    st.session_state.chat_history,
+                    st.session_state.sidekick
+                )
+                with open(snapshot_file, 'rb') as f:
+                    st.download_button(
+                        label="Download Session Snapshot",
+                        data=f,
+                        file_name=snapshot_file.name,
+                        mime="application/gzip",
+                        key="download_chat_history"
+                    )
+            except Exception as e:
+                st.error(f"Error exporting session: {e}")
+
+    uploaded_snapshot = st.file_uploader(
+        "📂 Resume Session",
+        type=["gz"],
+        help="Restore a session exported with 'Export Session'",
+        key="resume_session_upload"
+    )
+    if uploaded_snapshot is not None and st.button("Restore Snapshot", key="restore_snapshot_sidebar"):
+        try:
+            # Without an initialized assistant only the chat history is restored
+            # now; the graph state is restored when the assistant is initialized
+            restored_id, restored_history = restore_session(uploaded_snapshot, st.session_state.sidekick)
+            if st.session_state.sidekick is None:
+                st.session_state.pending_snapshot = uploaded_snapshot.getvalue()
+            elif restored_id:
+                get_resource_manager().rename(st.session_state.session_id, restored_id)
+            st.session_state.chat_history = restored_history
+            st.session_state.session_id = restored_id or st.session_state.session_id
+            st.success(f"Restored {len(restored_history)} messages")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Error restoring session: {e}")
+
+    if st.button("🔄 Refresh Files", key="refresh_files_sidebar"):
+        st.session_state.refresh_files = True
+        st.rerun()
+
+def render_profiles():
+    st.header("📈 Profiles")
+    st.markdown("Sampled turn profiles saved in `profiles/`. Time is attributed to graph nodes (`node:`), "
+                "model calls (`llm:`) and tools (`tool:`); `[waiting]` is time the event loop spent "
+                "waiting on a batch of async tool calls. Download a profile to view it as a flame graph "
+                "with speedscope or flamegraph.pl.")
+
+    profiles = list_profiles()
+    if not profiles:
+        st.info("No profiles yet. Turn on profiling in the sidebar and send a message.")
+        return
+
+    selected = st.selectbox("Profile", profiles, format_func=lambda p: p.name, key="selected_profile")
+    try:
+        summary = read_summary(selected)
+    except Exception as e:
+        st.error(f"Error reading profile: {e}")
+        return
+    total = sum(summary.values()) or 1.0
+    st.table([
+        {"Attributed to": label, "Seconds": round(seconds, 3), "Share": f"{seconds / total:.0%}"}
+        for label, seconds in summary.items()
+    ])
+    st.download_button(
+        label="📥 Download collapsed stacks",
+        data=selected.read_bytes(),
+        file_name=selected.name,
+        mime="text/plain",
+        key="download_profile"
+    )
+
+# Only the selected view is built on a rerun; st.tabs would run all of them every time
+VIEWS = ["💬 Chat Interface", "📁 File Manager", "🛠️ Tools & Info", "📈 Profiles"]
+active_view = st.radio("View", VIEWS, horizontal=True, key="active_view", label_visibility="collapsed")
+
+if active_view == VIEWS[0]:
+    render_chat()
+elif active_view == VIEWS[1]:
+    render_file_manager()
+elif active_view == VIEWS[2]:
+    render_tools_info()
+else:
+    render_profiles()
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -749,7 +940,7 @@ def cleanup_resources():
     """Clean up resources when session ends"""
     if st.session_state.sidekick:
         try:
-            st.session_state.sidekick.cleanup()
+            get_resource_manager().close(st.session_state.session_id)
         except Exception as e:
             st.error(f"Cleanup error: {e}")
 
@@ -0,0 +1,64 @@
+import asyncio
+import concurrent.futures
+import sys
+import threading
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+
+# A single long-lived event loop, running in a daemon thread, that owns pooled
+# async clients. Streamlit creates a fresh loop per interaction, so anything that
+# must outlive one turn (connection pools, delivery queues) lives here instead.
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def _run_loop(loop):
+    asyncio.set_event_loop(loop)
+    loop.run_forever()
+
+
+def get_background_loop():
+    """Return the shared background event loop, starting it on first use"""
+    global _loop, _thread
+
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(
+                target=_run_loop, args=(_loop,), name="sidekick-runtime", daemon=True
+            )
+            _thread.start()
+        return _loop
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedule a coroutine on the background loop from any thread"""
+    return asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the background loop and block until it finishes"""
+    loop = get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the background loop itself")
+    return submit(coro).result(timeout)
+
+
+async def run_async(coro):
+    """Await a coroutine on the background loop from whatever loop is running"""
+    loop = get_background_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
+
+
+def call_soon(callback, *args):
+    """Thread-safe scheduling of a plain callback on the background loop"""
+    get_background_loop().call_soon_threadsafe(callback, *args)
@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import message_to_dict, messages_from_dict
+from pydantic import BaseModel
+
+from . import metrics
+from .tool_cache import canonical_key
+
+CASSETTE_VERSION = 1
+
+# The worker prompt carries the current time; mask it so keys are stable across runs
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+# Cassettes are gzip-compressed JSONL:
+#
+#   {"type": "header", "version"}
+#   {"type": "blob", "hash", "data"}                    one per distinct payload
+#   {"type": "entry", "kind", "key", "blobs": [...]}    payloads recorded for a request, in order
+#   {"type": "order", "stream", "keys": [...]}          request keys per stream, in call order
+#
+# Payloads are stored once per content hash, so repeated identical responses
+# and tool outputs cost one line. Streams are "llm:<node>", "tool" and "recall".
+
+
+class CassetteMiss(LookupError):
+    """Raised in strict replay when a request was never recorded"""
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+def _fingerprint(message: Any) -> Dict[str, Any]:
+    """Fields of a prompt message that determine the model's answer (no ids or metadata)"""
+    content = message.content
+    if isinstance(content, str):
+        content = _TIMESTAMP_RE.sub("<now>", content)
+    entry = {"type": message.type, "content": content}
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        entry["tool_calls"] = [[call["name"], call["args"]] for call in tool_calls]
+    return entry
+
+
+def _encode_response(response: Any) -> Dict[str, Any]:
+    if isinstance(response, dict):
+        # Structured output with include_raw: {"raw", "parsed", "parsing_error"}
+        parsed = response.get("parsed")
+        encoded_parsed = None
+        if isinstance(parsed, BaseModel):
+            cls = type(parsed)
+            encoded_parsed = {"schema": f"{cls.__module__}:{cls.__qualname__}", "data": parsed.model_dump()}
+        error = response.get("parsing_error")
+        return {
+            "structured": True,
+            "raw": message_to_dict(response["raw"]) if response.get("raw") is not None else None,
+            "parsed": encoded_parsed,
+            "parsing_error": str(error) if error else None,
+        }
+    return {"message": message_to_dict(response)}
+
+
+def _decode_response(payload: Dict[str, Any]) -> Any:
+    if not payload.get("structured"):
+        return messages_from_dict([payload["message"]])[0]
+    parsed = None
+    if payload.get("parsed"):
+        module, _, name = payload["parsed"]["schema"].partition(":")
+        parsed = getattr(importlib.import_module(module), name).model_validate(payload["parsed"]["data"])
+    return {
+        "raw": messages_from_dict([payload["raw"]])[0] if payload.get("raw") else None,
+        "parsed": parsed,
+        "parsing_error": ValueError(payload["parsing_error"]) if payload.get("parsing_error") else None,
+    }
+
+
+def replay_model_factory(model_name: str):
+    """Chat model for replay sessions: built so tools can be bound, but never called,
+    so it needs no API key or network"""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model_name, api_key="cassette-replay")
+
+
+class Cassette:
+    """Records LLM exchanges, tool calls and memory recalls of a run, or replays them.
+
+    In record mode every call goes to the real model or tool and its result is
+    stored under a content hash of the request. In replay mode nothing is
+    executed: results are served back in recorded order per request. A request
+    that was not recorded (for instance after a prompt change) is served the
+    next recording from the same stream, unless ``strict`` is set.
+    """
+
+    def __init__(self, path, mode: str = "replay", strict: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.strict = strict
+        self.blobs: Dict[str, Any] = {}
+        self.entries: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        self.order: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        self._served: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._stream_cursor: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self.load()
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        """Cassette configured by SIDEKICK_CASSETTE / SIDEKICK_CASSETTE_MODE, if any"""
+        path = os.getenv("SIDEKICK_CASSETTE")
+        if not path:
+            return None
+        strict = os.getenv("SIDEKICK_CASSETTE_STRICT", "false").lower() == "true"
+        return cls(path, mode=os.getenv("SIDEKICK_CASSETTE_MODE", "replay").lower(), strict=strict)
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # Storage
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                kind = record.get("type")
+                if kind == "header" and record.get("version") != CASSETTE_VERSION:
+                    raise ValueError(f"Unsupported cassette version: {record.get('version')}")
+                elif kind == "blob":
+                    self.blobs[record["hash"]] = record["data"]
+                elif kind == "entry":
+                    self.entries[(record["kind"], record["key"])] = record["blobs"]
+                elif kind == "order":
+                    self.order[record["stream"]] = [tuple(item) for item in record["keys"]]
+
+    def save(self):
+        """Write the whole cassette; called after every recorded turn"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with self._lock, gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"type": "header", "version": CASSETTE_VERSION}) + "\n")
+            for digest, data in self.blobs.items():
+                f.write(json.dumps({"type": "blob", "hash": digest, "data": data}, ensure_ascii=False) + "\n")
+            for (kind, key), blobs in self.entries.items():
+                f.write(json.dumps({"type": "entry", "kind": kind, "key": key, "blobs": blobs}) + "\n")
+            for stream, keys in self.order.items():
+                f.write(json.dumps({"type": "order", "stream": stream, "keys": keys}) + "\n")
+        os.replace(tmp, self.path)
+
+    def _record(self, stream: str, kind: str, key: str, payload: Any):
+        digest = _digest(payload)
+        with self._lock:
+            self.blobs.setdefault(digest, payload)
+            self.entries[(kind, key)].append(digest)
+            self.order[stream].append((kind, key))
+        metrics.increment(f"cassette.recorded.{kind}")
+
+    def _replay(self, stream: str, kind: str, key: str) -> Any:
+        with self._lock:
+            cursor = self._stream_cursor[stream]
+            self._stream_cursor[stream] += 1
+            if (kind, key) not in self.entries:
+                if self.strict or cursor >= len(self.order[stream]):
+                    metrics.increment(f"cassette.misses.{kind}")
+                    raise CassetteMiss(f"No recording for {stream} call #{cursor + 1} ({key})")
+                # Fall back to whatever was recorded at this position in the stream
+                metrics.increment(f"cassette.positional.{kind}")
+                kind, key = self.order[stream][cursor]
+            blobs = self.entries[(kind, key)]
+            index = self._served[(kind, key)]
+            self._served[(kind, key)] += 1
+        metrics.increment(f"cassette.replayed.{kind}")
+        # Past the end, repeat the last recording for this request
+        return self.blobs[blobs[min(index, len(blobs) - 1)]]
+
+    # LLM exchanges
+
+    @staticmethod
+    def llm_key(node: str, messages: List[Any]) -> str:
+        return _digest([node, [_fingerprint(m) for m in messages]])
+
+    def record_llm(self, node: str, messages: List[Any], response: Any):
+        self._record(f"llm:{node}", "llm", self.llm_key(node, messages), _encode_response(response))
+
+    def replay_llm(self, node: str, messages: List[Any]) -> Any:
+        return _decode_response(self._replay(f"llm:{node}", "llm", self.llm_key(node, messages)))
+
+    # Tool calls
+
+    @staticmethod
+    def tool_key(tool_name: str, args: Dict[str, Any]) -> str:
+        return _digest(canonical_key(tool_name, args))
+
+    def record_tool(self, tool_name: str, args: Dict[str, Any], content: Any, status: str = "success"):
+        self._record("tool", "tool", self.tool_key(tool_name, args), {"content": content, "status": status})
+
+    def replay_tool(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        return self._replay("tool", "tool", self.tool_key(tool_name, args))
+
+    # Long-term memory recall (embeddings may call the network too)
+
+    def record_recall(self, message: str, recalled: Optional[str]):
+        self._record("recall", "recall", _digest(message), {"recalled": recalled})
+
+    def replay_recall(self, message: str) -> Optional[str]:
+        return self._replay("recall", "recall", _digest(message))["recalled"]
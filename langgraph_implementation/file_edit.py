@@ -0,0 +1,210 @@
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+from pydantic import BaseModel, Field
+
+from . import metrics
+
+SANDBOX_ROOT = "sandbox"
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# How far a hunk may have drifted from its stated line numbers
+MAX_HUNK_OFFSET = 200
+
+
+class PatchError(ValueError):
+    """Raised when a patch does not apply to the current file"""
+
+
+class AppendFileInput(BaseModel):
+    file_path: str = Field(description="Path of the file in the sandbox, e.g. 'report.md'; created if missing")
+    text: str = Field(description="Text to add at the end of the file")
+
+
+class PatchFileInput(BaseModel):
+    file_path: str = Field(description="Path of the file in the sandbox, e.g. 'report.md'")
+    diff: str = Field(
+        description="Unified diff against the current file: '@@ -start,count +start,count @@' hunks with "
+                    "' ' context, '-' removed and '+' added lines. File headers ('---', '+++') are optional"
+    )
+
+
+class ReplaceLinesInput(BaseModel):
+    file_path: str = Field(description="Path of the file in the sandbox, e.g. 'report.md'")
+    start_line: int = Field(description="First line to replace, 1-based")
+    end_line: int = Field(
+        description="Last line to replace, inclusive; use start_line - 1 to insert before start_line without replacing"
+    )
+    text: str = Field(description="Replacement text; empty to delete the lines")
+
+
+def sandbox_path(file_path: str, root: str = SANDBOX_ROOT) -> Path:
+    """Resolve ``file_path`` inside the sandbox, refusing paths that escape it"""
+    root_path = Path(root).resolve()
+    path = Path(file_path)
+    if path.parts[:1] == (root,):
+        path = Path(*path.parts[1:])
+    resolved = (root_path / path).resolve()
+    if resolved != root_path and root_path not in resolved.parents:
+        raise PermissionError(f"Access denied: {file_path} is outside the sandbox")
+    if resolved == root_path:
+        raise IsADirectoryError(f"{file_path} is a directory")
+    return resolved
+
+
+def atomic_write_lines(path: Path, lines) -> int:
+    """Write ``lines`` to a temp file next to ``path`` and rename it over ``path``;
+    readers see either the old or the new file, never a partial one"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    written = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            for line in lines:
+                written += f.write(line)
+        if path.exists():
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    metrics.observe("file_edit.chars_written", written)
+    return written
+
+
+def append_text(path: Path, text: str) -> Tuple[int, int]:
+    """Append ``text`` to ``path`` in one write; returns (offset it was written at, new size).
+
+    A single O_APPEND write lands after whatever is in the file and is never
+    interleaved with other appends, so no temp file is needed and the cost is
+    proportional to the appended text only.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = text.encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        offset = os.fstat(fd).st_size
+        os.write(fd, data)
+        size = os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+    metrics.observe("file_edit.chars_written", len(text))
+    return offset, size
+
+
+def _read_lines(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.readlines()
+
+
+def _parse_hunks(diff: str) -> List[list]:
+    """[old start line, old lines, new lines, lines added, lines removed] for each hunk of a unified diff"""
+    hunks = []
+    current = None
+    for raw in diff.splitlines():
+        header = _HUNK_RE.match(raw)
+        if header:
+            current = [int(header.group(1)), [], [], 0, 0]
+            hunks.append(current)
+            continue
+        if current is None:
+            # File headers and anything else before the first hunk
+            continue
+        if raw.startswith("\\"):
+            # "\ No newline at end of file"
+            continue
+        tag, line = (raw[:1], raw[1:]) if raw else (" ", "")
+        if tag == " ":
+            current[1].append(line)
+            current[2].append(line)
+        elif tag == "-":
+            current[1].append(line)
+            current[4] += 1
+        elif tag == "+":
+            current[2].append(line)
+            current[3] += 1
+        else:
+            raise PatchError(f"Unexpected line in hunk: {raw!r}")
+    if not hunks:
+        raise PatchError("No '@@ -a,b +c,d @@' hunks found in the diff")
+    return hunks
+
+
+def _find_hunk(lines: List[str], old: List[str], expected: int, floor: int) -> int:
+    """Index where ``old`` matches ``lines`` (compared without line endings), nearest ``expected``"""
+    stripped = [line.rstrip("\r\n") for line in lines]
+    last = len(stripped) - len(old)
+    for delta in range(MAX_HUNK_OFFSET + 1):
+        for start in (expected - delta, expected + delta) if delta else (expected,):
+            if floor <= start <= last and stripped[start:start + len(old)] == old:
+                return start
+    raise PatchError(f"Hunk at line {expected + 1} does not match the file; read the file again and regenerate the diff")
+
+
+def apply_unified_diff(lines: List[str], diff: str) -> Tuple[List[str], int, int]:
+    """Apply ``diff`` to ``lines``; returns (new lines, lines added, lines removed)"""
+    newline = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+    result: List[str] = []
+    position = added = removed = 0
+    for old_start, old, new, plus, minus in _parse_hunks(diff):
+        # A pure insertion's start line is the line it follows
+        expected = old_start if not old else old_start - 1
+        start = _find_hunk(lines, old, max(expected, position), position)
+        result.extend(lines[position:start])
+        result.extend(line + newline for line in new)
+        position = start + len(old)
+        added += plus
+        removed += minus
+    result.extend(lines[position:])
+    if result and position >= len(lines) and lines and not lines[-1].endswith(("\n", "\r")):
+        # Keep a missing final newline missing when the last hunk reached the end
+        result[-1] = result[-1].rstrip("\r\n")
+    return result, added, removed
+
+
+def patch_lines(path: Path, diff: str) -> Tuple[int, int]:
+    """Apply a unified diff to ``path`` atomically; returns (lines added, lines removed)"""
+    lines, added, removed = apply_unified_diff(_read_lines(path), diff)
+    atomic_write_lines(path, lines)
+    return added, removed
+
+
+def replace_line_range(path: Path, start_line: int, end_line: int, text: str) -> int:
+    """Replace lines ``start_line``..``end_line`` (1-based, inclusive) of ``path`` atomically,
+    streaming the untouched lines; returns the file's new line count"""
+    if start_line < 1 or end_line < start_line - 1:
+        raise ValueError("start_line must be >= 1 and end_line >= start_line - 1")
+    replacement = text.splitlines(keepends=True)
+    if replacement and not replacement[-1].endswith(("\n", "\r")):
+        replacement[-1] += "\n"
+    total = 0
+
+    def _lines():
+        nonlocal total
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            line_no = 0
+            for line_no, line in enumerate(f, start=1):
+                if line_no == start_line:
+                    yield from replacement
+                    total += len(replacement)
+                if start_line <= line_no <= end_line:
+                    continue
+                total += 1
+                yield line
+            if line_no < start_line - 1:
+                raise ValueError(f"start_line {start_line} is past the end of the file ({line_no} lines)")
+            if line_no < start_line:
+                # Appending right after the last line
+                if line_no and not line.endswith(("\n", "\r")):
+                    yield "\n"
+                yield from replacement
+                total += len(replacement)
+
+    atomic_write_lines(path, _lines())
+    return total
+
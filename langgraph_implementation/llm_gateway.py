@@ -0,0 +1,261 @@
+import concurrent.futures
+import contextvars
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from . import metrics
+from .output_budget import CHARS_PER_TOKEN
+
+INTERACTIVE = 0
+BATCH = 10
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level: int):
+    """Run LLM calls made inside the block at the given priority (lower goes first)"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+_DURATION_RE = re.compile(r"([\d.]+)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse OpenAI reset durations such as '20ms', '1s' or '6m0s' into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    return sum(float(n) * _DURATION_UNITS[u] for n, u in parts) if parts else None
+
+
+class LLMGateway:
+    """Process-wide admission control for OpenAI-compatible API calls.
+
+    Every session's model clients share one pair of token buckets (requests
+    and tokens per minute). Waiting calls are admitted in priority order, a
+    429 or exhausted rate-limit headers pause admission for everyone, and
+    identical non-streaming requests already in flight are coalesced into one.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.rpm = requests_per_minute or int(os.getenv("SIDEKICK_LLM_RPM", "500"))
+        self.tpm = tokens_per_minute or int(os.getenv("SIDEKICK_LLM_TPM", "200000"))
+        self._requests = float(self.rpm)
+        self._tokens = float(self.tpm)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+
+    # Token buckets
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int, level: Optional[int] = None) -> float:
+        """Block until a request of ``tokens`` may be sent; returns seconds waited"""
+        level = _priority.get() if level is None else level
+        tokens = min(tokens, self.tpm)
+        ticket = (level, next(self._sequence))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    self._refill()
+                    now = time.monotonic()
+                    if self._waiting[0] != ticket:
+                        self._cond.wait(timeout=0.5)
+                        continue
+                    if now < self._paused_until:
+                        self._cond.wait(timeout=self._paused_until - now)
+                        continue
+                    if self._requests >= 1 and self._tokens >= tokens:
+                        self._requests -= 1
+                        self._tokens -= tokens
+                        break
+                    wait = max(
+                        (1 - self._requests) * 60 / self.rpm,
+                        (tokens - self._tokens) * 60 / self.tpm,
+                        0.01,
+                    )
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        metrics.observe("llm_gateway.queue_seconds", waited)
+        return waited
+
+    def settle(self, estimated_tokens: int, response: httpx.Response, body: bytes):
+        """Adjust the buckets from the response's usage and rate-limit headers"""
+        headers = response.headers
+        with self._cond:
+            try:
+                usage = json.loads(body).get("usage") or {}
+                actual = usage.get("total_tokens")
+                if actual is not None:
+                    self._tokens = min(self.tpm, self._tokens + estimated_tokens - actual)
+            except (ValueError, AttributeError):
+                pass
+
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_requests is not None and remaining_requests.isdigit():
+                self._requests = min(self._requests, float(remaining_requests))
+            if remaining_tokens is not None and remaining_tokens.isdigit():
+                self._tokens = min(self._tokens, float(remaining_tokens))
+
+            pause = None
+            if response.status_code == 429:
+                metrics.increment("llm_gateway.rate_limited")
+                retry_after_ms = headers.get("retry-after-ms")
+                pause = (
+                    float(retry_after_ms) / 1000 if retry_after_ms
+                    else parse_duration(headers.get("retry-after", ""))
+                    or parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+                    or 1.0
+                )
+            elif remaining_requests == "0":
+                pause = parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+            elif remaining_tokens == "0":
+                pause = parse_duration(headers.get("x-ratelimit-reset-tokens", ""))
+
+            if pause:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+                self._cond.notify_all()
+
+    # Request coalescing
+
+    @staticmethod
+    def request_key(request: httpx.Request, body: bytes) -> Optional[str]:
+        """Key identifying identical requests, or None if the request must not be shared"""
+        if b'"stream":true' in body.replace(b" ", b""):
+            return None
+        digest = hashlib.sha256()
+        digest.update(request.method.encode())
+        digest.update(str(request.url).encode())
+        digest.update(request.headers.get("authorization", "").encode())
+        digest.update(body)
+        return digest.hexdigest()
+
+    def join_or_lead(self, key: str) -> Tuple[concurrent.futures.Future, bool]:
+        """Return the shared future for ``key`` and whether the caller must perform the request"""
+        with self._inflight_lock:
+            if key in self._inflight:
+                metrics.increment("llm_gateway.coalesced")
+                return self._inflight[key], False
+            future = concurrent.futures.Future()
+            self._inflight[key] = future
+            return future, True
+
+    def finish(self, key: str):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+
+    # HTTP clients for model instances
+
+    def http_client(self) -> httpx.Client:
+        """Process-wide pooled sync client whose transport goes through this gateway"""
+        with self._inflight_lock:
+            if self._client is None:
+                self._client = httpx.Client(transport=GatewayTransport(self), timeout=None)
+            return self._client
+
+
+def _estimate_tokens(body: bytes) -> int:
+    estimate = len(body) // CHARS_PER_TOKEN
+    try:
+        payload = json.loads(body)
+        estimate += int(payload.get("max_tokens") or payload.get("max_completion_tokens") or 0)
+    except (ValueError, AttributeError, TypeError):
+        pass
+    return max(estimate, 1)
+
+
+def _buffered(response: httpx.Response, content: bytes, request: httpx.Request) -> httpx.Response:
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+    return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+
+class GatewayTransport(httpx.BaseTransport):
+    def __init__(self, gateway: LLMGateway, inner: Optional[httpx.BaseTransport] = None):
+        self.gateway = gateway
+        self.inner = inner or httpx.HTTPTransport(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+
+    def _send(self, request: httpx.Request, body: bytes, stream: bool) -> httpx.Response:
+        estimate = _estimate_tokens(body)
+        self.gateway.acquire(estimate)
+        response = self.inner.handle_request(request)
+        if stream:
+            return response
+        content = response.read()
+        response.close()
+        self.gateway.settle(estimate, response, content)
+        return _buffered(response, content, request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        key = self.gateway.request_key(request, body)
+        if key is None:
+            return self._send(request, body, stream=True)
+
+        future, leader = self.gateway.join_or_lead(key)
+        if not leader:
+            response = future.result()
+            return _buffered(response, response.content, request)
+        try:
+            response = self._send(request, body, stream=False)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self.gateway.finish(key)
+
+    def close(self):
+        self.inner.close()
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Return the process-wide LLM gateway, configured from the environment"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
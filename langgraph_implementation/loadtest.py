@@ -0,0 +1,356 @@
+"""Multi-session load test for the Sidekick engine.
+
+Simulates N concurrent users, each setting up a session and running a scripted
+series of turns through the same resource-manager path the Streamlit app uses
+(one blocking caller thread per user, turns executed on the shared background
+loop). Upstream services are replaced by a local fake target: an
+OpenAI-compatible chat endpoint, a Serper-compatible search endpoint and
+static pages for the browser, each with configurable latency. A fraction of
+search and page requests can be made much slower to exercise hedging and
+tool deadlines, and a fraction of users can run as background (batch
+priority) work to check that interactive turns are admitted ahead of them.
+
+    python -m langgraph_implementation.loadtest --levels 1,4,16 --turns 3 --llm-latency 0.5
+
+Reports per concurrency level: p50/p95/p99 turn latency, throughput, memory
+per session (accounted by the resource manager, and process RSS growth) and
+event-loop lag on the shared loop.
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from .async_runtime import submit
+from .llm_gateway import BATCH, INTERACTIVE, priority
+from .metrics import percentile
+from .tool_slo import get_slos
+
+DEFAULT_SCRIPT = [
+    "Search the web for recent news about solar panel efficiency and summarize it",
+    "Find two sources that disagree with that summary",
+    "Give me a one-paragraph conclusion",
+]
+
+
+# Fake upstream targets
+
+def _completion(payload: Dict[str, Any], page_url: str) -> Dict[str, Any]:
+    """OpenAI chat completion scripted from the request shape: evaluator calls get
+    a passing verdict, a worker call answering a user message gets search and
+    browser tool calls, and a worker call after tool results gets a final answer."""
+    tools = [t.get("function", {}).get("name") for t in payload.get("tools") or []]
+    response_format = payload.get("response_format") or {}
+    verdict = {"feedback": "Looks complete.", "success_criteria_met": True, "user_input_needed": False}
+    message: Dict[str, Any] = {"role": "assistant", "content": None}
+
+    if response_format.get("type") == "json_schema":
+        message["content"] = json.dumps(verdict)
+    elif tools == ["EvaluatorOutput"]:
+        message["tool_calls"] = [{
+            "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": "EvaluatorOutput", "arguments": json.dumps(verdict)},
+        }]
+    else:
+        last = next((m for m in reversed(payload.get("messages", [])) if m.get("role") != "system"), {})
+        calls = []
+        if last.get("role") == "user":
+            if "search" in tools:
+                calls.append(("search", {"queries": [str(last.get("content", ""))[:80]]}))
+            if "navigate_browser" in tools:
+                calls.append(("navigate_browser", {"url": page_url}))
+        if calls:
+            message["tool_calls"] = [
+                {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps(args)}}
+                for name, args in calls
+            ]
+        else:
+            message["content"] = "Here is what I found: the sources broadly agree. " * 4
+
+    prompt_tokens = len(json.dumps(payload.get("messages", []))) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "fake"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 60, "total_tokens": prompt_tokens + 60},
+    }
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hang up on hedged and timed-out requests; that is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeTargets:
+    """Local HTTP server standing in for OpenAI, Serper and web pages"""
+
+    def __init__(
+        self,
+        llm_latency: float = 0.5,
+        search_latency: float = 0.2,
+        page_latency: float = 0.05,
+        tail_fraction: float = 0.0,
+        tail_latency: float = 0.0,
+    ):
+        targets = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/chat/completions"):
+                    time.sleep(targets.llm_latency)
+                    body = _completion(payload, f"{targets.base_url}/page/{uuid.uuid4().hex[:6]}")
+                elif self.path.startswith("/search"):
+                    time.sleep(targets.delay(targets.search_latency))
+                    query = payload.get("q", "")
+                    body = {"organic": [
+                        {"title": f"{query} result {i}", "link": f"{targets.base_url}/page/{i}", "snippet": f"About {query}."}
+                        for i in range(5)
+                    ]}
+                else:
+                    self._reply(404, b"{}", "application/json")
+                    return
+                self._reply(200, json.dumps(body).encode(), "application/json")
+
+            def do_GET(self):
+                time.sleep(targets.delay(targets.page_latency))
+                html = "<html><body><h1>Test page</h1>" + "<p>Some article text.</p>" * 50 + "</body></html>"
+                self._reply(200, html.encode(), "text/html")
+
+            def log_message(self, *args):
+                pass
+
+        self.llm_latency = llm_latency
+        self.search_latency = search_latency
+        self.page_latency = page_latency
+        self.tail_fraction = tail_fraction
+        self.tail_latency = tail_latency
+        self.server = _QuietServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="loadtest-targets", daemon=True)
+
+    def delay(self, latency: float) -> float:
+        """``latency``, or ``tail_latency`` for a random ``tail_fraction`` of requests"""
+        if self.tail_fraction and random.random() < self.tail_fraction:
+            return self.tail_latency
+        return latency
+
+    def start(self) -> "FakeTargets":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def environment(self) -> Dict[str, str]:
+        """Environment pointing the engine's clients at this server"""
+        return {
+            "OPENAI_BASE_URL": f"{self.base_url}/v1",
+            "OPENAI_API_KEY": "loadtest",
+            "SERPER_URL": f"{self.base_url}/search",
+            "SERPER_API_KEY": "loadtest",
+        }
+
+
+# Measurements
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoopLagProbe:
+    """Measures how late the shared background loop wakes from short sleeps"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._running = False
+        self._future = None
+
+    async def _probe(self):
+        while self._running:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.monotonic() - started - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._running = True
+        self._future = submit(self._probe())
+
+    def stop(self) -> List[float]:
+        self._running = False
+        if self._future is not None:
+            self._future.result(timeout=5)
+        return self.samples
+
+
+def _simulate_user(manager, script: List[str], criteria: str, level: int = INTERACTIVE) -> Dict[str, Any]:
+    session_id = str(uuid.uuid4())
+    started = time.monotonic()
+    manager.create(session_id)
+    setup_seconds = time.monotonic() - started
+
+    latencies, errors = [], 0
+    history: List[Dict[str, str]] = []
+    for message in script:
+        started = time.monotonic()
+        with priority(level):
+            history = manager.run_turn(session_id, message, criteria, history)
+        latencies.append(time.monotonic() - started)
+        if any(m["content"].startswith("I encountered an error") for m in history[-2:]):
+            errors += 1
+    return {
+        "session_id": session_id,
+        "batch": level >= BATCH,
+        "setup_seconds": setup_seconds,
+        "latencies": latencies,
+        "errors": errors,
+        "memory": manager.memory_usage(session_id),
+    }
+
+
+def run_level(manager, sessions: int, script: List[str], criteria: str, batch_fraction: float = 0.0) -> Dict[str, Any]:
+    """Run ``sessions`` concurrent simulated users, ``batch_fraction`` of them at batch priority,
+    and summarize the level"""
+    batch_sessions = round(sessions * batch_fraction)
+    levels = [BATCH] * batch_sessions + [INTERACTIVE] * (sessions - batch_sessions)
+    probe = LoopLagProbe()
+    rss_before = rss_bytes()
+    probe.start()
+    started = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=sessions, thread_name_prefix="loadtest-user") as pool:
+        users = list(pool.map(lambda level: _simulate_user(manager, script, criteria, level), levels))
+    elapsed = time.monotonic() - started
+    lag = probe.stop()
+    rss_after = rss_bytes()
+    for user in users:
+        manager.close(user["session_id"])
+
+    latencies = [t for user in users for t in user["latencies"]]
+    by_priority = {
+        name: [t for user in users if user["batch"] == batch for t in user["latencies"]]
+        for name, batch in (("interactive", False), ("batch", True))
+    }
+    setups = [user["setup_seconds"] for user in users]
+    accounted = [user["memory"].get("total", 0) for user in users]
+    return {
+        "sessions": sessions,
+        "batch_sessions": batch_sessions,
+        "turns": len(latencies),
+        "errors": sum(user["errors"] for user in users),
+        "elapsed_seconds": elapsed,
+        "throughput_turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "turn_latency": {p: percentile(latencies, q) for p, q in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "turn_latency_p95_by_priority": {name: percentile(values, 95) for name, values in by_priority.items() if values},
+        "setup_latency_p50": percentile(setups, 50),
+        "memory_per_session_accounted": sum(accounted) / len(accounted) if accounted else 0,
+        "memory_per_session_rss": max(0, rss_after - rss_before) / sessions,
+        "loop_lag": {"p95": percentile(lag, 95), "max": max(lag, default=0.0)},
+    }
+
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    header = (
+        f"{'sessions':>8} {'turns':>6} {'err':>4} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+        f"{'turns/s':>8} {'mem/sess':>9} {'rss/sess':>9} {'lag p95':>8} {'lag max':>8}"
+    )
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r['sessions']:>8} {r['turns']:>6} {r['errors']:>4} "
+            f"{r['turn_latency']['p50']:>7.2f} {r['turn_latency']['p95']:>7.2f} {r['turn_latency']['p99']:>7.2f} "
+            f"{r['throughput_turns_per_second']:>8.2f} "
+            f"{r['memory_per_session_accounted'] / 1024:>7.0f}KB {r['memory_per_session_rss'] / 1024 / 1024:>7.1f}MB "
+            f"{r['loop_lag']['p95'] * 1000:>6.1f}ms {r['loop_lag']['max'] * 1000:>6.1f}ms"
+        )
+    for r in results:
+        if r["batch_sessions"]:
+            by_priority = r["turn_latency_p95_by_priority"]
+            lines.append(
+                f"{r['sessions']} sessions, {r['batch_sessions']} at batch priority: p95 "
+                + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in by_priority.items())
+            )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Load-test concurrent Sidekick sessions against local fake targets")
+    parser.add_argument("--levels", default="1,4,16", help="Comma-separated concurrent session counts")
+    parser.add_argument("--turns", type=int, default=len(DEFAULT_SCRIPT), help="Turns per session (script repeats)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake chat completion")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="Seconds per fake search request")
+    parser.add_argument("--page-latency", type=float, default=0.05, help="Seconds per fake page load")
+    parser.add_argument("--tail-fraction", type=float, default=0.0, help="Fraction of search and page requests that are slow")
+    parser.add_argument("--tail-latency", type=float, default=3.0, help="Seconds per slow search or page request")
+    parser.add_argument("--batch-fraction", type=float, default=0.0, help="Fraction of sessions whose LLM calls run at batch priority")
+    parser.add_argument("--criteria", default="The answer should be clear and accurate")
+    parser.add_argument("--json", dest="json_path", help="Also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    targets = FakeTargets(
+        args.llm_latency, args.search_latency, args.page_latency, args.tail_fraction, args.tail_latency
+    ).start()
+    os.environ.update(targets.environment())
+    # The fake target should be the bottleneck, not the shared rate limiter
+    os.environ.setdefault("SIDEKICK_LLM_RPM", "100000")
+    os.environ.setdefault("SIDEKICK_LLM_TPM", "100000000")
+
+    from .resource_manager import ResourceManager
+
+    manager = ResourceManager(ttl_seconds=float("inf"), persist=False)
+    script = [DEFAULT_SCRIPT[i % len(DEFAULT_SCRIPT)] for i in range(args.turns)]
+    results = []
+    try:
+        for level in (int(n) for n in args.levels.split(",") if n.strip()):
+            print(f"Running {level} concurrent session(s)...")
+            results.append(run_level(manager, level, script, args.criteria, args.batch_fraction))
+    finally:
+        targets.stop()
+
+    print(format_report(results))
+    for tool, stats in get_slos().stats().items():
+        print(
+            f"{tool}: p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s over {stats['calls']} calls, "
+            f"{stats['hedges']} hedged ({stats['hedge_wins']} won), {stats['deadline_misses']} past the deadline"
+        )
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
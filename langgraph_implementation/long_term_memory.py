@@ -0,0 +1,229 @@
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .sandbox_index import SandboxIndex, get_sandbox_index
+
+# An embedding function maps a batch of texts to a batch of vectors
+EmbeddingFunction = Callable[[List[str]], List[List[float]]]
+
+TEXT_EXTENSIONS = {".txt", ".md", ".py", ".json", ".csv", ".html", ".htm", ".xml", ".yaml", ".yml", ".js", ".css"}
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def hashing_embedder(dim: int = 384) -> EmbeddingFunction:
+    """Deterministic local embedding via feature hashing of words and word pairs.
+
+    Needs no network or model download, which makes it suitable for offline
+    use and tests; recall quality is lexical rather than semantic.
+    """
+    def embed(texts: List[str]) -> List[List[float]]:
+        matrix = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                matrix[row, value % dim] += 1.0 if (value >> 63) & 1 else -1.0
+        return matrix.tolist()
+    return embed
+
+
+def openai_embedder(model: str = "text-embedding-3-small") -> EmbeddingFunction:
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(model=model).embed_documents
+
+
+def default_embedder() -> EmbeddingFunction:
+    """Embedding backend selected by SIDEKICK_EMBEDDINGS ("openai" or "hashing").
+
+    OpenAI embeddings cost an API call on every turn (the recall query, the
+    finished turn and any changed sandbox files), so without an API key the
+    local hashing embedder is used unless OpenAI is asked for explicitly.
+    """
+    default = "openai" if os.getenv("OPENAI_API_KEY") else "hashing"
+    if os.getenv("SIDEKICK_EMBEDDINGS", default).lower() == "hashing":
+        return hashing_embedder()
+    return openai_embedder()
+
+
+def chunk_text(text: str, chunk_chars: int) -> List[str]:
+    """Split text on paragraph boundaries into chunks of roughly chunk_chars"""
+    chunks, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class VectorMemory:
+    """Long-term retrieval memory over past turns and sandbox files.
+
+    Vectors are kept L2-normalised in a growable NumPy matrix so a query is a
+    single matrix-vector product. Which sandbox files changed comes from the
+    sandbox index, which is maintained on writes, so a sync costs nothing
+    unless its version moved; only files whose mtime or size changed are
+    re-embedded, and stale rows are masked out and compacted lazily.
+
+    Embedding (a network call with the OpenAI backend) happens outside the
+    lock, which is held only to add rows or score a query.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[EmbeddingFunction] = None,
+        index: Optional[SandboxIndex] = None,
+        chunk_chars: int = 800,
+        max_file_bytes: int = 2_000_000,
+    ):
+        self.embed_fn = embed_fn or default_embedder()
+        self.index = index or get_sandbox_index()
+        self.chunk_chars = chunk_chars
+        self.max_file_bytes = max_file_bytes
+
+        self._vectors: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._records: List[Dict[str, str]] = []
+        self._files: Dict[str, Tuple[float, int, List[int]]] = {}
+        # Sandbox index version of the last sync
+        self._synced_version: Optional[int] = None
+        self._lock = threading.Lock()
+        # Serializes syncs, so two of them never embed the same file
+        self._sync_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self._alive[: self._size].sum())
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the vector matrix and snippet texts"""
+        vectors = self._vectors.nbytes if self._vectors is not None else 0
+        return vectors + self._alive.nbytes + sum(len(r["text"]) for r in self._records)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embed_fn(texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def _append(self, texts: List[str], vectors: np.ndarray, source: str, kind: str) -> List[int]:
+        """Add embedded rows; caller holds the lock"""
+        if not texts:
+            return []
+        needed = self._size + len(texts)
+        if self._vectors is None:
+            self._vectors = np.zeros((max(needed, 64), vectors.shape[1]), dtype=np.float32)
+            self._alive = np.zeros(len(self._vectors), dtype=bool)
+        elif needed > len(self._vectors):
+            capacity = max(needed, 2 * len(self._vectors))
+            grown = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+            grown[: self._size] = self._vectors[: self._size]
+            self._vectors = grown
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+        rows = list(range(self._size, needed))
+        self._vectors[self._size:needed] = vectors
+        self._alive[self._size:needed] = True
+        self._records.extend({"source": source, "kind": kind, "text": t} for t in texts)
+        self._size = needed
+        return rows
+
+    def add_turn(self, user_message: str, assistant_message: str, turn_id: str = ""):
+        """Embed one completed conversation turn"""
+        text = f"User: {user_message}\nAssistant: {assistant_message}"
+        chunks = chunk_text(text, self.chunk_chars)
+        if not chunks:
+            return
+        vectors = self._embed(chunks)
+        with self._lock:
+            self._append(chunks, vectors, f"conversation {turn_id}".strip(), "turn")
+
+    def sync_sandbox(self) -> int:
+        """Re-embed new or changed sandbox text files; return the number of files updated"""
+        self.index.refresh_if_dirty()
+        with self._sync_lock:
+            version, files = self.index.file_stats()
+            if version == self._synced_version:
+                return 0
+            current = {
+                key: stat for key, stat in files.items()
+                if Path(key).suffix.lower() in TEXT_EXTENSIONS and stat[1] <= self.max_file_bytes
+            }
+            with self._lock:
+                changed = [key for key, stat in current.items() if self._files.get(key, (None, None))[:2] != stat]
+                removed = set(self._files) - set(current)
+
+            embedded = {}
+            for key in changed:
+                try:
+                    text = (self.index.root / key).read_text(encoding="utf-8", errors="replace")
+                except OSError as e:
+                    print(f"Could not read {key} for memory: {e}")
+                    continue
+                chunks = chunk_text(text, self.chunk_chars)
+                embedded[key] = (chunks, self._embed(chunks) if chunks else None)
+
+            with self._lock:
+                for key in removed | set(embedded):
+                    previous = self._files.pop(key, None)
+                    if previous:
+                        self._alive[previous[2]] = False
+                for key, (chunks, vectors) in embedded.items():
+                    rows = self._append(chunks, vectors, key, "file") if chunks else []
+                    self._files[key] = (*current[key], rows)
+                if self._size and self._alive[: self._size].sum() < self._size // 2:
+                    self._compact()
+            self._synced_version = version
+        return len(embedded)
+
+    def _compact(self):
+        keep = np.flatnonzero(self._alive[: self._size])
+        remap = {int(old): new for new, old in enumerate(keep)}
+        self._vectors[: len(keep)] = self._vectors[keep]
+        self._alive[:] = False
+        self._alive[: len(keep)] = True
+        self._records = [self._records[i] for i in keep]
+        self._files = {
+            key: (mtime, size, [remap[r] for r in rows])
+            for key, (mtime, size, rows) in self._files.items()
+        }
+        self._size = len(keep)
+
+    def search(self, query: str, k: int = 4, min_score: float = 0.2) -> List[Tuple[float, Dict[str, str]]]:
+        """Return up to k (score, record) pairs most similar to the query"""
+        if not len(self):
+            return []
+        query_vector = self._embed([query])[0]
+        with self._lock:
+            if not self._size or not self._alive[: self._size].any():
+                return []
+            scores = self._vectors[: self._size] @ query_vector
+            scores[~self._alive[: self._size]] = -np.inf
+            k = min(k, self._size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), self._records[i]) for i in top if scores[i] >= min_score]
+
+    def recall(self, query: str, k: int = 4) -> str:
+        """Format the top-k snippets for inclusion in a prompt"""
+        hits = self.search(query, k=k)
+        return "\n\n".join(f"[{record['source']}]\n{record['text']}" for _, record in hits)
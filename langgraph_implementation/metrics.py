@@ -0,0 +1,47 @@
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+# Process-wide instrumentation shared by the graph, tools and the app.
+# Counters are monotonically increasing; observations keep count/sum/max.
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_observations: Dict[str, Dict[str, float]] = {}
+
+
+def increment(name: str, value: float = 1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name: str, value: float):
+    with _lock:
+        stats = _observations.setdefault(name, {"count": 0, "sum": 0.0, "max": float("-inf")})
+        stats["count"] += 1
+        stats["sum"] += value
+        stats["max"] = max(stats["max"], value)
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Copy of all counters and observations"""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "observations": {name: dict(stats) for name, stats in _observations.items()},
+        }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _observations.clear()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
@@ -0,0 +1,167 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, ToolMessage
+
+from . import metrics
+from .llm_gateway import get_gateway
+from .output_budget import estimate_tokens
+
+# All model routing configuration lives here. Each node has a "fast" and a
+# "strong" route; FALLBACKS lists what to try, in order, if a model call fails.
+MODEL_ROUTES: Dict[str, Dict[str, str]] = {
+    "worker": {
+        "fast": os.getenv("SIDEKICK_FAST_MODEL", "gpt-4o-mini"),
+        "strong": os.getenv("SIDEKICK_STRONG_MODEL", "gpt-4o"),
+    },
+    "evaluator": {
+        "fast": os.getenv("SIDEKICK_FAST_MODEL", "gpt-4o-mini"),
+        "strong": os.getenv("SIDEKICK_STRONG_MODEL", "gpt-4o"),
+    },
+    # Optional planner fan-out: splitting a request is cheap, combining answers less so
+    "planner": {
+        "fast": os.getenv("SIDEKICK_FAST_MODEL", "gpt-4o-mini"),
+        "strong": os.getenv("SIDEKICK_FAST_MODEL", "gpt-4o-mini"),
+    },
+    "merge": {
+        "fast": os.getenv("SIDEKICK_FAST_MODEL", "gpt-4o-mini"),
+        "strong": os.getenv("SIDEKICK_STRONG_MODEL", "gpt-4o"),
+    },
+}
+FALLBACKS: Dict[str, List[str]] = {
+    MODEL_ROUTES["worker"]["strong"]: [MODEL_ROUTES["worker"]["fast"]],
+}
+STRONG_AFTER_RETRIES = int(os.getenv("SIDEKICK_STRONG_AFTER_RETRIES", "2"))
+LONG_PROMPT_TOKENS = int(os.getenv("SIDEKICK_LONG_PROMPT_TOKENS", "8000"))
+DEMANDING_CRITERIA_RE = re.compile(
+    r"\b(detailed|comprehensive|in[- ]depth|thorough|analy[sz]e|analysis|compare|comparison|report|essay|proof|derive)\b",
+    re.I,
+)
+
+ModelFactory = Callable[[str], Any]
+
+
+def default_model_factory(model_name: str):
+    """ChatOpenAI whose requests go through the process-wide LLM gateway.
+
+    The worker and evaluator call models synchronously, so only the sync HTTP
+    client is shared; set SIDEKICK_LLM_GATEWAY=false to bypass the gateway.
+    """
+    from langchain_openai import ChatOpenAI
+    if os.getenv("SIDEKICK_LLM_GATEWAY", "true").lower() == "false":
+        return ChatOpenAI(model=model_name)
+    return ChatOpenAI(model=model_name, http_client=get_gateway().http_client())
+
+
+@dataclass
+class RoutingFeatures:
+    prompt_tokens: int
+    in_tool_loop: bool
+    retry_count: int
+    demanding_criteria: bool
+
+    @classmethod
+    def build(cls, prompt_messages: List[Any], turn_messages: List[Any], success_criteria: str) -> "RoutingFeatures":
+        """Features of a call sending ``prompt_messages`` during a turn made of ``turn_messages``"""
+        prompt_tokens = sum(estimate_tokens(m.content) for m in prompt_messages if isinstance(m.content, str))
+        retry_count = sum(
+            1 for m in turn_messages
+            if isinstance(m, AIMessage) and isinstance(m.content, str) and m.content.startswith("Evaluator Feedback:")
+        )
+        return cls(
+            prompt_tokens=prompt_tokens,
+            in_tool_loop=bool(turn_messages) and isinstance(turn_messages[-1], ToolMessage),
+            retry_count=retry_count,
+            demanding_criteria=bool(DEMANDING_CRITERIA_RE.search(success_criteria or "")),
+        )
+
+
+@dataclass
+class RoutingDecision:
+    node: str
+    route: str
+    model: str
+    reason: str
+    features: RoutingFeatures
+    timestamp: float = field(default_factory=time.time)
+    served_by: Optional[str] = None
+    latency: Optional[float] = None
+
+
+class ModelRouter:
+    """Chooses a model per call from cheap features of the request.
+
+    Prepared models (with tools bound or structured output attached) are built
+    once per (node, model, variant) and cached; a variant, such as the subset
+    of tools to bind, is passed through to the node's prepare function. Every decision is kept in a bounded log
+    and counted in metrics; failed calls fall through FALLBACKS in order.
+    """
+
+    def __init__(
+        self,
+        prepare: Dict[str, Callable[[Any], Any]],
+        model_factory: Optional[ModelFactory] = None,
+        routes: Optional[Dict[str, Dict[str, str]]] = None,
+        fallbacks: Optional[Dict[str, List[str]]] = None,
+        history_size: int = 200,
+    ):
+        self.prepare = prepare
+        self.model_factory = model_factory or default_model_factory
+        self.routes = routes or MODEL_ROUTES
+        self.fallbacks = fallbacks if fallbacks is not None else FALLBACKS
+        self.decisions: deque = deque(maxlen=history_size)
+        self._models: Dict[Tuple[str, str, Any], Any] = {}
+        self._base_models: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def model(self, node: str, model_name: str, variant: Any = None):
+        """Prepared model for a node (and optional hashable variant), built on first use"""
+        key = (node, model_name, variant)
+        with self._lock:
+            if key not in self._models:
+                if model_name not in self._base_models:
+                    self._base_models[model_name] = self.model_factory(model_name)
+                base = self._base_models[model_name]
+                self._models[key] = self.prepare[node](base) if variant is None else self.prepare[node](base, variant)
+            return self._models[key]
+
+    def route(self, node: str, features: RoutingFeatures) -> Tuple[str, str]:
+        """Return (route, reason) for a call"""
+        if features.retry_count >= STRONG_AFTER_RETRIES:
+            return "strong", f"evaluator rejected {features.retry_count} times"
+        if node == "worker" and features.in_tool_loop:
+            return "fast", "continuing after tool results"
+        if features.prompt_tokens > LONG_PROMPT_TOKENS:
+            return "strong", f"long prompt (~{features.prompt_tokens} tokens)"
+        if node == "worker" and features.demanding_criteria:
+            return "strong", "demanding success criteria"
+        return "fast", "default"
+
+    def invoke(self, node: str, features: RoutingFeatures, messages: List[Any], variant: Any = None):
+        route, reason = self.route(node, features)
+        model_name = self.routes[node][route]
+        decision = RoutingDecision(node=node, route=route, model=model_name, reason=reason, features=features)
+        self.decisions.append(decision)
+        metrics.increment(f"routing.{node}.{model_name}")
+
+        last_error = None
+        for candidate in [model_name] + self.fallbacks.get(model_name, []):
+            started = time.perf_counter()
+            try:
+                result = self.model(node, candidate, variant).invoke(messages)
+            except Exception as e:
+                last_error = e
+                metrics.increment(f"routing.{node}.{candidate}.failed")
+                print(f"Model {candidate} failed for {node}: {e}")
+                continue
+            decision.served_by = candidate
+            decision.latency = time.perf_counter() - started
+            if candidate != model_name:
+                metrics.increment(f"routing.{node}.fallback")
+            return result
+        raise last_error
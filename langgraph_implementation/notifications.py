@@ -0,0 +1,239 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+import httpx
+from dotenv import load_dotenv
+
+from .async_runtime import call_soon, run_sync
+
+load_dotenv(override=True)
+
+DEFAULT_PUSHOVER_URL = "https://api.pushover.net/1/messages.json"
+# Pushover rejects longer messages
+MAX_MESSAGE_CHARS = 1024
+
+
+class PushNotifier:
+    """Background push notification delivery over a pooled HTTP session.
+
+    Messages are enqueued from any thread and delivered by a single task on the
+    shared background loop. A message identical to one still queued, or to one
+    delivered within ``dedupe_window`` seconds, is dropped; a message whose
+    delivery failed can be sent again. Bursts arriving within ``batch_window``
+    seconds are joined into notifications of at most MAX_MESSAGE_CHARS, and
+    failed deliveries are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        token: Optional[str] = None,
+        user: Optional[str] = None,
+        timeout: float = 10.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        dedupe_window: float = 60.0,
+        batch_window: float = 0.5,
+        max_batch: int = 10,
+    ):
+        self.url = url or os.getenv("PUSHOVER_URL", DEFAULT_PUSHOVER_URL)
+        self.token = token if token is not None else os.getenv("PUSHOVER_TOKEN")
+        self.user = user if user is not None else os.getenv("PUSHOVER_USER")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dedupe_window = dedupe_window
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        # Delivered message -> when it was delivered, and messages still queued
+        self._recent: Dict[str, float] = {}
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {"enqueued": 0, "deduplicated": 0, "batches": 0, "delivered": 0, "retries": 0, "failed": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.token and self.user)
+
+    def enqueue(self, text: str) -> str:
+        """Queue a message for delivery and return immediately"""
+        if not self.configured:
+            return "Pushover credentials not configured"
+
+        now = time.monotonic()
+        with self._lock:
+            self._recent = {m: t for m, t in self._recent.items() if now - t < self.dedupe_window}
+            if text in self._recent or text in self._pending:
+                self._stats["deduplicated"] += 1
+                return "Duplicate push notification suppressed"
+            self._pending.add(text)
+            self._stats["enqueued"] += 1
+
+        call_soon(self._put, text)
+        return "Push notification queued for delivery"
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until every queued message has been delivered or given up on"""
+        run_sync(self._join(), timeout=timeout)
+
+    def close(self):
+        """Stop the delivery task and release the HTTP session"""
+        run_sync(self._aclose())
+
+    # Everything below runs on the background loop
+
+    def _put(self, text: str):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+            )
+            self._task = asyncio.get_running_loop().create_task(self._deliver_forever())
+        self._queue.put_nowait(text)
+
+    async def _join(self):
+        # Scheduled after any pending _put callbacks, so the queue exists if needed
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _collect_batch(self) -> List[str]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _deliver_forever(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                for chunk in self._chunks(batch):
+                    delivered = False
+                    try:
+                        delivered = await self._send_with_retry("\n\n".join(self._clip(text) for text in chunk))
+                    except Exception as e:
+                        # Anything unexpected fails this chunk, never the delivery task
+                        print(f"Push notification failed: {e}")
+                        with self._lock:
+                            self._stats["failed"] += 1
+                    self._settle(chunk, delivered)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _clip(text: str) -> str:
+        return text if len(text) <= MAX_MESSAGE_CHARS else text[:MAX_MESSAGE_CHARS - 1] + "…"
+
+    @classmethod
+    def _chunks(cls, batch: List[str]) -> List[List[str]]:
+        """Group messages into notifications whose joined (and clipped) text fits MAX_MESSAGE_CHARS"""
+        chunks: List[List[str]] = []
+        size = 0
+        for text in batch:
+            length = len(cls._clip(text))
+            if chunks and size + 2 + length <= MAX_MESSAGE_CHARS:
+                chunks[-1].append(text)
+                size += 2 + length
+            else:
+                chunks.append([text])
+                size = length
+        return chunks
+
+    def _settle(self, chunk: List[str], delivered: bool):
+        """Release queued messages; only delivered ones start suppressing duplicates"""
+        now = time.monotonic()
+        with self._lock:
+            for text in chunk:
+                self._pending.discard(text)
+                if delivered:
+                    self._recent[text] = now
+
+    async def _send_with_retry(self, message: str) -> bool:
+        """Deliver one notification; returns whether it was accepted"""
+        with self._lock:
+            self._stats["batches"] += 1
+        data = {"token": self.token, "user": self.user, "message": message}
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await self._client.post(self.url, data=data)
+                if response.status_code == 200:
+                    with self._lock:
+                        self._stats["delivered"] += 1
+                    return True
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"Push notification rejected: {response.status_code}")
+                    break
+                retry_after = response.headers.get("Retry-After")
+                print(f"Push notification attempt {attempt + 1} failed: {response.status_code}")
+            except httpx.HTTPError as e:
+                print(f"Push notification attempt {attempt + 1} failed: {e}")
+
+            if attempt == self.max_retries:
+                break
+            with self._lock:
+                self._stats["retries"] += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        with self._lock:
+            self._stats["failed"] += 1
+        return False
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    async def _aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._queue = None
+
+
+_notifier: Optional[PushNotifier] = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> PushNotifier:
+    """Return the process-wide notifier, creating it from the environment"""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = PushNotifier()
+        return _notifier
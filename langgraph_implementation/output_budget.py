@@ -0,0 +1,180 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+from . import metrics
+
+# Rough but stable estimate; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# Spilled outputs live outside the sandbox so they are never indexed, embedded
+# or listed as user files; references to them start with SPILL_PREFIX
+TOOL_OUTPUTS_DIR = Path(os.getenv("SIDEKICK_TOOL_OUTPUTS_DIR", "tool_outputs"))
+SPILL_PREFIX = "tool_outputs"
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _is_continuation(byte: int) -> bool:
+    """A UTF-8 byte that continues a multi-byte character"""
+    return byte & 0xC0 == 0x80
+
+
+class ReadToolOutputInput(BaseModel):
+    reference: str = Field(description="The reference given in a truncated tool result, e.g. 'tool_outputs/search_...txt'")
+    page: int = Field(default=1, description="1-based page number to read")
+
+
+class OutputGovernor:
+    """Caps every tool result to a token budget.
+
+    Oversized results are written in full to a per-session directory under
+    ``tool_outputs/`` and replaced by a head/tail preview plus a reference
+    that the agent can page through with ``read_tool_output``. Results of
+    ``read_file`` point at the sandbox file itself instead of making a copy.
+    Pages are budget-sized runs of the stored file's UTF-8 bytes, snapped to
+    character boundaries, so the page count in the preview is the one
+    ``read_tool_output`` serves.
+
+    A session's spills are deleted when the session is released; each session
+    keeps at most ``max_session_bytes`` (oldest spills go first), and
+    directories left behind by a crashed process are removed after
+    ``max_age_seconds``.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        root: str = "sandbox",
+        spill_root: Optional[Path] = None,
+        max_session_bytes: Optional[int] = None,
+        max_age_seconds: float = 24 * 3600,
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("SIDEKICK_TOOL_OUTPUT_TOKENS", "2000"))
+        self.root = Path(root)
+        self.spill_root = Path(spill_root or TOOL_OUTPUTS_DIR)
+        self.max_session_bytes = max_session_bytes or int(os.getenv("SIDEKICK_TOOL_OUTPUT_MAX_MB", "50")) * 1024 * 1024
+        self.max_age_seconds = max_age_seconds
+        self.page_chars = self.max_tokens * CHARS_PER_TOKEN
+        self.page_bytes = self.page_chars
+        # Paging through an oversized result must not itself be truncated
+        self.exempt_tools = {"read_tool_output"}
+
+    def govern(self, tool_name: str, content: Any, args: Optional[Dict[str, Any]] = None, session: str = "default") -> Any:
+        """Return ``content`` unchanged if within budget, otherwise a preview"""
+        if not isinstance(content, str) or tool_name in self.exempt_tools:
+            return content
+        tokens = estimate_tokens(content)
+        if tokens <= self.max_tokens:
+            return content
+
+        metrics.increment("tool_outputs.oversized")
+        metrics.increment(f"tool_outputs.oversized.{tool_name}")
+        metrics.observe("tool_outputs.oversized_tokens", tokens)
+
+        reference = self._existing_file(tool_name, args) or self._spill(tool_name, content, session)
+        pages = self._page_count(self._resolve(reference).stat().st_size)
+        head_chars = self.page_chars * 2 // 3
+        tail_chars = self.page_chars // 4
+        return (
+            f"[Output truncated: about {tokens} tokens exceeds the {self.max_tokens} token budget. "
+            f"Full output is in '{reference}' ({pages} pages); "
+            f"use read_tool_output with this reference and a page number to read more.]\n\n"
+            f"{content[:head_chars]}\n\n... [{len(content) - head_chars - tail_chars} characters omitted] ...\n\n"
+            f"{content[-tail_chars:]}"
+        )
+
+    def _existing_file(self, tool_name: str, args: Optional[Dict[str, Any]]) -> Optional[str]:
+        if tool_name == "read_file" and args and args.get("file_path"):
+            path = self.root / args["file_path"]
+            if path.is_file():
+                return str(path.relative_to(self.root))
+        return None
+
+    def _session_dir(self, session: str) -> Path:
+        return self.spill_root / "".join(c for c in session if c.isalnum() or c in "-_")[:64]
+
+    def _spill(self, tool_name: str, content: str, session: str) -> str:
+        directory = self._session_dir(session)
+        directory.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:10]
+        path = directory / f"{tool_name}_{time.strftime('%Y%m%d_%H%M%S')}_{digest}.txt"
+        path.write_text(content, encoding="utf-8")
+        metrics.increment("tool_outputs.spilled_bytes", path.stat().st_size)
+        self._enforce_retention(directory, keep=path)
+        return f"{SPILL_PREFIX}/{path.relative_to(self.spill_root).as_posix()}"
+
+    def _enforce_retention(self, directory: Path, keep: Path):
+        spills = sorted(directory.iterdir(), key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in spills)
+        for path in spills:
+            if total <= self.max_session_bytes or path == keep:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            metrics.increment("tool_outputs.expired")
+        cutoff = time.time() - self.max_age_seconds
+        for other in self.spill_root.iterdir():
+            if other != directory and other.is_dir() and other.stat().st_mtime < cutoff:
+                shutil.rmtree(other, ignore_errors=True)
+
+    def discard(self, session: str):
+        """Delete everything spilled for ``session``"""
+        shutil.rmtree(self._session_dir(session), ignore_errors=True)
+
+    def _resolve(self, reference: str) -> Path:
+        parts = Path(reference).parts
+        if parts and parts[0] == SPILL_PREFIX:
+            return self.spill_root.joinpath(*parts[1:])
+        return self.root / reference
+
+    def _page_count(self, size: int) -> int:
+        return max(1, (size + self.page_bytes - 1) // self.page_bytes)
+
+    def read_page(self, reference: str, page: int = 1) -> str:
+        """Read one budget-sized page of a spilled output or sandbox file"""
+        spilled = Path(reference).parts[:1] == (SPILL_PREFIX,)
+        base = (self.spill_root if spilled else self.root).resolve()
+        path = self._resolve(reference).resolve()
+        if base not in path.parents:
+            return f"Error: '{reference}' is not a stored output or inside the sandbox"
+        if not path.is_file():
+            return f"Error: no stored output named '{reference}'"
+
+        pages = self._page_count(path.stat().st_size)
+        if page < 1 or page > pages:
+            return f"Error: page {page} is out of range; '{reference}' has {pages} pages"
+        # A page holds the characters whose first byte falls inside its byte range:
+        # skip a character continued from the previous page, finish one cut at the end
+        with open(path, "rb") as f:
+            f.seek((page - 1) * self.page_bytes)
+            data = f.read(self.page_bytes + 3)
+        start = 0
+        while start < min(3, len(data)) and page > 1 and _is_continuation(data[start]):
+            start += 1
+        end = min(self.page_bytes, len(data))
+        while end < len(data) and _is_continuation(data[end]):
+            end += 1
+        chunk = data[start:end].decode("utf-8", errors="replace")
+        return f"[{reference} page {page} of {pages}]\n{chunk}"
+
+
+_governor: Optional[OutputGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_output_governor() -> OutputGovernor:
+    """Return the process-wide output governor, configured from the environment"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = OutputGovernor()
+        return _governor
@@ -0,0 +1,194 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, Tag
+from pydantic import BaseModel, Field
+
+# Elements that never carry article content
+STRIP_TAGS = ["script", "style", "noscript", "svg", "iframe", "form", "button", "nav", "header", "footer", "aside", "template"]
+BOILERPLATE_RE = re.compile(
+    r"nav|menu|footer|header|sidebar|cookie|consent|banner|advert|promo|share|social|breadcrumb|"
+    r"subscribe|newsletter|related|comment|popup|modal|skip-link",
+    re.I,
+)
+BLOCK_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "pre", "blockquote", "td", "th", "dt", "dd", "figcaption"]
+CONTENT_ROOT_SELECTORS = ["article", "main", "[role=main]", "#content", "#main-content", ".mw-parser-output"]
+MAX_LINKS = 20
+# Between the header, the text and the links when rendered
+LINKS_SEPARATOR = "\n\n"
+
+
+class ExtractTextInput(BaseModel):
+    focus: Optional[str] = Field(
+        default=None,
+        description="Optional CSS selector (e.g. '#prices', 'table.results') or a few keywords to focus the extraction on",
+    )
+    max_chars: int = Field(default=6000, description="Maximum number of characters to return")
+
+
+@dataclass
+class ExtractionResult:
+    text: str
+    source_chars: int
+    links: List[str] = field(default_factory=list)
+    truncated: bool = False
+
+    @property
+    def links_text(self) -> str:
+        return "Links:\n" + "\n".join(self.links) if self.links else ""
+
+    @property
+    def output_chars(self) -> int:
+        """Characters of text and links returned; the one-line header is not counted"""
+        return len(self.text) + (len(LINKS_SEPARATOR) + len(self.links_text) if self.links else 0)
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.source_chars / self.output_chars if self.output_chars else 0.0
+
+    def render(self) -> str:
+        header = (
+            f"[Extracted {self.output_chars} of {self.source_chars} characters of page text, "
+            f"compression {self.compression_ratio:.1f}x{', truncated' if self.truncated else ''}]"
+        )
+        parts = [header, self.text]
+        if self.links:
+            parts.append(self.links_text)
+        return LINKS_SEPARATOR.join(parts)
+
+
+def _is_boilerplate(element: Tag) -> bool:
+    attributes = " ".join(element.get("class", [])) + " " + (element.get("id") or "") + " " + (element.get("role") or "")
+    return bool(BOILERPLATE_RE.search(attributes))
+
+
+def _link_density(element: Tag) -> float:
+    text_length = len(element.get_text(" ", strip=True)) or 1
+    link_length = sum(len(a.get_text(" ", strip=True)) for a in element.find_all("a"))
+    return link_length / text_length
+
+
+def _content_root(soup: BeautifulSoup) -> Tag:
+    """Pick the element most likely to hold the main content"""
+    for selector in CONTENT_ROOT_SELECTORS:
+        candidate = soup.select_one(selector)
+        if candidate is not None and len(candidate.get_text(" ", strip=True)) > 200:
+            return candidate
+
+    body = soup.body or soup
+    best, best_score = body, 0.0
+    for candidate in body.find_all(["div", "section", "td"]):
+        paragraphs = candidate.find_all("p", recursive=False)
+        if not paragraphs:
+            continue
+        text_length = sum(len(p.get_text(" ", strip=True)) for p in paragraphs)
+        score = text_length * (1 - _link_density(candidate))
+        if score > best_score:
+            best, best_score = candidate, score
+    return best if best_score > 200 else body
+
+
+def _focus_roots(soup: BeautifulSoup, focus: str) -> Optional[List[Tag]]:
+    """Elements selected by ``focus`` when it is a CSS selector that matches"""
+    try:
+        matches = soup.select(focus)
+    except Exception:
+        return None
+    return matches or None
+
+
+def _blocks(root: Tag) -> List[str]:
+    lines = []
+    for element in root.find_all(BLOCK_TAGS):
+        # Nested blocks (e.g. <p> inside <li>) are emitted by their innermost element
+        if element.find(BLOCK_TAGS):
+            continue
+        text = re.sub(r"\s+", " ", element.get_text(" ", strip=True))
+        if not text:
+            continue
+        if element.name[0] == "h" and element.name[1:].isdigit():
+            text = "#" * int(element.name[1]) + " " + text
+        elif element.name == "li":
+            text = "- " + text
+        lines.append(text)
+    if not lines:
+        text = re.sub(r"\s+", " ", root.get_text(" ", strip=True))
+        if text:
+            lines.append(text)
+    return lines
+
+
+def extract_readable_text(
+    html: str,
+    focus: Optional[str] = None,
+    max_chars: int = 6000,
+    base_url: Optional[str] = None,
+) -> ExtractionResult:
+    """Readability-style extraction of a page's main text.
+
+    Strips scripts, navigation and other boilerplate, collapses duplicate lines
+    and links, optionally narrows to a CSS selector or keyword focus, and caps
+    the output at ``max_chars``: the text comes first and links only fill
+    whatever budget it leaves.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    source_chars = len(soup.get_text(" ", strip=True))
+
+    for element in soup(STRIP_TAGS):
+        element.decompose()
+    for element in soup.find_all(_is_boilerplate):
+        # Children of an already removed container are decomposed with it
+        if element.decomposed or element.name in ("html", "body"):
+            continue
+        # Class names alone are a weak signal (e.g. "menu" on a restaurant page),
+        # so only drop matching elements that are short or mostly links
+        if len(element.get_text(" ", strip=True)) < 200 or _link_density(element) > 0.5:
+            element.decompose()
+
+    roots = _focus_roots(soup, focus) if focus else None
+    content_roots = roots or [_content_root(soup)]
+    lines = []
+    for root in content_roots:
+        lines.extend(_blocks(root))
+
+    if focus and roots is None:
+        # Not a selector: keep blocks mentioning any of the focus keywords
+        keywords = [k for k in re.findall(r"\w+", focus.lower()) if len(k) > 2]
+        focused = [line for line in lines if any(k in line.lower() for k in keywords)]
+        lines = focused or lines
+
+    seen = set()
+    unique_lines = []
+    for line in lines:
+        if line not in seen:
+            seen.add(line)
+            unique_lines.append(line)
+
+    links, seen_links = [], set()
+    for root in content_roots:
+        for anchor in root.find_all("a", href=True):
+            href = urljoin(base_url, anchor["href"]) if base_url else anchor["href"]
+            label = anchor.get_text(" ", strip=True)
+            if not label or href.startswith(("javascript:", "#")) or href in seen_links:
+                continue
+            seen_links.add(href)
+            links.append(f"- {label[:80]}: {href}")
+            if len(links) >= MAX_LINKS:
+                break
+
+    text = "\n".join(unique_lines)
+    truncated = len(text) > max_chars
+    if truncated:
+        text = text[:max_chars].rsplit("\n", 1)[0] + "\n..."
+
+    budget = max_chars - len(text) - len(LINKS_SEPARATOR) - len("Links:")
+    kept_links = []
+    for link in links:
+        budget -= len(link) + 1
+        if budget < 0:
+            truncated = True
+            break
+        kept_links.append(link)
+    return ExtractionResult(text=text, source_chars=source_chars, links=kept_links, truncated=truncated)
@@ -2,18 +2,30 @@ import sys
 from typing import Annotated
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from langgraph.graph.message import add_messages
 from dotenv import load_dotenv
 from langgraph.prebuilt import ToolNode
-from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.language_models import BaseChatModel
 from typing import List, Any, Optional, Dict
 from pydantic import BaseModel, Field
-from .personal_assistant_tools import playwright_tools, other_tools, cleanup_browser
+from .personal_assistant_tools import playwright_tools, other_tools, release_browser, fetch_page_tool
+from .long_term_memory import VectorMemory
+from .output_budget import get_output_governor
+from .model_router import ModelRouter, ModelFactory, RoutingFeatures
+from .prompts import PromptAssembler
+from .tool_cache import ToolCallCache
+from .tool_selection import REQUEST_TOOLS, ToolSelector, request_tools_tool
+from .cassette import Cassette, replay_model_factory
+from .sandbox_index import get_sandbox_index
+from .profiler import span
+from .llm_gateway import BATCH, priority
+import os
 import uuid
 import asyncio
-from datetime import datetime
 import concurrent.futures
 import threading
 
@@ -22,30 +34,66 @@ load_dotenv(override=True)
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
+def merge_subtask_results(existing: Optional[List[Dict[str, str]]], new: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    """Reducer for parallel sub-task branches; a None update clears the results for a new turn"""
+    if new is None:
+        return []
+    return (existing or []) + new
+
 class State(TypedDict):
     messages: Annotated[List[Any], add_messages]
     success_criteria: str
     feedback_on_work: Optional[str]
     success_criteria_met: bool
     user_input_needed: bool
+    turn_start: int
+    recalled_context: Optional[str]
+    subtasks: List[str]
+    subtask_results: Annotated[List[Dict[str, str]], merge_subtask_results]
+    selected_tools: Optional[List[str]]
 
 class EvaluatorOutput(BaseModel):
     feedback: str = Field(description="Feedback on the assistant's response")
     success_criteria_met: bool = Field(description="Whether the success criteria have been met")
     user_input_needed: bool = Field(description="True if more input is needed from the user, or clarifications, or the assistant is stuck")
 
+class Plan(BaseModel):
+    subtasks: List[str] = Field(description="Independent, self-contained sub-questions that can be researched in parallel; empty if the request should not be split")
+
 class Sidekick:
-    def __init__(self):
+    def __init__(self, model_factory: Optional[ModelFactory] = None, cassette: Optional[Cassette] = None):
+        self.model_factory = model_factory
+        self.model_router = None
         self.worker_llm_with_tools = None
         self.evaluator_llm_with_output = None
         self.tools = []
         self.llm_with_tools = None
         self.graph = None
+        self.tool_node = None
+        self.output_governor = get_output_governor()
+        self.prompts = PromptAssembler()
+        self.tool_cache = ToolCallCache(sandbox_version=self._sandbox_version)
         self.sidekick_id = str(uuid.uuid4())
         self.memory = MemorySaver()
         self.browser = None
         self.playwright = None
         self._setup_complete = False
+        # Number of checkpointed messages per thread already processed by run_superstep
+        self._message_offsets: Dict[str, int] = {}
+        # Optional retrieval memory; when enabled the worker only sees the current turn
+        self.long_term_memory: Optional[VectorMemory] = None
+        self.memory_top_k = int(os.getenv("SIDEKICK_MEMORY_TOP_K", "4"))
+        # Optional record/replay of LLM, tool and recall I/O for deterministic runs
+        self.cassette = cassette if cassette is not None else Cassette.from_env()
+        if self.cassette is not None and self.cassette.replaying and model_factory is None:
+            self.model_factory = replay_model_factory
+        # Optional planner that fans multi-part requests out to parallel sub-task branches
+        self.planner_enabled = os.getenv("SIDEKICK_PLANNER", "false").lower() == "true"
+        self.max_subtasks = int(os.getenv("SIDEKICK_MAX_SUBTASKS", "4"))
+        self.subtask_tool_rounds = int(os.getenv("SIDEKICK_SUBTASK_TOOL_ROUNDS", "3"))
+        # Bind only the tools relevant to each turn; None binds every tool
+        self.tool_selector: Optional[ToolSelector] = None
+        self.request_tools = request_tools_tool()
 
     async def setup(self):
         """Setup the Sidekick with better error handling"""
@@ -64,6 +112,9 @@ class Sidekick:
                 print(f"Browser tools failed to initialize: {e}")
                 print("Continuing without browser tools...")
             
+            # Page reads go over HTTP first; the browser (if any) is only the fallback
+            self.tools.append(fetch_page_tool(self.browser))
+            
             # Get other tools
             try:
                 other_tool_list = await other_tools()
@@ -81,19 +132,36 @@ class Sidekick:
             # Initialize LLMs
             print("Initializing LLMs...")
             try:
-                worker_llm = ChatOpenAI(model="gpt-4o-mini")
-                if self.tools:
-                    self.worker_llm_with_tools = worker_llm.bind_tools(self.tools)
-                else:
-                    self.worker_llm_with_tools = worker_llm
-                
-                evaluator_llm = ChatOpenAI(model="gpt-4o-mini")
-                self.evaluator_llm_with_output = evaluator_llm.with_structured_output(EvaluatorOutput)
+                self.model_router = ModelRouter(
+                    prepare={
+                        "worker": lambda llm, names=None: llm.bind_tools(self._bindable_tools(names)) if self.tools else llm,
+                        # include_raw keeps the raw message so cached-token usage can be recorded
+                        "evaluator": lambda llm: llm.with_structured_output(EvaluatorOutput, include_raw=True),
+                        "planner": lambda llm: llm.with_structured_output(Plan, include_raw=True),
+                        "merge": lambda llm: llm,
+                    },
+                    model_factory=self.model_factory,
+                )
+                # Build the default routes up front so configuration errors surface during setup
+                self.worker_llm_with_tools = self.model_router.model("worker", self.model_router.routes["worker"]["fast"])
+                self.evaluator_llm_with_output = self.model_router.model("evaluator", self.model_router.routes["evaluator"]["fast"])
                 print("LLMs initialized successfully")
             except Exception as e:
                 print(f"Error initializing LLMs: {e}")
                 raise
             
+            if self.tools and os.getenv("SIDEKICK_TOOL_SELECTION", "true").lower() == "true":
+                self.tool_selector = ToolSelector(
+                    self.tools, grow_only=os.getenv("SIDEKICK_TOOL_SELECTION_GROW_ONLY", "true").lower() == "true"
+                )
+            
+            if os.getenv("SIDEKICK_LONG_TERM_MEMORY", "false").lower() == "true":
+                try:
+                    self.long_term_memory = VectorMemory()
+                    print("Long-term memory enabled")
+                except Exception as e:
+                    print(f"Long-term memory unavailable: {e}")
+            
             # Build graph
             print("Building workflow graph...")
             await self.build_graph()
@@ -107,63 +175,199 @@ class Sidekick:
 
     def worker(self, state: State) -> Dict[str, Any]:
         """Worker node that processes user requests"""
-        system_message = f"""You are a helpful assistant that can use tools to complete tasks.
-    You keep working on a task until either you have a question or clarification for the user, or the success criteria is met.
-    You have access to various tools to help you, including tools to browse the internet, manage files, run Python code, and search for information.
+        if self.long_term_memory is not None:
+            # Earlier turns are available through recalled_context instead
+            conversation = state["messages"][state.get("turn_start", 0):]
+        else:
+            conversation = state["messages"]
+        
+        messages = self.prompts.worker_messages(
+            conversation,
+            state["success_criteria"],
+            feedback=state.get("feedback_on_work"),
+            recalled_context=state.get("recalled_context")
+        )
+        
+        # Invoke the LLM chosen by the router for this call
+        try:
+            features = RoutingFeatures.build(
+                messages, state["messages"][state.get("turn_start", 0):], state["success_criteria"]
+            )
+            response = self._invoke_model("worker", features, messages, self._tool_variant(state.get("selected_tools")))
+            self.prompts.record_usage("worker", response)
+            return {"messages": [response]}
+        except Exception as e:
+            error_message = f"Error in worker: {str(e)}"
+            return {"messages": [AIMessage(content=error_message)]}
 
-    CRITICAL PYTHON EXECUTION RULES:
-    - When using the Python REPL tool, ALWAYS wrap function calls and variable outputs with print() statements
-    - NEVER just call a function without printing its result
-    - Example of WRONG code: compound_interest(10000, 5, 10)
-    - Example of CORRECT code: print(compound_interest(10000, 5, 10))
-    - Always show your calculations and results explicitly with print statements
-    - If you define a function, immediately test it with print() to show the output
+    def _select_tools(self, text: str) -> Optional[List[str]]:
+        return self.tool_selector.select(text) if self.tool_selector is not None else None
 
-    The current date and time is {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    @staticmethod
+    def _tool_variant(selected: Optional[List[str]]):
+        """Model variant key for a tool subset; bound models are cached per subset"""
+        return tuple(sorted(selected)) if selected is not None else None
 
-    This is the success criteria:
-    {state['success_criteria']}
+    def _bindable_tools(self, names=None) -> List[Any]:
+        if names is None:
+            return self.tools
+        return [t for t in self.tools if t.name in names] + [self.request_tools]
 
-    You should reply either with a question for the user about this assignment, or with your final response.
-    If you have a question for the user, you need to reply by clearly stating your question. An example might be:
+    def _invoke_model(self, node: str, features: RoutingFeatures, messages: List[Any], variant: Any = None) -> Any:
+        """Call the routed model, or serve the call from the cassette when replaying"""
+        if self.cassette is not None and self.cassette.replaying:
+            return self.cassette.replay_llm(node, messages)
+        response = self.model_router.invoke(node, features, messages, variant)
+        if self.cassette is not None:
+            self.cassette.record_llm(node, messages, response)
+        return response
 
-    Question: Please clarify whether you want a summary or a detailed answer
+    async def _execute_tools(self, state: State, request: AIMessage, config: RunnableConfig) -> List[ToolMessage]:
+        """Run a request's tool calls, or serve them from the cassette when replaying"""
+        if self.cassette is not None and self.cassette.replaying:
+            messages = []
+            for call in request.tool_calls:
+                recorded = self.cassette.replay_tool(call["name"], call["args"])
+                messages.append(ToolMessage(
+                    content=recorded["content"], name=call["name"], tool_call_id=call["id"], status=recorded["status"]
+                ))
+            return messages
+        with span(self.sidekick_id, "tools:" + ",".join(call["name"] for call in request.tool_calls)):
+            executed = await self.tool_node.ainvoke({**state, "messages": [request]}, config)
+        if self.cassette is not None:
+            args_by_id = {call["id"]: call["args"] for call in request.tool_calls}
+            for message in executed["messages"]:
+                self.cassette.record_tool(
+                    message.name, args_by_id.get(message.tool_call_id), message.content, getattr(message, "status", "success")
+                )
+        return executed["messages"]
 
-    If you've finished, reply with the final answer, and don't ask a question; simply reply with the answer.
-    """
-        
-        if state.get("feedback_on_work"):
-            system_message += f"""
-    Previously you thought you completed the assignment, but your reply was rejected because the success criteria was not met.
-    Here is the feedback on why this was rejected:
-    {state['feedback_on_work']}
-
-    IMPORTANT: If the previous attempt failed because Python code didn't show output, make sure to:
-    1. Add print() statements around ALL function calls and variable outputs
-    2. Show intermediate calculations with print statements
-    3. Display the final result clearly with descriptive print statements
-
-    With this feedback, please continue the assignment, ensuring that you meet the success criteria or have a question for the user."""
+    @staticmethod
+    def _sandbox_version() -> int:
+        # Writes through the tools and the app bump this; run_tools catches the rest once per round
+        return get_sandbox_index().version
+
+    async def run_tools(self, state: State, config: RunnableConfig) -> Dict[str, Any]:
+        """Tool node: serve repeated side-effect-free calls from the run's cache, execute
+        the rest, and cap each result to the output budget"""
+        request = state["messages"][-1]
+        calls = {call["id"]: call for call in request.tool_calls}
+        # Files the Python REPL wrote last round must invalidate cached sandbox reads
+        get_sandbox_index().refresh_if_dirty()
         
-        # Handle system message
-        found_system_message = False
-        messages = state["messages"][:]
-        for i, message in enumerate(messages):
-            if isinstance(message, SystemMessage):
-                messages[i] = SystemMessage(content=system_message)
-                found_system_message = True
-                break
+        results = {}
+        pending = []
+        selected = state.get("selected_tools")
+        widened = False
+        for call in request.tool_calls:
+            if call["name"] == REQUEST_TOOLS:
+                # Widening the tool set is handled here; the next worker call binds the new set
+                before = set(selected if selected is not None else [t.name for t in self.tools])
+                selected = self.tool_selector.widen(selected, call["args"].get("capability", "")) if self.tool_selector else None
+                widened = True
+                added = sorted(set(selected or [t.name for t in self.tools]) - before)
+                content = f"Enabled tools: {', '.join(added)}" if added else "All tools are already enabled"
+                results[call["id"]] = ToolMessage(content=content, name=REQUEST_TOOLS, tool_call_id=call["id"])
+                continue
+            cached = self.tool_cache.get(call["name"], call["args"])
+            if cached is not None:
+                results[call["id"]] = ToolMessage(content=cached, name=call["name"], tool_call_id=call["id"])
+            else:
+                pending.append(call)
         
-        if not found_system_message:
-            messages = [SystemMessage(content=system_message)] + messages
+        if pending:
+            if len(pending) < len(request.tool_calls):
+                request = request.model_copy(update={"tool_calls": pending})
+            for message in await self._execute_tools(state, request, config):
+                call = calls.get(message.tool_call_id, {})
+                message.content = self.output_governor.govern(
+                    message.name, message.content, call.get("args"), session=self.sidekick_id
+                )
+                if getattr(message, "status", "success") != "error":
+                    self.tool_cache.put(message.name, call.get("args"), message.content)
+                results[message.tool_call_id] = message
         
-        # Invoke the LLM
+        update = {"messages": [results[call_id] for call_id in calls if call_id in results]}
+        if widened:
+            update["selected_tools"] = selected
+        return update
+
+    def planner(self, state: State) -> Dict[str, Any]:
+        """Planner node: split a multi-part request into independent sub-tasks, if it has any"""
+        turn_start = state.get("turn_start", 0)
+        request = state["messages"][-1].content
+        earlier = state["messages"][max(0, turn_start - 4):turn_start]
+        messages = self.prompts.planner_messages(
+            self.format_conversation(earlier) if earlier else "",
+            request,
+            state["success_criteria"],
+        )
+        subtasks = []
         try:
-            response = self.worker_llm_with_tools.invoke(messages)
-            return {"messages": [response]}
+            features = RoutingFeatures.build(messages, [], state["success_criteria"])
+            output = self._invoke_model("planner", features, messages)
+            self.prompts.record_usage("planner", output["raw"])
+            if output["parsed"] is not None:
+                subtasks = [task.strip() for task in output["parsed"].subtasks if task.strip()][: self.max_subtasks]
         except Exception as e:
-            error_message = f"Error in worker: {str(e)}"
-            return {"messages": [AIMessage(content=error_message)]}
+            print(f"Planner failed, continuing without sub-tasks: {e}")
+        # A single sub-task is just the request again; let the worker handle it
+        return {"subtasks": subtasks if len(subtasks) > 1 else [], "subtask_results": None}
+
+    def planner_router(self, state: State):
+        """Fan out one branch per sub-task, or continue with the regular worker loop"""
+        if not state.get("subtasks"):
+            return "worker"
+        request = state["messages"][-1].content
+        return [Send("subtask", {"task": task, "request": request}) for task in state["subtasks"]]
+
+    async def subtask(self, branch: Dict[str, str], config: RunnableConfig) -> Dict[str, Any]:
+        """One parallel branch: a small worker/tool loop with its own context and tool budget.
+
+        Branches fan out several model calls at once, so they queue at batch
+        priority and other sessions' interactive calls are admitted first.
+        """
+        messages = self.prompts.subtask_messages(branch["request"], branch["task"])
+        selected = self._select_tools(branch["task"])
+        with priority(BATCH):
+            try:
+                response = None
+                for _ in range(self.subtask_tool_rounds + 1):
+                    features = RoutingFeatures.build(messages, messages[1:], "")
+                    response = await asyncio.to_thread(
+                        self._invoke_model, "worker", features, messages, self._tool_variant(selected)
+                    )
+                    messages.append(response)
+                    if not getattr(response, "tool_calls", None) or not self.tools:
+                        break
+                    executed = await self.run_tools({"messages": messages, "selected_tools": selected}, config)
+                    selected = executed.get("selected_tools", selected)
+                    messages.extend(executed["messages"])
+                if getattr(response, "tool_calls", None):
+                    # Out of tool rounds: ask for an answer from what was gathered so far
+                    wrap_up = self.prompts.subtask_wrap_up(messages)
+                    features = RoutingFeatures.build(wrap_up, messages[1:], "")
+                    response = await asyncio.to_thread(self._invoke_model, "merge", features, wrap_up)
+                answer = response.content or "(no answer)"
+            except Exception as e:
+                answer = f"(sub-task failed: {e})"
+        return {"subtask_results": [{"task": branch["task"], "answer": answer}]}
+
+    def merge(self, state: State) -> Dict[str, Any]:
+        """Merge node: combine the sub-task answers into one reply for the evaluator"""
+        results = state.get("subtask_results") or []
+        request = state["messages"][-1].content
+        messages = self.prompts.merge_messages(request, state["success_criteria"], results)
+        try:
+            features = RoutingFeatures.build(messages, [], state["success_criteria"])
+            response = self._invoke_model("merge", features, messages)
+            self.prompts.record_usage("merge", response)
+            return {"messages": [AIMessage(content=response.content)]}
+        except Exception as e:
+            # Fall back to the raw sub-task answers so the evaluator still has something to judge
+            combined = "\n\n".join(f"{r['task']}\n{r['answer']}" for r in results)
+            print(f"Merge failed: {e}")
+            return {"messages": [AIMessage(content=combined)]}
 
     def worker_router(self, state: State) -> str:
         """Route based on whether the last message has tool calls"""
@@ -190,39 +394,21 @@ class Sidekick:
         try:
             last_response = state["messages"][-1].content
 
-            system_message = """You are an evaluator that determines if a task has been completed successfully by an Assistant.
-Assess the Assistant's last response based on the given criteria. Respond with your feedback, and with your decision on whether the success criteria has been met,
-and whether more input is needed from the user."""
-            
-            user_message = f"""You are evaluating a conversation between the User and Assistant. You decide what action to take based on the last response from the Assistant.
-
-The entire conversation with the assistant, with the user's original request and all replies, is:
-{self.format_conversation(state['messages'])}
-
-The success criteria for this assignment is:
-{state['success_criteria']}
-
-And the final response from the Assistant that you are evaluating is:
-{last_response}
-
-Respond with your feedback, and decide if the success criteria is met by this response.
-Also, decide if more user input is required, either because the assistant has a question, needs clarification, or seems to be stuck and unable to answer without help.
-
-The Assistant has access to various tools including file management, web browsing, Python execution, and search.
-If the Assistant says they have completed a task using tools, you should generally trust them unless the response is clearly inadequate.
-Overall you should give the Assistant the benefit of the doubt if they say they've done something. But you should reject if you feel that more work should go into this.
-"""
-            
-            if state.get("feedback_on_work"):
-                user_message += f"\nAlso, note that in a prior attempt from the Assistant, you provided this feedback: {state['feedback_on_work']}\n"
-                user_message += "If you're seeing the Assistant repeating the same mistakes, then consider responding that user input is required."
-            
-            evaluator_messages = [
-                SystemMessage(content=system_message), 
-                HumanMessage(content=user_message)
-            ]
+            evaluator_messages = self.prompts.evaluator_messages(
+                self.format_conversation(state["messages"]),
+                state["success_criteria"],
+                last_response,
+                feedback=state.get("feedback_on_work")
+            )
 
-            eval_result = self.evaluator_llm_with_output.invoke(evaluator_messages)
+            features = RoutingFeatures.build(
+                evaluator_messages, state["messages"][state.get("turn_start", 0):], state["success_criteria"]
+            )
+            output = self._invoke_model("evaluator", features, evaluator_messages)
+            self.prompts.record_usage("evaluator", output["raw"])
+            eval_result = output["parsed"]
+            if eval_result is None:
+                raise output["parsing_error"] or ValueError("Evaluator returned no structured output")
             
             return {
                 "messages": [AIMessage(content=f"Evaluator Feedback: {eval_result.feedback}")],
@@ -256,8 +442,13 @@ Overall you should give the Assistant the benefit of the doubt if they say they'
             # Add nodes
             graph_builder.add_node("worker", self.worker)
             if self.tools:
-                graph_builder.add_node("tools", ToolNode(tools=self.tools))
+                self.tool_node = ToolNode(tools=self.tools)
+                graph_builder.add_node("tools", self.run_tools)
             graph_builder.add_node("evaluator", self.evaluator)
+            if self.planner_enabled:
+                graph_builder.add_node("planner", self.planner)
+                graph_builder.add_node("subtask", self.subtask)
+                graph_builder.add_node("merge", self.merge)
 
             # Add edges
             if self.tools:
@@ -276,7 +467,15 @@ Overall you should give the Assistant the benefit of the doubt if they say they'
                 self.route_based_on_evaluation, 
                 {"worker": "worker", "END": END}
             )
-            graph_builder.add_edge(START, "worker")
+            if self.planner_enabled:
+                # Planned turns skip the worker loop: sub-tasks -> merge -> evaluator;
+                # a rejected merged answer goes back to the worker like any other
+                graph_builder.add_edge(START, "planner")
+                graph_builder.add_conditional_edges("planner", self.planner_router, ["subtask", "worker"])
+                graph_builder.add_edge("subtask", "merge")
+                graph_builder.add_edge("merge", "evaluator")
+            else:
+                graph_builder.add_edge(START, "worker")
 
             # Compile the graph
             self.graph = graph_builder.compile(checkpointer=self.memory)
@@ -286,63 +485,190 @@ Overall you should give the Assistant the benefit of the doubt if they say they'
             print(f"Error building graph: {e}")
             raise
 
-    async def run_superstep(self, message, success_criteria, history):
-        """Run a complete workflow step"""
+    def sync_message_offset(self, message_count: int):
+        """Mark the first message_count checkpointed messages as already processed"""
+        self._message_offsets[self.sidekick_id] = message_count
+
+    async def _resync_message_offset(self):
+        """Align the thread's message offset with its checkpoint after a failed run"""
+        try:
+            config = {"configurable": {"thread_id": self.sidekick_id}}
+            snapshot = await self.graph.aget_state(config)
+            self._message_offsets[self.sidekick_id] = len(snapshot.values.get("messages", []))
+        except Exception as e:
+            print(f"Could not resync message offset: {e}")
+
+    async def _recall(self, message: str) -> Optional[str]:
+        """Fetch the most relevant memory snippets for this turn, if memory is enabled"""
+        if self.long_term_memory is None:
+            return None
+        if self.cassette is not None and self.cassette.replaying:
+            return self.cassette.replay_recall(message)
+        try:
+            await asyncio.to_thread(self.long_term_memory.sync_sandbox)
+            recalled = await asyncio.to_thread(self.long_term_memory.recall, message, self.memory_top_k) or None
+        except Exception as e:
+            print(f"Memory recall failed: {e}")
+            recalled = None
+        if self.cassette is not None:
+            self.cassette.record_recall(message, recalled)
+        return recalled
+
+    async def _remember(self, message: str, response: str, turn_id: int):
+        """Add a completed turn to long-term memory, if memory is enabled"""
+        if self.long_term_memory is None or (self.cassette is not None and self.cassette.replaying):
+            return
+        try:
+            await asyncio.to_thread(self.long_term_memory.add_turn, message, response, str(turn_id))
+        except Exception as e:
+            print(f"Could not store turn in memory: {e}")
+
+    @staticmethod
+    def _node_event(node: str, update: Any) -> Dict[str, Any]:
+        """Summarize one graph node's state update for streaming clients"""
+        event = {"event": "node", "node": node}
+        if not isinstance(update, dict):
+            return event
+        messages = []
+        for msg in update.get("messages") or []:
+            entry = {"type": getattr(msg, "type", "unknown"), "content": str(getattr(msg, "content", ""))}
+            tool_calls = getattr(msg, "tool_calls", None)
+            if tool_calls:
+                entry["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in tool_calls]
+            if isinstance(msg, ToolMessage):
+                entry["tool"] = msg.name
+            messages.append(entry)
+        if messages:
+            event["messages"] = messages
+        for key in ("feedback_on_work", "success_criteria_met", "user_input_needed", "subtasks", "subtask_results"):
+            if key in update:
+                event[key] = update[key]
+        return event
+
+    async def astream_superstep(self, message, success_criteria, history):
+        """Run a complete workflow step, yielding an event as each graph node finishes.
+
+        Yields ``{"event": "node", ...}`` per node update, then a final
+        ``{"event": "done"}`` (or ``{"event": "error"}``) carrying the updated
+        history. The caller's history is updated in place, as in run_superstep.
+        """
+        config = {"configurable": {"thread_id": self.sidekick_id, "recursion_limit": 100}}
+        offset_synced = False
         try:
             if not self._setup_complete:
                 raise Exception("Sidekick not properly initialized")
-                
-            config = {"configurable": {"thread_id": self.sidekick_id, "recursion_limit": 100}}
 
             state = {
                 "messages": [HumanMessage(content=message)],
                 "success_criteria": success_criteria or "The answer should be clear and accurate",
                 "feedback_on_work": None,
                 "success_criteria_met": False,
-                "user_input_needed": False
+                "user_input_needed": False,
+                "subtasks": [],
+                "subtask_results": None,
+                "selected_tools": self._select_tools(message)
             }
             
-            result = await self.graph.ainvoke(state, config=config)
+            offset = self._message_offsets.get(self.sidekick_id, 0)
+            state["turn_start"] = offset
+            self.tool_cache.reset()
+            state["recalled_context"] = await self._recall(message)
+            async for chunk in self.graph.astream(state, config=config, stream_mode="updates"):
+                for node, update in chunk.items():
+                    yield self._node_event(node, update)
+            result = (await self.graph.aget_state(config)).values
             
-            # Format the response
-            user_msg = {"role": "user", "content": message}
+            # Only look at the messages added during this turn; the checkpointed
+            # thread also holds every message from earlier turns
+            all_messages = result["messages"]
+            new_messages = all_messages[offset:]
+            self._message_offsets[self.sidekick_id] = len(all_messages)
+            offset_synced = True
             
             # Find the assistant's main response (not the evaluator feedback)
             assistant_response = None
             evaluator_feedback = None
             
-            for msg in result["messages"]:
+            for msg in new_messages:
                 if isinstance(msg, AIMessage):
                     if msg.content and "Evaluator Feedback:" in msg.content:
                         evaluator_feedback = {"role": "assistant", "content": msg.content}
                     elif msg.content and not msg.content.startswith("Evaluator"):
                         assistant_response = {"role": "assistant", "content": msg.content}
             
-            # Build response history
-            response_history = history + [user_msg]
+            # Update the caller's history in place
+            history.append({"role": "user", "content": message})
             if assistant_response:
-                response_history.append(assistant_response)
+                history.append(assistant_response)
             if evaluator_feedback:
-                response_history.append(evaluator_feedback)
+                history.append(evaluator_feedback)
+            
+            if assistant_response:
+                await self._remember(message, assistant_response["content"], len(history))
+            
+            if self.cassette is not None and not self.cassette.replaying:
+                await asyncio.to_thread(self.cassette.save)
                 
-            return response_history
+            yield {"event": "done", "history": history}
             
         except Exception as e:
             error_msg = f"Error in run_superstep: {str(e)}"
             print(error_msg)
-            return history + [
+            await self._resync_message_offset()
+            offset_synced = True
+            history.extend([
                 {"role": "user", "content": message},
                 {"role": "assistant", "content": f"I encountered an error: {error_msg}"}
-            ]
+            ])
+            yield {"event": "error", "error": error_msg, "history": history}
+        finally:
+            if not offset_synced:
+                # A streaming client went away mid-turn (cancelled, or closed at a
+                # yield); keep the offset consistent with whatever the checkpoint holds
+                await self._resync_message_offset()
+
+    async def run_superstep(self, message, success_criteria, history):
+        """Run a complete workflow step"""
+        async for _ in self.astream_superstep(message, success_criteria, history):
+            pass
+        return history
     
+    def profile_labels(self) -> Dict[Any, str]:
+        """Code objects of graph nodes, model calls and tools, mapped to the labels
+        the sampling profiler attributes their time to"""
+        labels = {
+            getattr(Sidekick, node).__code__: f"node:{node}"
+            for node in ("worker", "run_tools", "evaluator", "planner", "subtask", "merge")
+        }
+        labels[Sidekick._invoke_model.__code__] = "llm:invoke"
+        # Structured-output chains call the model from their own executor threads
+        labels[BaseChatModel.invoke.__code__] = "llm:invoke"
+        names: Dict[Any, List[str]] = {}
+        for tool in self.tools:
+            functions = [getattr(tool, "func", None), getattr(tool, "coroutine", None)]
+            if not type(tool).__module__.startswith("langchain_core"):
+                # Toolkit tools implement _run/_arun on their own class
+                functions += [type(tool).__dict__.get("_run"), type(tool).__dict__.get("_arun")]
+            for function in functions:
+                code = getattr(function, "__code__", None)
+                if code is not None:
+                    names.setdefault(code, []).append(tool.name)
+        for code, tool_names in names.items():
+            # Wrappers shared by several tools get a combined label
+            labels[code] = "tool:" + "|".join(sorted(set(tool_names)))
+        return labels
+
     def cleanup(self):
         """Clean up resources"""
         print("Cleaning up Sidekick resources...")
         try:
-            cleanup_browser()
+            if self.browser is not None:
+                release_browser()
         except Exception as e:
             print(f"Error during cleanup: {e}")
         
+        self.output_governor.discard(self.sidekick_id)
+
         # Reset state
         self.browser = None
         self.playwright = None
@@ -3,41 +3,102 @@ from langchain_community.agent_toolkits import PlayWrightBrowserToolkit
 from dotenv import load_dotenv
 import os
 import sys
-import requests
 from langchain.agents import Tool
 from langchain_community.agent_toolkits import FileManagementToolkit
-from langchain_community.tools.wikipedia.tool import WikipediaQueryRun
+from langchain_community.tools.wikipedia.tool import WikipediaQueryRun, WikipediaQueryInput
 from langchain_experimental.tools import PythonREPLTool
-from langchain_community.utilities import GoogleSerperAPIWrapper
+from langchain_core.tools import StructuredTool
 from langchain_community.utilities.wikipedia import WikipediaAPIWrapper
 import asyncio
 import threading
+from .notifications import get_notifier
+from .search import SearchInput, get_searcher, format_results
+from .prefetch import get_prefetcher
+from .wiki_index import LocalWikipediaWrapper
+from .sandbox_index import get_sandbox_index, format_search_results
+from .page_extract import ExtractTextInput, extract_readable_text
+from .output_budget import ReadToolOutputInput, get_output_governor
+from .async_runtime import run_sync
+from .web_fetch import FetchPageInput, get_fetcher
+from .tool_slo import PartialResult, with_slo
+from .file_edit import (
+    AppendFileInput, PatchFileInput, ReplaceLinesInput,
+    append_text, patch_lines, replace_line_range, sandbox_path,
+)
 
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy()) 
 
 load_dotenv(override=True)
 
-pushover_token = os.getenv("PUSHOVER_TOKEN")
-pushover_user = os.getenv("PUSHOVER_USER")
-pushover_url = "https://api.pushover.net/1/messages.json"
-serper = GoogleSerperAPIWrapper()
+
+def compact_extract_text_tool(browser):
+    """Replacement for the toolkit's extract_text that returns only the page's main content"""
+    from langchain_community.tools.playwright.utils import aget_current_page
+    
+    async def _extract(focus=None, max_chars=6000):
+        page = await aget_current_page(browser)
+        html = await page.content()
+        return extract_readable_text(html, focus=focus, max_chars=max_chars, base_url=page.url).render()
+    
+    return StructuredTool.from_function(
+        coroutine=_extract,
+        name="extract_text",
+        description="Extract the main readable text of the current web page, without navigation, "
+                    "boilerplate or repeated links. Optionally pass a CSS selector or keywords as focus "
+                    "to narrow the result, and max_chars to cap its size",
+        args_schema=ExtractTextInput
+    )
+
+def fetch_page_tool(browser=None):
+    """Read a page over plain HTTP, loading it in the browser only when it needs JavaScript"""
+
+    async def _fetch(url, focus=None, max_chars=6000):
+        result = await get_fetcher().fetch(url, focus=focus, max_chars=max_chars, browser=browser)
+        if result.partial:
+            raise PartialResult(result.render())
+        return result.render()
+
+    return StructuredTool.from_function(
+        coroutine=_fetch,
+        name="fetch_page",
+        description="Read the main text of a web page by URL. Much faster than navigating the browser; "
+                    "pages that need JavaScript are rendered in the browser automatically. Prefer this "
+                    "for reading pages, and the browser tools for clicking or filling in forms",
+        args_schema=FetchPageInput,
+        handle_tool_error=True
+    )
+
+def _browser_tools(browser):
+    toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=browser)
+    return [
+        compact_extract_text_tool(browser) if tool.name == "extract_text" else tool
+        for tool in toolkit.get_tools()
+    ]
 
 # Global variables to store browser instance
 _browser_instance = None
 _playwright_instance = None
+# Event loop the browser was launched on; Playwright objects may only be used from it
+_browser_loop = None
+# Number of Sidekicks currently holding the shared browser
+_browser_users = 0
 
 async def playwright_tools():
     """Initialize Playwright tools with better error handling for Streamlit"""
-    global _browser_instance, _playwright_instance
+    global _browser_instance, _playwright_instance, _browser_loop, _browser_users
     
     try:
         # Try to reuse existing browser instance
         if _browser_instance and _playwright_instance:
-            toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=_browser_instance)
-            return toolkit.get_tools(), _browser_instance, _playwright_instance
+            if _browser_loop is not asyncio.get_running_loop():
+                print("Browser is owned by another event loop; browser tools unavailable here")
+                return [], None, None
+            _browser_users += 1
+            return _browser_tools(_browser_instance), _browser_instance, _playwright_instance
         
         # Create new browser instance
+        _browser_loop = asyncio.get_running_loop()
         _playwright_instance = await async_playwright().start()
         
         # Try headless first, fall back to visible browser if needed
@@ -53,8 +114,8 @@ async def playwright_tools():
                 args=['--no-sandbox', '--disable-dev-shm-usage']
             )
         
-        toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=_browser_instance)
-        return toolkit.get_tools(), _browser_instance, _playwright_instance
+        _browser_users = 1
+        return _browser_tools(_browser_instance), _browser_instance, _playwright_instance
         
     except Exception as e:
         print(f"Error initializing Playwright: {e}")
@@ -62,42 +123,148 @@ async def playwright_tools():
         return [], None, None
 
 def playwright_tools_sync():
-    """Synchronous wrapper for Playwright tools initialization"""
-    def _init_playwright():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    """Synchronous wrapper for Playwright tools initialization.
+
+    The browser is launched on the shared background loop, which keeps running
+    after this returns, so the browser stays usable from later turns.
+    """
+    try:
+        return run_sync(playwright_tools())
+    except Exception as e:
+        print(f"Playwright initialization failed: {e}")
+        return [], None, None
+
+def push(text: str):
+    """Queue a push notification to the user; delivery happens in the background"""
+    try:
+        return get_notifier().enqueue(text)
+    except Exception as e:
+        return f"Error sending notification: {str(e)}"
+
+def web_search(queries):
+    """Run one or more web searches concurrently and merge the results"""
+    try:
+        merged = get_searcher().search(queries)
+        get_prefetcher().schedule([r["link"] for r in merged["results"]])
+    except Exception as e:
+        return f"Error running search: {str(e)}"
+    if merged.get("partial"):
+        raise PartialResult(format_results(merged))
+    return format_results(merged)
+
+async def aweb_search(queries):
+    """Async variant of web_search used when the graph runs asynchronously"""
+    try:
+        merged = await get_searcher().asearch(queries)
+        # The worker usually opens a top result next; start downloading them now
+        get_prefetcher().schedule([r["link"] for r in merged["results"]])
+    except Exception as e:
+        return f"Error running search: {str(e)}"
+    if merged.get("partial"):
+        # Some queries missed the deadline; return the rest without caching them
+        raise PartialResult(format_results(merged))
+    return format_results(merged)
+
+# File tools that change the sandbox, and the argument(s) naming the affected paths
+_FILE_WRITE_PATH_ARGS = {
+    "write_file": ("file_path",),
+    "copy_file": ("destination_path",),
+    "move_file": ("source_path", "destination_path"),
+    "file_delete": ("file_path",),
+}
+
+def _marks_sandbox_dirty(tool):
+    """Wrap a tool that can write files the index does not see, so the next search rescans"""
+    
+    def _run(query: str) -> str:
         try:
-            return loop.run_until_complete(playwright_tools())
-        except Exception as e:
-            print(f"Playwright initialization failed: {e}")
-            return [], None, None
+            return tool.invoke({"query": query})
         finally:
-            # Don't close the loop here as it's needed for the browser
-            pass
+            get_sandbox_index().mark_dirty()
     
-    # Run in a separate thread to avoid event loop conflicts
-    import concurrent.futures
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future = executor.submit(_init_playwright)
-        return future.result()
+    return StructuredTool.from_function(
+        func=_run,
+        name=tool.name,
+        description=tool.description
+    )
 
-def push(text: str):
-    """Send a push notification to the user"""
+def _index_on_write(tool):
+    """Wrap a file tool so the sandbox index is updated with every change it makes"""
+    path_args = _FILE_WRITE_PATH_ARGS[tool.name]
+    
+    def _run(**kwargs):
+        if tool.name == "write_file" and kwargs.get("append"):
+            # Appends go through append_file so only the new text is indexed
+            return append_file(kwargs["file_path"], kwargs.get("text", ""))
+        result = tool.invoke(kwargs)
+        index = get_sandbox_index()
+        for arg in path_args:
+            if kwargs.get(arg):
+                index.update(kwargs[arg])
+        return result
+    
+    return StructuredTool.from_function(
+        func=_run,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema
+    )
+
+def append_file(file_path: str, text: str):
+    """Append text to a sandbox file, indexing only what was added"""
     try:
-        if pushover_token and pushover_user:
-            response = requests.post(
-                pushover_url, 
-                data={"token": pushover_token, "user": pushover_user, "message": text},
-                timeout=10
-            )
-            if response.status_code == 200:
-                return "Push notification sent successfully"
-            else:
-                return f"Failed to send notification: {response.status_code}"
-        else:
-            return "Pushover credentials not configured"
+        path = sandbox_path(file_path)
+        offset, size = append_text(path, text)
+        get_sandbox_index().append(path, offset)
+        return f"Appended {len(text)} characters to {file_path} (now {size} bytes)"
     except Exception as e:
-        return f"Error sending notification: {str(e)}"
+        return f"Error: {str(e)}"
+
+def patch_file(file_path: str, diff: str):
+    """Apply a unified diff to a sandbox file"""
+    try:
+        path = sandbox_path(file_path)
+        added, removed = patch_lines(path, diff)
+        get_sandbox_index().update(path)
+        return f"Patched {file_path}: {added} lines added, {removed} removed"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def replace_lines(file_path: str, start_line: int, end_line: int, text: str):
+    """Replace a range of lines in a sandbox file"""
+    try:
+        path = sandbox_path(file_path)
+        total = replace_line_range(path, start_line, end_line, text)
+        get_sandbox_index().update(path)
+        return f"Replaced lines {start_line}-{end_line} of {file_path} (now {total} lines)"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def file_edit_tools():
+    """Tools that change part of a file instead of rewriting all of it"""
+    return [
+        StructuredTool.from_function(
+            func=append_file,
+            name="append_file",
+            description="Add text to the end of a file in the sandbox, creating it if needed. Use this to build "
+                        "a report section by section instead of rewriting the whole file with write_file",
+            args_schema=AppendFileInput
+        ),
+        StructuredTool.from_function(
+            func=patch_file,
+            name="patch_file",
+            description="Change part of a file in the sandbox by applying a unified diff. Only the changed lines "
+                        "and a little context need to be sent, so this is much cheaper than rewriting a large file",
+            args_schema=PatchFileInput
+        ),
+        StructuredTool.from_function(
+            func=replace_lines,
+            name="replace_lines",
+            description="Replace, insert or delete a range of lines in a file in the sandbox by line number "
+                        "(search_sandbox shows line numbers)",
+            args_schema=ReplaceLinesInput
+        ),
+    ]
 
 def get_file_tools():
     """Get file management tools"""
@@ -105,11 +272,51 @@ def get_file_tools():
         # Ensure sandbox directory exists
         os.makedirs("sandbox", exist_ok=True)
         toolkit = FileManagementToolkit(root_dir="sandbox")
-        return toolkit.get_tools()
+        return [
+            _index_on_write(tool) if tool.name in _FILE_WRITE_PATH_ARGS else tool
+            for tool in toolkit.get_tools()
+        ] + file_edit_tools()
     except Exception as e:
         print(f"Error initializing file tools: {e}")
         return []
 
+def search_sandbox(query: str, max_results: int = 5):
+    """Search the text files in the sandbox and return ranked line snippets"""
+    try:
+        return format_search_results(get_sandbox_index().search(query, k=max_results))
+    except Exception as e:
+        return f"Error searching sandbox: {str(e)}"
+
+def read_tool_output(reference: str, page: int = 1):
+    """Read a page of an oversized tool result stored in the sandbox"""
+    try:
+        return get_output_governor().read_page(reference, page)
+    except Exception as e:
+        return f"Error reading tool output: {str(e)}"
+
+def get_wikipedia_tool():
+    """Wikipedia tool backed by the offline snapshot index when WIKIPEDIA_INDEX_DIR is set"""
+    index_dir = os.getenv("WIKIPEDIA_INDEX_DIR")
+    if not index_dir:
+        return WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+    
+    live_fallback = os.getenv("WIKIPEDIA_LIVE_FALLBACK", "false").lower() == "true"
+    try:
+        local_wikipedia = LocalWikipediaWrapper(index_dir, live_fallback=live_fallback)
+    except Exception as e:
+        if not live_fallback:
+            raise
+        print(f"Wikipedia index unavailable, using live API: {e}")
+        return WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
+    
+    print(f"Using offline Wikipedia index at {index_dir}")
+    return StructuredTool.from_function(
+        func=local_wikipedia.run,
+        name=WikipediaQueryRun.model_fields["name"].default,
+        description=WikipediaQueryRun.model_fields["description"].default,
+        args_schema=WikipediaQueryInput
+    )
+
 async def other_tools():
     """Get other tools (non-Playwright)"""
     tools = []
@@ -126,15 +333,27 @@ async def other_tools():
     try:
         file_tools = get_file_tools()
         tools.extend(file_tools)
+        tools.append(StructuredTool.from_function(
+            func=search_sandbox,
+            name="search_sandbox",
+            description="Full-text search over the files in the sandbox. Returns the best matching files "
+                        "with the matching lines and their line numbers, without reading whole files. "
+                        "Use this to find a fact in the sandbox before reading a file"
+        ))
     except Exception as e:
         print(f"File tools unavailable: {e}")
     
     # Search tool
     try:
-        tool_search = Tool(
+        tool_search = StructuredTool.from_function(
+            func=web_search,
+            coroutine=aweb_search,
             name="search",
-            func=serper.run,
-            description="Use this tool when you want to get the results of an online web search"
+            description="Use this tool when you want to get the results of an online web search. "
+                        "Pass several queries in one call to research multiple angles in parallel; "
+                        "results are merged and de-duplicated by URL",
+            args_schema=SearchInput,
+            handle_tool_error=True
         )
         tools.append(tool_search)
     except Exception as e:
@@ -142,46 +361,84 @@ async def other_tools():
     
     # Wikipedia tool
     try:
-        wikipedia = WikipediaAPIWrapper()
-        wiki_tool = WikipediaQueryRun(api_wrapper=wikipedia)
-        tools.append(wiki_tool)
+        tools.append(with_slo(get_wikipedia_tool()))
     except Exception as e:
         print(f"Wikipedia tool unavailable: {e}")
     
+    # Paging through tool outputs that exceeded the output budget
+    tools.append(StructuredTool.from_function(
+        func=read_tool_output,
+        name="read_tool_output",
+        description="Read one page of a tool result that was truncated because it was too large. "
+                    "Pass the reference given in the truncated result and a page number",
+        args_schema=ReadToolOutputInput
+    ))
+    
     # Python REPL tool
     try:
         python_repl = PythonREPLTool()
-        tools.append(python_repl)
+        tools.append(_marks_sandbox_dirty(python_repl))
     except Exception as e:
         print(f"Python REPL tool unavailable: {e}")
     
     return tools
 
+def browser_context_count() -> int:
+    """Number of open contexts in the shared browser (0 if none is running)"""
+    try:
+        return len(_browser_instance.contexts) if _browser_instance else 0
+    except Exception:
+        return 0
+
+def browser_user_count() -> int:
+    return _browser_users
+
+def release_browser():
+    """Drop one Sidekick's hold on the shared browser, closing it with the last one"""
+    global _browser_users
+    _browser_users = max(0, _browser_users - 1)
+    if _browser_users == 0:
+        cleanup_browser()
+
 def cleanup_browser():
-    """Clean up browser resources"""
-    global _browser_instance, _playwright_instance
+    """Close the browser and Playwright on the event loop that launched them"""
+    global _browser_instance, _playwright_instance, _browser_loop, _browser_users
+    
+    browser, playwright, loop = _browser_instance, _playwright_instance, _browser_loop
+    _browser_instance = None
+    _playwright_instance = None
+    _browser_loop = None
+    _browser_users = 0
     
     async def _cleanup():
-        if _browser_instance:
+        if browser:
             try:
-                await _browser_instance.close()
+                await browser.close()
             except Exception as e:
                 print(f"Error closing browser: {e}")
         
-        if _playwright_instance:
+        if playwright:
             try:
-                await _playwright_instance.stop()
+                await playwright.stop()
             except Exception as e:
                 print(f"Error stopping playwright: {e}")
     
-    if _browser_instance or _playwright_instance:
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(_cleanup())
-            loop.close()
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
-        finally:
-            _browser_instance = None
-            _playwright_instance = None
+    if not (browser or playwright):
+        return
+    if loop is None or loop.is_closed() or not loop.is_running():
+        # The owning loop is gone, and with it the Playwright connection;
+        # the driver subprocess exits when its pipe closes
+        print("Browser event loop is no longer running; dropping browser references")
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    try:
+        if running is loop:
+            # Can't block the owning loop on itself; let it finish the close
+            loop.create_task(_cleanup())
+        else:
+            asyncio.run_coroutine_threadsafe(_cleanup(), loop).result(timeout=30)
+    except Exception as e:
+        print(f"Error during cleanup: {e}")
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from . import metrics
+from .async_runtime import call_soon, get_background_loop, run_async
+from .search import normalize_url
+
+
+@dataclass
+class PrefetchedPage:
+    raw: tuple
+    size: int
+    fetched: float
+    used: bool = False
+
+
+class SpeculativePrefetcher:
+    """Downloads the top search results while the worker is still deciding what to open.
+
+    When ``search`` returns, the first ``top_k`` result URLs are fetched over
+    HTTP on the shared background loop, bounded by a semaphore and a byte
+    budget for the whole cache. ``fetch_page`` then looks a URL up here first:
+    a finished download is served immediately and an in-flight one is awaited
+    instead of starting a second request. Pages are kept raw and extracted
+    when served, since focus and size limits are only known then.
+
+    Entries expire after ``ttl`` seconds. An entry dropped without ever being
+    served counts as waste, so ``hit_ratio`` (lookups served from here) and
+    ``waste_ratio`` (downloads never used) show whether ``top_k`` is right.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        top_k: int = 3,
+        ttl: float = 120.0,
+        max_concurrency: int = 3,
+        max_bytes: int = 8_000_000,
+    ):
+        self.enabled = enabled
+        self.top_k = top_k
+        self.ttl = ttl
+        self.max_concurrency = max_concurrency
+        self.max_bytes = max_bytes
+        # Loop-confined state: only touched from the background loop
+        self._pages: "OrderedDict[str, PrefetchedPage]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.scheduled = 0
+        self.fetched = 0
+        self.failed = 0
+        self.hits = 0
+        self.misses = 0
+        self.used = 0
+        self.wasted = 0
+
+    @classmethod
+    def from_env(cls) -> "SpeculativePrefetcher":
+        return cls(
+            enabled=os.getenv("SIDEKICK_PREFETCH", "false").lower() == "true",
+            top_k=int(os.getenv("SIDEKICK_PREFETCH_K", "3")),
+            ttl=float(os.getenv("SIDEKICK_PREFETCH_TTL", "120")),
+            max_concurrency=int(os.getenv("SIDEKICK_PREFETCH_CONCURRENCY", "3")),
+            max_bytes=int(float(os.getenv("SIDEKICK_PREFETCH_MB", "8")) * 1024 * 1024),
+        )
+
+    # Scheduling
+
+    def schedule(self, urls: List[str]):
+        """Start background downloads of the first ``top_k`` new URLs; returns immediately"""
+        if not self.enabled or self.top_k <= 0:
+            return
+        call_soon(self._schedule, list(urls))
+
+    def _schedule(self, urls: List[str]):
+        self._expire()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = get_background_loop()
+        started = 0
+        for url in urls:
+            if started >= self.top_k:
+                break
+            key = normalize_url(url)
+            if not url.startswith(("http://", "https://")) or key in self._pages or key in self._inflight:
+                continue
+            started += 1
+            self.scheduled += 1
+            metrics.increment("prefetch.scheduled")
+            self._inflight[key] = loop.create_task(self._download(key, url))
+
+    async def _download(self, key: str, url: str) -> Optional[tuple]:
+        from .web_fetch import get_fetcher
+
+        try:
+            async with self._semaphore:
+                raw = await get_fetcher().fetch_raw(url)
+        except Exception:
+            self.failed += 1
+            metrics.increment("prefetch.failed")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+        status, _, _, text = raw
+        size = len(text)
+        if status >= 400 or size > self.max_bytes:
+            self.failed += 1
+            metrics.increment("prefetch.failed")
+            return None
+        self.fetched += 1
+        metrics.increment("prefetch.fetched")
+        metrics.observe("prefetch.bytes", size)
+        self._store(key, PrefetchedPage(raw=raw, size=size, fetched=time.monotonic()))
+        return raw
+
+    # Cache
+
+    def _store(self, key: str, page: PrefetchedPage):
+        self._drop(key)
+        self._pages[key] = page
+        self._bytes += page.size
+        # Over budget: drop the oldest downloads first
+        while self._bytes > self.max_bytes and len(self._pages) > 1:
+            self._drop(next(iter(self._pages)))
+
+    def _drop(self, key: str):
+        page = self._pages.pop(key, None)
+        if page is None:
+            return
+        self._bytes -= page.size
+        if not page.used:
+            self.wasted += 1
+            metrics.increment("prefetch.wasted")
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, page in self._pages.items() if page.fetched < cutoff]:
+            self._drop(key)
+
+    async def _lookup(self, url: str) -> Optional[tuple]:
+        self._expire()
+        key = normalize_url(url)
+        page = self._pages.get(key)
+        if page is None and key in self._inflight:
+            await asyncio.shield(self._inflight[key])
+            page = self._pages.get(key)
+        if page is None:
+            self.misses += 1
+            metrics.increment("prefetch.misses")
+            return None
+        if not page.used:
+            page.used = True
+            self.used += 1
+        self.hits += 1
+        metrics.increment("prefetch.hits")
+        return page.raw
+
+    async def lookup(self, url: str) -> Optional[tuple]:
+        """Prefetched (status, content type, final url, text) for ``url``, or None"""
+        if not self.enabled:
+            return None
+        return await run_async(self._lookup(url))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        settled = self.used + self.wasted
+        return {
+            "scheduled": self.scheduled,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "used": self.used,
+            "wasted": self.wasted,
+            "cached_bytes": self._bytes,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            # Of downloads whose fate is known: used, or dropped unused
+            "waste_ratio": self.wasted / settled if settled else 0.0,
+        }
+
+
+_prefetcher: Optional[SpeculativePrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> SpeculativePrefetcher:
+    """Return the process-wide prefetcher, configured from the environment"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = SpeculativePrefetcher.from_env()
+        return _prefetcher
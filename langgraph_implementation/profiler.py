@@ -0,0 +1,216 @@
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+PROFILES_DIR = Path("profiles")
+
+# Threads that run turns: the shared loop, executor threads running sync nodes
+# and tools, and the Streamlit script thread (app-side work such as file scans)
+DEFAULT_THREAD_PREFIXES = ("sidekick-runtime", "asyncio_", "ThreadPoolExecutor", "ScriptRunner", "loadtest-user")
+
+MAX_STACK_DEPTH = 128
+
+_SAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Open spans of async work, which leaves no frame on any thread while it waits:
+# token -> (owner, label)
+_spans: Dict[int, Tuple[str, str]] = {}
+_span_tokens = itertools.count()
+_spans_lock = threading.Lock()
+# Number of running profilers; spans are not recorded while it is zero
+_active_profilers = 0
+
+
+@contextmanager
+def span(owner: str, label: str):
+    """Mark async work (e.g. a batch of tool calls) that idle loop samples are attributed to"""
+    if not _active_profilers:
+        yield
+        return
+    token = next(_span_tokens)
+    with _spans_lock:
+        _spans[token] = (owner, label)
+    try:
+        yield
+    finally:
+        with _spans_lock:
+            _spans.pop(token, None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_loop_idle(frames: List) -> bool:
+    """The innermost frame is the event loop waiting in select()"""
+    return bool(frames) and frames[-1].f_code.co_filename.endswith("selectors.py")
+
+
+def _is_parked(frames: List) -> bool:
+    """An executor thread waiting for work, or a caller blocked on the background loop"""
+    for i, frame in enumerate(frames):
+        code = frame.f_code
+        if code.co_name == "_worker" and code.co_filename.endswith(os.path.join("concurrent", "futures", "thread.py")):
+            # Blocked in the (C) work queue, or in queue.py on older Pythons
+            return i + 1 == len(frames) or frames[i + 1].f_code.co_filename.endswith("queue.py")
+        if code.co_name == "run_sync" and code.co_filename.endswith("async_runtime.py"):
+            return True
+    return False
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for one session's turns.
+
+    A daemon thread snapshots the stacks of the turn threads every
+    ``interval`` seconds. Frames of graph nodes and tool functions are
+    relabelled ``node:<name>`` and ``tool:<name>`` so time is attributed to
+    them, including time blocked on I/O inside them. When the shared loop is
+    idle, the sample is split between the session's open spans (async tool
+    batches), labelled ``[waiting]``; executor threads waiting for work and
+    callers blocked on the loop are skipped. Stacks are kept in collapsed form with
+    microsecond weights, ready for flamegraph.pl or speedscope.
+
+    The loop and executor threads are shared, so samples from other sessions
+    running at the same time are included, except their spans.
+    """
+
+    def __init__(
+        self,
+        owner: str,
+        labels: Optional[Dict[object, str]] = None,
+        interval: Optional[float] = None,
+        thread_prefixes: Iterable[str] = DEFAULT_THREAD_PREFIXES,
+    ):
+        self.owner = owner
+        # code object -> attribution label
+        self.labels = labels or {}
+        self.interval = interval or float(os.getenv("SIDEKICK_PROFILE_INTERVAL_MS", "10")) / 1000
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started: Optional[float] = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        global _active_profilers
+        with _spans_lock:
+            _active_profilers += 1
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sidekick-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        global _active_profilers
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            with _spans_lock:
+                _active_profilers -= 1
+        self.elapsed = time.perf_counter() - self.started if self.started else 0.0
+        return self
+
+    def _run(self):
+        weight = max(1, int(self.interval * 1_000_000))
+        while not self._stop.wait(self.interval):
+            self.sample(weight)
+
+    def sample(self, weight: int):
+        names = {t.ident: t.name for t in threading.enumerate() if t.name.startswith(self.thread_prefixes)}
+        for ident, top in sys._current_frames().items():
+            name = names.get(ident)
+            if name is None:
+                continue
+            frames = []
+            frame = top
+            while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()
+            if _is_parked(frames):
+                continue
+            root = self._thread_group(name)
+            if _is_loop_idle(frames):
+                self._sample_waiting(root, weight)
+                continue
+            stack = [root] + [self.labels.get(f.f_code) or _frame_label(f.f_code) for f in frames]
+            self.stacks[";".join(stack)] += weight
+        self.samples += 1
+
+    def _sample_waiting(self, root: str, weight: int):
+        with _spans_lock:
+            labels = [label for owner, label in _spans.values() if owner == self.owner]
+        if not labels:
+            # Idle with nothing of ours outstanding
+            return
+        share = max(1, weight // len(labels))
+        for label in labels:
+            self.stacks[f"{root};[waiting];{label}"] += share
+
+    @staticmethod
+    def _thread_group(name: str) -> str:
+        if name.startswith("sidekick-runtime"):
+            return "event-loop"
+        if name.startswith("ScriptRunner"):
+            return "app"
+        return "worker-threads"
+
+    # Results
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one ``frame;frame;... weight`` line per distinct stack"""
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(self.stacks.items()))
+
+    def summary(self) -> Dict[str, float]:
+        """Seconds per attribution path (e.g. ``node:worker > llm:invoke``), from the labels in each stack"""
+        totals: Dict[str, float] = defaultdict(float)
+        for stack, weight in self.stacks.items():
+            frames = stack.split(";")
+            if len(frames) > 1 and frames[1] == "[waiting]":
+                key = " > ".join(frames[1:3])
+            else:
+                labels = []
+                for frame in frames[1:]:
+                    if frame.startswith(("node:", "tool:", "llm:")) and (not labels or labels[-1] != frame):
+                        labels.append(frame)
+                key = " > ".join(labels) if labels else f"{frames[0]} (other)"
+            totals[key] += weight / 1_000_000
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def save(self, directory: Path = PROFILES_DIR, prefix: Optional[str] = None) -> Path:
+        """Write the collapsed stacks to ``<directory>/<prefix>-<time>.collapsed``"""
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        path = directory / f"{_SAFE_RE.sub('_', prefix or self.owner)[:36]}-{stamp}.collapsed"
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(self.collapsed(), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+
+def read_summary(path: Path) -> Dict[str, float]:
+    """Per-label seconds of a saved profile"""
+    profiler = SamplingProfiler(owner="")
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        stack, _, weight = line.rpartition(" ")
+        if stack:
+            profiler.stacks[stack] += int(weight)
+    return profiler.summary()
+
+
+def list_profiles(directory: Path = PROFILES_DIR) -> List[Path]:
+    """Saved profiles, newest first"""
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("*.collapsed"), key=lambda p: p.stat().st_mtime, reverse=True)
@@ -0,0 +1,233 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from . import metrics
+
+# Prompts are ordered from most to least stable so that provider-side prompt
+# caching can reuse the longest possible prefix: fixed instructions first,
+# then the append-only conversation, and volatile data (time, success
+# criteria, feedback, recalled memory) last.
+
+WORKER_INSTRUCTIONS = """You are a helpful assistant that can use tools to complete tasks.
+    You keep working on a task until either you have a question or clarification for the user, or the success criteria is met.
+    You have access to various tools to help you, including tools to browse the internet, manage files, run Python code, and search for information.
+
+    CRITICAL PYTHON EXECUTION RULES:
+    - When using the Python REPL tool, ALWAYS wrap function calls and variable outputs with print() statements
+    - NEVER just call a function without printing its result
+    - Example of WRONG code: compound_interest(10000, 5, 10)
+    - Example of CORRECT code: print(compound_interest(10000, 5, 10))
+    - Always show your calculations and results explicitly with print statements
+    - If you define a function, immediately test it with print() to show the output
+
+    You should reply either with a question for the user about this assignment, or with your final response.
+    If you have a question for the user, you need to reply by clearly stating your question. An example might be:
+
+    Question: Please clarify whether you want a summary or a detailed answer
+
+    If you've finished, reply with the final answer, and don't ask a question; simply reply with the answer.
+
+    The success criteria, the current date and time, and any feedback on earlier attempts are given at the end of the conversation.
+    """
+
+WORKER_CONTEXT = """The current date and time is {now}
+
+    This is the success criteria:
+    {success_criteria}
+    """
+
+WORKER_FEEDBACK = """
+    Previously you thought you completed the assignment, but your reply was rejected because the success criteria was not met.
+    Here is the feedback on why this was rejected:
+    {feedback}
+
+    IMPORTANT: If the previous attempt failed because Python code didn't show output, make sure to:
+    1. Add print() statements around ALL function calls and variable outputs
+    2. Show intermediate calculations with print statements
+    3. Display the final result clearly with descriptive print statements
+
+    With this feedback, please continue the assignment, ensuring that you meet the success criteria or have a question for the user."""
+
+WORKER_RECALL = """
+
+    Relevant snippets recalled from earlier conversations and files in the sandbox (may be incomplete; read the file if you need more):
+    {recalled_context}"""
+
+EVALUATOR_INSTRUCTIONS = """You are an evaluator that determines if a task has been completed successfully by an Assistant.
+Assess the Assistant's last response based on the given criteria. Respond with your feedback, and with your decision on whether the success criteria has been met,
+and whether more input is needed from the user.
+
+You will be given a conversation between the User and Assistant, the success criteria, and the final response from the Assistant to evaluate.
+Respond with your feedback, and decide if the success criteria is met by this response.
+Also, decide if more user input is required, either because the assistant has a question, needs clarification, or seems to be stuck and unable to answer without help.
+
+The Assistant has access to various tools including file management, web browsing, Python execution, and search.
+If the Assistant says they have completed a task using tools, you should generally trust them unless the response is clearly inadequate.
+Overall you should give the Assistant the benefit of the doubt if they say they've done something. But you should reject if you feel that more work should go into this."""
+
+EVALUATOR_REQUEST = """The entire conversation with the assistant, with the user's original request and all replies, is:
+{conversation}
+
+The success criteria for this assignment is:
+{success_criteria}
+
+And the final response from the Assistant that you are evaluating is:
+{last_response}
+"""
+
+EVALUATOR_FEEDBACK = """
+Also, note that in a prior attempt from the Assistant, you provided this feedback: {feedback}
+If you're seeing the Assistant repeating the same mistakes, then consider responding that user input is required."""
+
+PLANNER_INSTRUCTIONS = """You are a planner that decides whether a user's request can be split into independent sub-tasks.
+Split the request only when it asks about several separate things that can each be researched on their own, for example
+comparing several metrics or several entities. Each sub-task must be a self-contained question that makes sense without the others.
+Return no sub-tasks if the request is simple, is a single question, depends on earlier conversation, or has steps that must happen in order
+(such as writing a file based on research results)."""
+
+PLANNER_REQUEST = """Recent conversation, for context:
+{conversation}
+
+The request to plan is:
+{request}
+
+The success criteria for the final answer is:
+{success_criteria}
+"""
+
+SUBTASK_INSTRUCTIONS = """You are a research assistant working on one part of a larger request.
+Answer only the sub-task you are given, using tools where they help. Be concise and factual, include figures and sources where relevant,
+and do not write to files or send notifications. Your answer will be combined with answers to the other parts by someone else."""
+
+SUBTASK_REQUEST = """The overall request is:
+{request}
+
+Your sub-task is:
+{task}
+"""
+
+SUBTASK_WRAP_UP = "You have used your tool budget for this sub-task. Answer now with what you have found."
+
+MERGE_INSTRUCTIONS = """You are an assistant writing the final answer to a user's request.
+The request was split into sub-tasks that were researched separately; their answers are given below.
+Combine them into one coherent, well-structured answer to the original request. Do not mention the sub-tasks or the process."""
+
+MERGE_REQUEST = """The request is:
+{request}
+
+The success criteria is:
+{success_criteria}
+
+Answers to the sub-tasks:
+{results}
+"""
+
+
+def cached_tokens(message: Any) -> Optional[Dict[str, int]]:
+    """(prompt_tokens, cached_tokens) reported for a model response, if any"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return {"prompt_tokens": usage.get("input_tokens", 0), "cached_tokens": details.get("cache_read", 0) or 0}
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    if token_usage:
+        details = token_usage.get("prompt_tokens_details") or {}
+        return {"prompt_tokens": token_usage.get("prompt_tokens", 0), "cached_tokens": details.get("cached_tokens", 0) or 0}
+    return None
+
+
+class PromptAssembler:
+    """Builds worker and evaluator prompts with a stable, cacheable prefix.
+
+    The fixed instruction messages are created once per Sidekick and reused
+    on every call; only the trailing context message changes between calls.
+    Cached prompt tokens reported by the API are tallied per node.
+    """
+
+    def __init__(self):
+        self.worker_prefix = SystemMessage(content=WORKER_INSTRUCTIONS)
+        self.evaluator_prefix = SystemMessage(content=EVALUATOR_INSTRUCTIONS)
+        self.planner_prefix = SystemMessage(content=PLANNER_INSTRUCTIONS)
+        self.subtask_prefix = SystemMessage(content=SUBTASK_INSTRUCTIONS)
+        self.merge_prefix = SystemMessage(content=MERGE_INSTRUCTIONS)
+        self.usage: Dict[str, Dict[str, int]] = {}
+
+    def worker_messages(
+        self,
+        conversation: List[Any],
+        success_criteria: str,
+        feedback: Optional[str] = None,
+        recalled_context: Optional[str] = None,
+    ) -> List[Any]:
+        context = WORKER_CONTEXT.format(
+            now=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), success_criteria=success_criteria
+        )
+        if feedback:
+            context += WORKER_FEEDBACK.format(feedback=feedback)
+        if recalled_context:
+            context += WORKER_RECALL.format(recalled_context=recalled_context)
+        return [self.worker_prefix] + list(conversation) + [SystemMessage(content=context)]
+
+    def evaluator_messages(
+        self,
+        conversation: str,
+        success_criteria: str,
+        last_response: str,
+        feedback: Optional[str] = None,
+    ) -> List[Any]:
+        request = EVALUATOR_REQUEST.format(
+            conversation=conversation, success_criteria=success_criteria, last_response=last_response
+        )
+        if feedback:
+            request += EVALUATOR_FEEDBACK.format(feedback=feedback)
+        return [self.evaluator_prefix, HumanMessage(content=request)]
+
+    def planner_messages(self, conversation: str, request: str, success_criteria: str) -> List[Any]:
+        return [self.planner_prefix, HumanMessage(content=PLANNER_REQUEST.format(
+            conversation=conversation or "(none)", request=request, success_criteria=success_criteria
+        ))]
+
+    def subtask_messages(self, request: str, task: str) -> List[Any]:
+        return [self.subtask_prefix, HumanMessage(content=SUBTASK_REQUEST.format(request=request, task=task))]
+
+    def subtask_wrap_up(self, messages: List[Any]) -> List[Any]:
+        return list(messages) + [SystemMessage(content=SUBTASK_WRAP_UP)]
+
+    def merge_messages(self, request: str, success_criteria: str, results: List[Dict[str, str]]) -> List[Any]:
+        formatted = "\n\n".join(f"### {r['task']}\n{r['answer']}" for r in results)
+        return [self.merge_prefix, HumanMessage(content=MERGE_REQUEST.format(
+            request=request, success_criteria=success_criteria, results=formatted
+        ))]
+
+    def record_usage(self, node: str, message: Any):
+        """Tally prompt and cached prompt tokens reported for a response"""
+        usage = cached_tokens(message)
+        if not usage:
+            return
+        totals = self.usage.setdefault(node, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage["prompt_tokens"]
+        totals["cached_tokens"] += usage["cached_tokens"]
+        metrics.increment(f"prompt_cache.{node}.prompt_tokens", usage["prompt_tokens"])
+        metrics.increment(f"prompt_cache.{node}.cached_tokens", usage["cached_tokens"])
+
+    def cache_hit_rate(self, node: str) -> float:
+        totals = self.usage.get(node)
+        if not totals or not totals["prompt_tokens"]:
+            return 0.0
+        return totals["cached_tokens"] / totals["prompt_tokens"]
+
+    def usage_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-node totals with their cache hit rate, plus an "all" row across nodes"""
+        stats = {node: {**totals, "hit_rate": self.cache_hit_rate(node)} for node, totals in list(self.usage.items())}
+        prompt = sum(totals["prompt_tokens"] for totals in stats.values())
+        cached = sum(totals["cached_tokens"] for totals in stats.values())
+        stats["all"] = {
+            "calls": sum(totals["calls"] for totals in stats.values()),
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "hit_rate": cached / prompt if prompt else 0.0,
+        }
+        return stats
@@ -0,0 +1,415 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import aclosing, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from . import metrics
+from .async_runtime import get_background_loop, run_async, run_sync, submit
+from .personal_assistant import Sidekick
+from .personal_assistant_tools import browser_context_count, browser_user_count
+from .profiler import PROFILES_DIR, SamplingProfiler
+from .sandbox_index import get_sandbox_index
+from .session_store import export_session, snapshot_path
+
+# Rough resident cost of one Chromium browser context (renderer, page cache)
+BROWSER_CONTEXT_BYTES = 50 * 1024 * 1024
+
+
+def _payload_bytes(value: Any) -> int:
+    """Sum of the serialized payload sizes nested in a checkpointer record"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_payload_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_payload_bytes(v) for v in value.values())
+    return 0
+
+
+def checkpoint_bytes(memory, thread_id: str) -> int:
+    """Serialized size of every checkpoint, blob and pending write kept for a thread.
+
+    Reads the in-memory checkpointer's storage directly; its dicts are copied
+    before iterating because the graph may be writing to them concurrently.
+    """
+    total = 0
+    try:
+        total += _payload_bytes(list(memory.storage.get(thread_id, {}).values()))
+        total += sum(_payload_bytes(v) for k, v in list(memory.blobs.items()) if k[0] == thread_id)
+        total += sum(_payload_bytes(v) for k, v in list(memory.writes.items()) if k[0] == thread_id)
+    except (AttributeError, RuntimeError):
+        pass
+    return total
+
+
+def history_bytes(chat_history: List[Dict[str, str]]) -> int:
+    return sum(len(m.get("role", "")) + len(m.get("content", "")) for m in chat_history or [])
+
+
+class SessionBusy(RuntimeError):
+    """Raised when a turn is started on, or a close requested for, a session running a turn"""
+
+
+@dataclass
+class ManagedSession:
+    session_id: str
+    sidekick: Sidekick
+    chat_history: List[Dict[str, str]] = field(default_factory=list)
+    created: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.time)
+    busy: int = 0
+    # "off", "turn" (profile the next turn only) or "session" (every turn)
+    profiling: str = "off"
+    profiles: List[Path] = field(default_factory=list)
+
+
+class ResourceManager:
+    """Registry of live Sidekick sessions with idle eviction and memory accounting.
+
+    Sessions are set up and run on the shared background loop, so the browser
+    they launch stays owned by one loop for its whole life. A periodic sweep
+    evicts sessions idle for longer than the TTL, then the least recently used
+    ones while the estimated total exceeds the memory cap. Evicted sessions
+    are exported to a snapshot first (when persistence is on) so they can be
+    resumed, and their browser hold is released on the owning loop.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        memory_cap_bytes: Optional[int] = None,
+        persist: Optional[bool] = None,
+    ):
+        self.ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("SIDEKICK_SESSION_TTL", "1800"))
+        self.memory_cap = (
+            memory_cap_bytes if memory_cap_bytes is not None
+            else int(float(os.getenv("SIDEKICK_MEMORY_CAP_MB", "1024")) * 1024 * 1024)
+        )
+        self.persist = (
+            persist if persist is not None
+            else os.getenv("SIDEKICK_PERSIST_EVICTED", "true").lower() == "true"
+        )
+        self.sessions: Dict[str, ManagedSession] = {}
+        # Evicted session id -> snapshot path (None if nothing was persisted)
+        self.evicted: Dict[str, Optional[Path]] = {}
+        self._lock = threading.RLock()
+        self._sweeper = None
+
+    # Lifecycle
+
+    async def acreate(self, session_id: str, model_factory=None) -> Sidekick:
+        """Set up a Sidekick on the background loop and register it"""
+        sidekick = Sidekick(model_factory=model_factory)
+        await run_async(sidekick.setup())
+        self.register(session_id, sidekick)
+        return sidekick
+
+    def create(self, session_id: str, model_factory=None) -> Sidekick:
+        sidekick = Sidekick(model_factory=model_factory)
+        run_sync(sidekick.setup())
+        self.register(session_id, sidekick)
+        return sidekick
+
+    def register(self, session_id: str, sidekick: Sidekick, chat_history: Optional[List[Dict[str, str]]] = None):
+        with self._lock:
+            self.evicted.pop(session_id, None)
+            self.sessions[session_id] = ManagedSession(session_id, sidekick, chat_history if chat_history is not None else [])
+        metrics.increment("sessions.created")
+
+    def touch(self, session_id: str, chat_history: Optional[List[Dict[str, str]]] = None) -> bool:
+        """Mark a session active, optionally re-pointing it at the caller's chat history"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return False
+            session.last_active = time.time()
+            if chat_history is not None:
+                session.chat_history = chat_history
+            return True
+
+    def rename(self, old_id: str, new_id: str):
+        with self._lock:
+            session = self.sessions.pop(old_id, None)
+            if session is not None:
+                session.session_id = new_id
+                self.sessions[new_id] = session
+
+    def get(self, session_id: str) -> Optional[Sidekick]:
+        with self._lock:
+            session = self.sessions.get(session_id)
+            return session.sidekick if session else None
+
+    def session(self, session_id: str) -> Optional[ManagedSession]:
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def set_profiling(self, session_id: str, mode: str):
+        """Profile a session's next turn ("turn"), every turn ("session") or none ("off")"""
+        if mode not in ("off", "turn", "session"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise LookupError(f"Unknown or evicted session: {session_id}")
+            session.profiling = mode
+
+    def profiles(self, session_id: str) -> List[Path]:
+        """Profiles written for a session's turns, oldest first"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            return list(session.profiles) if session else []
+
+    def _start_profiler(self, session: ManagedSession) -> Optional[SamplingProfiler]:
+        with self._lock:
+            if session.profiling == "off":
+                return None
+            if session.profiling == "turn":
+                session.profiling = "off"
+        # Owned by the Sidekick id, which is what its tool spans are tagged with
+        return SamplingProfiler(session.sidekick.sidekick_id, labels=session.sidekick.profile_labels()).start()
+
+    def _save_profile(self, session: ManagedSession, profiler: SamplingProfiler):
+        profiler.stop()
+        try:
+            path = profiler.save(PROFILES_DIR, prefix=session.session_id[:8])
+        except OSError as e:
+            print(f"Could not save profile: {e}")
+            return
+        with self._lock:
+            session.profiles.append(path)
+        metrics.increment("profiles.saved")
+        metrics.observe("profiles.samples", profiler.samples)
+
+    @contextmanager
+    def _active(self, session_id: str, history: Optional[List[Dict[str, str]]], profile: bool = False):
+        """Claim a session for one turn, holding it busy (exempt from eviction)
+        until the turn ends and sampling it when profiling is on.
+
+        A session runs one turn at a time: claiming a busy session raises
+        ``SessionBusy``, since overlapping turns would share one checkpoint thread.
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                raise LookupError(f"Unknown or evicted session: {session_id}")
+            if session.busy:
+                raise SessionBusy(f"A turn is already running for session {session_id}")
+            session.busy += 1
+            if profile and session.profiling == "off":
+                session.profiling = "turn"
+            session.last_active = time.time()
+            if history is not None:
+                session.chat_history = history
+        profiler = self._start_profiler(session)
+        try:
+            yield session
+        finally:
+            if profiler is not None:
+                self._save_profile(session, profiler)
+            with self._lock:
+                session.busy -= 1
+                session.last_active = time.time()
+
+    async def arun_turn(
+        self,
+        session_id: str,
+        message: str,
+        success_criteria: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        profile: bool = False,
+    ) -> List[Dict[str, str]]:
+        """Run one turn of a registered session on the background loop"""
+        with self._active(session_id, history, profile) as session:
+            return await run_async(session.sidekick.run_superstep(message, success_criteria, session.chat_history))
+
+    def run_turn(self, session_id: str, message: str, success_criteria: str, history=None) -> List[Dict[str, str]]:
+        with self._active(session_id, history) as session:
+            return run_sync(session.sidekick.run_superstep(message, success_criteria, session.chat_history))
+
+    async def astream_turn(
+        self,
+        session_id: str,
+        message: str,
+        success_criteria: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        profile: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream one turn's node events; must be iterated on the background loop.
+
+        The first event, ``{"event": "started"}``, is yielded once the session
+        is claimed, so callers can tell a busy or unknown session apart before
+        committing to a stream.
+        """
+        if asyncio.get_running_loop() is not get_background_loop():
+            raise RuntimeError("astream_turn() must run on the shared background loop")
+        with self._active(session_id, history, profile) as session:
+            yield {"event": "started", "session_id": session_id}
+            # Close the turn before releasing the session, even when our consumer stops early
+            async with aclosing(session.sidekick.astream_superstep(message, success_criteria, session.chat_history)) as events:
+                async for event in events:
+                    yield event
+
+    def close(self, session_id: str):
+        """Release a session's resources without persisting it.
+
+        Raises ``SessionBusy`` while a turn is running, rather than tearing the
+        browser down underneath it.
+        """
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is not None and session.busy:
+                raise SessionBusy(f"A turn is still running for session {session_id}")
+            self.sessions.pop(session_id, None)
+        if session is not None:
+            session.sidekick.cleanup()
+            metrics.increment("sessions.closed")
+
+    def take_eviction(self, session_id: str):
+        """Return (evicted, snapshot_path) for a session and forget the eviction"""
+        with self._lock:
+            if session_id not in self.evicted:
+                return False, None
+            return True, self.evicted.pop(session_id)
+
+    # Accounting
+
+    def memory_usage(self, session_id: str) -> Dict[str, int]:
+        """Approximate bytes held by one session, by component"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            return {}
+        sidekick = session.sidekick
+        usage = {
+            "checkpoints": checkpoint_bytes(sidekick.memory, sidekick.sidekick_id),
+            "chat_history": history_bytes(session.chat_history),
+            "long_term_memory": sidekick.long_term_memory.memory_bytes() if sidekick.long_term_memory else 0,
+            # The browser is shared, so its contexts are split across the sessions holding it
+            "browser": (
+                browser_context_count() * BROWSER_CONTEXT_BYTES // max(browser_user_count(), 1)
+                if sidekick.browser is not None else 0
+            ),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def cache_stats(self, session_id: str) -> Dict[str, Any]:
+        """Tool-call cache hits of a session's last turn, and the prompt tokens
+        the provider served from its prefix cache over the session"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            return {}
+        return {
+            "tool_cache": session.sidekick.tool_cache.stats(),
+            "prompt_cache": session.sidekick.prompts.usage_stats(),
+        }
+
+    def total_memory(self) -> int:
+        with self._lock:
+            session_ids = list(self.sessions)
+        return sum(self.memory_usage(sid).get("total", 0) for sid in session_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            session_ids = list(self.sessions)
+            evicted = len(self.evicted)
+        usage = {sid: self.memory_usage(sid) for sid in session_ids}
+        return {
+            "sessions": len(session_ids),
+            "evicted": evicted,
+            "total_bytes": sum(u.get("total", 0) for u in usage.values()),
+            "memory_cap_bytes": self.memory_cap,
+            "per_session": usage,
+        }
+
+    # Eviction
+
+    def evict(self, session_id: str, reason: str = "idle") -> Optional[Path]:
+        """Persist (if enabled) and release one session; returns the snapshot path"""
+        with self._lock:
+            session = self.sessions.get(session_id)
+            if session is None or session.busy:
+                return None
+            del self.sessions[session_id]
+
+        path = None
+        if self.persist and session.chat_history:
+            try:
+                path = export_session(snapshot_path(session_id), session_id, session.chat_history, session.sidekick)
+            except Exception as e:
+                print(f"Error persisting session {session_id[:8]}: {e}")
+        try:
+            session.sidekick.cleanup()
+        except Exception as e:
+            print(f"Error releasing session {session_id[:8]}: {e}")
+
+        with self._lock:
+            self.evicted[session_id] = path
+        metrics.increment(f"sessions.evicted.{reason}")
+        return path
+
+    def sweep(self, now: Optional[float] = None) -> List[str]:
+        """Evict idle sessions, then least recently used ones while over the memory cap"""
+        now = time.time() if now is None else now
+        evicted = []
+        with self._lock:
+            idle = [s.session_id for s in self.sessions.values() if not s.busy and now - s.last_active > self.ttl]
+        for session_id in idle:
+            self.evict(session_id, reason="idle")
+            evicted.append(session_id)
+
+        with self._lock:
+            usage = {sid: self.memory_usage(sid).get("total", 0) for sid in list(self.sessions)}
+            lru = sorted((s for s in self.sessions.values() if not s.busy), key=lambda s: s.last_active)
+        total = sum(usage.values())
+        metrics.observe("sessions.memory_bytes", total)
+        for session in lru:
+            if total <= self.memory_cap:
+                break
+            self.evict(session.session_id, reason="memory")
+            total -= usage.get(session.session_id, 0)
+            evicted.append(session.session_id)
+        return evicted
+
+    def start_sweeper(self, interval: Optional[float] = None):
+        """Run ``sweep`` and a sandbox index refresh periodically on the background loop
+        (off-loop, since both block)"""
+        interval = interval if interval is not None else float(os.getenv("SIDEKICK_SWEEP_INTERVAL", "60"))
+        if self._sweeper is not None or interval <= 0:
+            return
+
+        async def _sweep_forever():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(self.sweep)
+                except Exception as e:
+                    print(f"Session sweep failed: {e}")
+                try:
+                    # Pick up sandbox edits made outside the tools and the app
+                    await asyncio.to_thread(get_sandbox_index().refresh)
+                except Exception as e:
+                    print(f"Sandbox index refresh failed: {e}")
+
+        self._sweeper = submit(_sweep_forever())
+
+
+_manager: Optional[ResourceManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_resource_manager() -> ResourceManager:
+    """Return the process-wide resource manager, starting its sweeper on first use"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ResourceManager()
+            _manager.start_sweeper()
+        return _manager
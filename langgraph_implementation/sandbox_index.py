@@ -0,0 +1,310 @@
+import math
+import threading
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .wiki_index import tokenize
+
+MAX_INDEXED_BYTES = 5_000_000
+
+
+@dataclass
+class IndexedFile:
+    mtime: float
+    size: int
+    length: int
+    # Byte offset of each line, so snippets can be read with a seek
+    line_offsets: array = field(default_factory=lambda: array("Q"))
+    # term -> line numbers containing the term
+    term_lines: Dict[str, array] = field(default_factory=dict)
+    # Index version of the last full scan; appends keep it, so readers holding
+    # an earlier prefix of the same generation only need to read the new bytes
+    generation: int = 0
+
+
+class SandboxIndex:
+    """Incrementally maintained inverted index over text files in the sandbox.
+
+    Files are re-indexed individually when written through the file tools or the
+    app, so searches use the index as it is. Writers the index cannot follow
+    (the Python REPL) call ``mark_dirty``, and the next search or tool round
+    runs ``refresh``, which finds changed files by comparing mtimes; the
+    session sweeper also refreshes periodically to catch edits made outside
+    the process. Search results carry line snippets read by seeking to stored
+    offsets, so whole files are never loaded to answer a query.
+    """
+
+    def __init__(self, root: str = "sandbox", k1: float = 1.2, b: float = 0.75):
+        self.root = Path(root)
+        self.k1 = k1
+        self.b = b
+        self.files: Dict[str, IndexedFile] = {}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        # Binary or oversized files, remembered so refresh does not rescan them
+        self.skipped: Dict[str, tuple] = {}
+        self.version = 0
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _key(self, path) -> Optional[str]:
+        path = Path(path)
+        if not path.is_absolute() and path.parts[:len(self.root.parts)] != self.root.parts:
+            path = self.root / path
+        try:
+            return str(path.resolve().relative_to(self.root.resolve()))
+        except ValueError:
+            return None
+
+    def update(self, path) -> bool:
+        """(Re)index one file; returns False if it was skipped"""
+        key = self._key(path)
+        if key is None:
+            return False
+        full_path = self.root / key
+        with self._lock:
+            self._remove_postings(key)
+            self.skipped.pop(key, None)
+            if not full_path.is_file():
+                self.version += 1
+                return False
+            stat = full_path.stat()
+            entry = self._scan(full_path, stat) if stat.st_size <= MAX_INDEXED_BYTES else None
+            if entry is None:
+                self.skipped[key] = (stat.st_mtime, stat.st_size)
+                self.version += 1
+                return False
+            self.files[key] = entry
+            for term, lines in entry.term_lines.items():
+                self.postings[term][key] = len(lines)
+            self.version += 1
+            entry.generation = self.version
+            return True
+
+    def append(self, path, offset: int) -> bool:
+        """Index text appended to a file at byte ``offset`` without rescanning the rest.
+
+        Falls back to a full ``update`` when the index does not hold the file
+        exactly as it was before the append.
+        """
+        key = self._key(path)
+        if key is None:
+            return False
+        full_path = self.root / key
+        with self._lock:
+            entry = self.files.get(key)
+            if not full_path.is_file():
+                return self.update(path)
+            stat = full_path.stat()
+            if entry is None or entry.size != offset or stat.st_size > MAX_INDEXED_BYTES:
+                return self.update(path)
+            with open(full_path, "rb") as f:
+                f.seek(offset)
+                if b"\0" in f.read(1024):
+                    return self.update(path)
+                touched: Set[str] = set()
+                start, line_no = offset, len(entry.line_offsets)
+                if offset:
+                    f.seek(offset - 1)
+                    if f.read(1) != b"\n":
+                        # The old last line was unterminated; re-read it with its continuation
+                        line_no -= 1
+                        start = entry.line_offsets.pop()
+                        f.seek(start)
+                        tokens = tokenize(f.read(offset - start).decode("utf-8", errors="replace"))
+                        entry.length -= len(tokens)
+                        for term in set(tokens):
+                            lines = entry.term_lines.get(term)
+                            if lines and lines[-1] == line_no:
+                                lines.pop()
+                                touched.add(term)
+                f.seek(start)
+                touched |= self._scan_lines(entry, entry.term_lines, f, line_no, start)
+            for term in touched:
+                lines = entry.term_lines.get(term)
+                if lines:
+                    self.postings[term][key] = len(lines)
+                else:
+                    entry.term_lines.pop(term, None)
+                    docs = self.postings.get(term)
+                    if docs is not None:
+                        docs.pop(key, None)
+                        if not docs:
+                            del self.postings[term]
+            entry.mtime, entry.size = stat.st_mtime, stat.st_size
+            self.version += 1
+            return True
+
+    def generation(self, path) -> Optional[int]:
+        """Generation of a file's indexed content, rescanning it first if it changed on disk"""
+        key = self._key(path)
+        if key is None:
+            return None
+        with self._lock:
+            entry = self.files.get(key)
+            try:
+                stat = (self.root / key).stat()
+            except OSError:
+                return None
+            if entry is None or entry.mtime != stat.st_mtime or entry.size != stat.st_size:
+                if not self.update(key):
+                    return None
+                entry = self.files[key]
+            return entry.generation
+
+    def remove(self, path):
+        key = self._key(path)
+        if key is None:
+            return
+        with self._lock:
+            self._remove_postings(key)
+            self.skipped.pop(key, None)
+            self.version += 1
+
+    def file_stats(self) -> Tuple[int, Dict[str, Tuple[float, int]]]:
+        """The index version and (mtime, size) of every indexed text file"""
+        with self._lock:
+            return self.version, {key: (entry.mtime, entry.size) for key, entry in self.files.items()}
+
+    def mark_dirty(self):
+        """Note that files may have changed without going through ``update``"""
+        self._dirty = True
+
+    def refresh_if_dirty(self) -> int:
+        """``refresh`` if anything was marked dirty since the last one; otherwise free"""
+        if not self._dirty:
+            return 0
+        return self.refresh()
+
+    def refresh(self) -> int:
+        """Index new or modified files and drop deleted ones; returns files changed"""
+        self._dirty = False
+        if not self.root.exists():
+            return 0
+        changed = 0
+        with self._lock:
+            seen: Set[str] = set()
+            for path in self.root.rglob("*"):
+                if not path.is_file():
+                    continue
+                key = str(path.relative_to(self.root))
+                seen.add(key)
+                stat = path.stat()
+                entry = self.files.get(key)
+                if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                    continue
+                if self.skipped.get(key) == (stat.st_mtime, stat.st_size):
+                    continue
+                self.update(path)
+                changed += 1
+            # update() bumps the version for each file it indexes; deletions are counted here
+            for key in set(self.files) - seen:
+                self._remove_postings(key)
+                self.version += 1
+                changed += 1
+            for key in set(self.skipped) - seen:
+                del self.skipped[key]
+                self.version += 1
+        return changed
+
+    def _remove_postings(self, key: str):
+        entry = self.files.pop(key, None)
+        if entry is None:
+            return
+        for term in entry.term_lines:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(key, None)
+                if not docs:
+                    del self.postings[term]
+
+    @staticmethod
+    def _scan_lines(entry: IndexedFile, term_lines: Dict[str, array], f, line_no: int, offset: int) -> Set[str]:
+        """Index lines from ``f`` starting at ``line_no`` / byte ``offset``; returns the terms seen"""
+        seen: Set[str] = set()
+        for line_no, raw in enumerate(f, start=line_no):
+            entry.line_offsets.append(offset)
+            offset += len(raw)
+            tokens = tokenize(raw.decode("utf-8", errors="replace"))
+            entry.length += len(tokens)
+            for term in set(tokens):
+                term_lines.setdefault(term, array("I")).append(line_no)
+                seen.add(term)
+        return seen
+
+    @classmethod
+    def _scan(cls, path: Path, stat) -> Optional[IndexedFile]:
+        entry = IndexedFile(mtime=stat.st_mtime, size=stat.st_size, length=0)
+        with open(path, "rb") as f:
+            if b"\0" in f.read(1024):
+                return None
+            f.seek(0)
+            cls._scan_lines(entry, entry.term_lines, f, 0, 0)
+        return entry
+
+    def search(self, query: str, k: int = 5, snippets_per_file: int = 3) -> List[dict]:
+        """Rank files for ``query`` with BM25 and return line snippets for each"""
+        terms = set(tokenize(query))
+        self.refresh_if_dirty()
+        with self._lock:
+            if not self.files or not terms:
+                return []
+            avg_length = sum(e.length for e in self.files.values()) / len(self.files) or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (len(self.files) - len(docs) + 0.5) / (len(docs) + 0.5))
+                for key, tf in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.files[key].length / avg_length)
+                    scores[key] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: -item[1])[:k]
+            return [
+                {"path": key, "score": round(score, 3), "snippets": self._snippets(key, terms, snippets_per_file)}
+                for key, score in ranked
+            ]
+
+    def _snippets(self, key: str, terms: Set[str], limit: int) -> List[dict]:
+        entry = self.files[key]
+        hits: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            for line_no in entry.term_lines.get(term, ()):
+                hits[line_no] += 1
+        best = sorted(hits, key=lambda line_no: (-hits[line_no], line_no))[:limit]
+
+        snippets = []
+        with open(self.root / key, "rb") as f:
+            for line_no in sorted(best):
+                f.seek(entry.line_offsets[line_no])
+                text = f.readline(500).decode("utf-8", errors="replace").strip()
+                snippets.append({"line": line_no + 1, "text": text})
+        return snippets
+
+
+def format_search_results(results: List[dict]) -> str:
+    if not results:
+        return "No matching files found in the sandbox"
+    lines = []
+    for result in results:
+        lines.append(f"{result['path']} (score {result['score']})")
+        for snippet in result["snippets"]:
+            lines.append(f"  line {snippet['line']}: {snippet['text']}")
+    return "\n".join(lines)
+
+
+_index: Optional[SandboxIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_sandbox_index() -> SandboxIndex:
+    """Return the process-wide sandbox index shared by the tools and the app"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SandboxIndex()
+            _index.refresh()
+        return _index
@@ -0,0 +1,202 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+from .async_runtime import run_async, run_sync
+from .tool_slo import DeadlineExceeded, get_slos
+
+load_dotenv(override=True)
+
+DEFAULT_SERPER_URL = "https://google.serper.dev/search"
+
+
+class SearchInput(BaseModel):
+    queries: List[str] = Field(
+        description="One or more search queries. Pass several related queries at once and they will run in parallel."
+    )
+
+
+class RateLimiter:
+    """Spaces out request starts so no more than ``rate`` begin per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a result URL used for de-duplication"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+class MultiQuerySearch:
+    """Runs several Serper queries concurrently over one pooled HTTP client.
+
+    The client lives on the shared background loop so its connection pool
+    survives across turns. Concurrency is bounded by a semaphore and request
+    starts are spaced by a rate limiter; results are merged by URL. Slow
+    queries are hedged, and queries still running at the search deadline are
+    reported as failed so the others' results come back without them.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        url: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        rate_limit: Optional[float] = None,
+        results_per_query: int = 5,
+        timeout: float = 15.0,
+    ):
+        self.api_key = api_key or os.getenv("SERPER_API_KEY")
+        self.url = url or os.getenv("SERPER_URL", DEFAULT_SERPER_URL)
+        self.max_concurrency = max_concurrency or int(os.getenv("SEARCH_MAX_CONCURRENCY", "4"))
+        self.rate_limit = rate_limit if rate_limit is not None else float(os.getenv("SEARCH_RATE_LIMIT", "5"))
+        self.results_per_query = results_per_query
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._limiter: Optional[RateLimiter] = None
+
+    def _ensure_client(self):
+        # Created lazily on the background loop that will own the connections
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._limiter = RateLimiter(self.rate_limit)
+
+    async def _query(self, query: str) -> Dict[str, Any]:
+        async with self._semaphore:
+            await self._limiter.wait()
+            response = await self._client.post(
+                self.url,
+                headers={"X-API-KEY": self.api_key or "", "Content-Type": "application/json"},
+                json={"q": query, "num": self.results_per_query},
+            )
+            response.raise_for_status()
+            return response.json()
+
+    async def _search(self, queries: List[str]) -> Dict[str, Any]:
+        self._ensure_client()
+        slos = get_slos()
+        responses = await slos.within_deadline(
+            "search", (slos.hedged("search", lambda q=q: self._query(q)) for q in queries)
+        )
+        merged = merge_results(queries, responses)
+        merged["partial"] = any(isinstance(r, DeadlineExceeded) for r in responses)
+        return merged
+
+    async def asearch(self, queries: List[str]) -> Dict[str, Any]:
+        """Run all queries concurrently and return merged, de-duplicated results"""
+        queries = [q.strip() for q in queries if q and q.strip()]
+        if not queries:
+            return {"answers": [], "results": [], "errors": []}
+        return await run_async(self._search(queries))
+
+    def search(self, queries: List[str]) -> Dict[str, Any]:
+        queries = [q.strip() for q in queries if q and q.strip()]
+        if not queries:
+            return {"answers": [], "results": [], "errors": []}
+        return run_sync(self._search(queries))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def merge_results(queries: List[str], responses: List[Any]) -> Dict[str, Any]:
+    """Merge per-query Serper responses, keeping the first hit for each URL"""
+    answers = []
+    errors = []
+    merged: Dict[str, Dict[str, Any]] = {}
+
+    for query, response in zip(queries, responses):
+        if isinstance(response, Exception):
+            errors.append(f"{query}: {response}")
+            continue
+
+        answer_box = response.get("answerBox") or {}
+        answer = answer_box.get("answer") or answer_box.get("snippet")
+        if answer:
+            answers.append({"query": query, "answer": answer})
+
+        for item in response.get("organic", []):
+            link = item.get("link")
+            if not link:
+                continue
+            key = normalize_url(link)
+            if key in merged:
+                merged[key]["queries"].append(query)
+                continue
+            merged[key] = {
+                "title": item.get("title", ""),
+                "link": link,
+                "snippet": item.get("snippet", ""),
+                "queries": [query],
+            }
+
+    # Results matched by more queries are more likely to be relevant
+    results = sorted(merged.values(), key=lambda r: -len(r["queries"]))
+    return {"answers": answers, "results": results, "errors": errors}
+
+
+def format_results(merged: Dict[str, Any]) -> str:
+    """Render merged search results as compact text for the worker"""
+    lines = []
+    for answer in merged["answers"]:
+        lines.append(f"Answer ({answer['query']}): {answer['answer']}")
+    if merged["answers"]:
+        lines.append("")
+
+    for i, result in enumerate(merged["results"], 1):
+        lines.append(f"{i}. {result['title']}")
+        lines.append(f"   {result['link']}")
+        if result["snippet"]:
+            lines.append(f"   {result['snippet']}")
+        if len(result["queries"]) > 1:
+            lines.append(f"   (matched: {'; '.join(result['queries'])})")
+
+    for error in merged["errors"]:
+        lines.append(f"Search failed for {error}")
+
+    return "\n".join(lines) if lines else "No good search results found"
+
+
+_searcher: Optional[MultiQuerySearch] = None
+_searcher_lock = threading.Lock()
+
+
+def get_searcher() -> MultiQuerySearch:
+    """Return the process-wide searcher, configured from the environment"""
+    global _searcher
+    with _searcher_lock:
+        if _searcher is None:
+            _searcher = MultiQuerySearch()
+        return _searcher
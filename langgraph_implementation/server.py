@@ -0,0 +1,206 @@
+"""HTTP API for the Sidekick engine, for programmatic clients.
+
+    POST   /sessions                   create a session         -> {"session_id"}
+    GET    /sessions/{id}              message count and memory usage
+    DELETE /sessions/{id}              release a session (409 while a turn is running)
+    POST   /sessions/{id}/turns        run a turn               -> {"response", "history"}
+    POST   /sessions/{id}/events       run a turn, streaming node events as Server-Sent Events
+    GET    /metrics                    process-wide counters and observations
+
+Turn requests take ``{"message": ..., "success_criteria": ..., "profile": false}``;
+with ``profile`` set the turn is sampled and its collapsed stacks are written
+to ``profiles/`` (listed by GET /sessions/{id}). A session runs one turn at a
+time; a turn request for a busy session gets 409. The server
+runs on the shared background loop, so every request shares one event loop,
+the browser and the pooled LLM clients with each other (and with the
+Streamlit app, if both run in one process).
+
+    python -m langgraph_implementation.server --host 127.0.0.1 --port 8000
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import uuid
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from . import metrics
+from .async_runtime import submit
+from .resource_manager import SessionBusy, get_resource_manager
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event.get('event', 'message')}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+def _authorized(request: Request) -> bool:
+    token = os.getenv("SIDEKICK_API_TOKEN")
+    if not token:
+        return True
+    supplied = request.headers.get("authorization", "")
+    return hmac.compare_digest(supplied, f"Bearer {token}")
+
+
+def _claim_error(error: Exception) -> Response:
+    """Response for a turn or close whose session could not be claimed"""
+    if isinstance(error, SessionBusy):
+        return JSONResponse({"error": "a turn is already running for this session"}, status_code=409)
+    return JSONResponse({"error": "unknown or evicted session"}, status_code=404)
+
+
+async def _turn_request(request: Request):
+    """Validate a turn request; returns (body, None) or (None, error response).
+
+    The session is only claimed when the turn starts, so a busy session is
+    reported then rather than here.
+    """
+    session_id = request.path_params["session_id"]
+    if get_resource_manager().session(session_id) is None:
+        return None, _claim_error(LookupError(session_id))
+    try:
+        body = await request.json()
+    except ValueError:
+        return None, JSONResponse({"error": "request body must be JSON"}, status_code=400)
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        return None, JSONResponse({"error": "'message' is required"}, status_code=400)
+    return body, None
+
+
+async def create_session(request: Request) -> Response:
+    session_id = str(uuid.uuid4())
+    await get_resource_manager().acreate(session_id, model_factory=request.app.state.model_factory)
+    return JSONResponse({"session_id": session_id}, status_code=201)
+
+
+async def get_session(request: Request) -> Response:
+    session_id = request.path_params["session_id"]
+    manager = get_resource_manager()
+    session = manager.session(session_id)
+    if session is None:
+        return JSONResponse({"error": "unknown or evicted session"}, status_code=404)
+    return JSONResponse({
+        "session_id": session_id,
+        "messages": len(session.chat_history),
+        "busy": bool(session.busy),
+        "memory": manager.memory_usage(session_id),
+        "caches": manager.cache_stats(session_id),
+        "profiles": [str(path) for path in manager.profiles(session_id)],
+    })
+
+
+async def delete_session(request: Request) -> Response:
+    session_id = request.path_params["session_id"]
+    manager = get_resource_manager()
+    if manager.get(session_id) is None:
+        return JSONResponse({"error": "unknown or evicted session"}, status_code=404)
+    # Cleanup blocks on the browser's loop, which is this one
+    try:
+        await asyncio.to_thread(manager.close, session_id)
+    except SessionBusy as e:
+        return _claim_error(e)
+    return Response(status_code=204)
+
+
+async def send_turn(request: Request) -> Response:
+    body, error = await _turn_request(request)
+    if error:
+        return error
+    session_id = request.path_params["session_id"]
+    try:
+        history = await get_resource_manager().arun_turn(
+            session_id, body["message"], body.get("success_criteria", ""), profile=bool(body.get("profile"))
+        )
+    except (SessionBusy, LookupError) as e:
+        return _claim_error(e)
+    response = next((m["content"] for m in reversed(history) if m["role"] == "assistant"
+                     and not m["content"].startswith("Evaluator")), None)
+    return JSONResponse({"response": response, "history": history})
+
+
+async def stream_events(request: Request) -> Response:
+    body, error = await _turn_request(request)
+    if error:
+        return error
+    session_id = request.path_params["session_id"]
+    stream = get_resource_manager().astream_turn(
+        session_id, body["message"], body.get("success_criteria", ""), profile=bool(body.get("profile"))
+    )
+    try:
+        # Claims the session; a busy one is refused before any stream is sent
+        started = await stream.__anext__()
+    except (SessionBusy, LookupError) as e:
+        return _claim_error(e)
+
+    async def events() -> AsyncIterator[str]:
+        # Closing the turn's stream when the client disconnects ends the turn and frees the session
+        async with aclosing(stream):
+            yield _sse(started)
+            async for event in stream:
+                yield _sse(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def get_metrics(request: Request) -> Response:
+    return JSONResponse(metrics.snapshot())
+
+
+class _TokenAuth:
+    """Reject requests without the bearer token when SIDEKICK_API_TOKEN is set"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not _authorized(Request(scope)):
+            await JSONResponse({"error": "unauthorized"}, status_code=401)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def create_app(model_factory=None) -> Starlette:
+    """Build the ASGI app; ``model_factory`` overrides how sessions create chat models"""
+    app = Starlette(routes=[
+        Route("/sessions", create_session, methods=["POST"]),
+        Route("/sessions/{session_id}", get_session, methods=["GET"]),
+        Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+        Route("/sessions/{session_id}/turns", send_turn, methods=["POST"]),
+        Route("/sessions/{session_id}/events", stream_events, methods=["POST"]),
+        Route("/metrics", get_metrics, methods=["GET"]),
+    ])
+    app.add_middleware(_TokenAuth)
+    app.state.model_factory = model_factory
+    return app
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000):
+    """Run the API server on the shared background loop until interrupted"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_app(), host=host, port=port, log_level="info"))
+    future = submit(server.serve())
+    try:
+        future.result()
+    except KeyboardInterrupt:
+        server.should_exit = True
+        future.result(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Sidekick engine over HTTP with Server-Sent Events")
+    parser.add_argument("--host", default=os.getenv("SIDEKICK_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SIDEKICK_API_PORT", "8000")))
+    args = parser.parse_args(argv)
+    serve(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
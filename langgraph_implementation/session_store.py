@@ -0,0 +1,139 @@
+import base64
+import gzip
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SNAPSHOT_VERSION = 2
+# Version 1 snapshots kept the graph messages inside the checkpoint record
+READABLE_VERSIONS = (1, 2)
+SESSIONS_DIR = Path(os.getenv("SIDEKICK_SESSIONS_DIR", "sessions"))
+
+# Snapshots are gzip-compressed JSONL, written and read one record at a time:
+#
+#   {"type": "header", "version", "session_id", "created"}
+#   {"type": "chat", "message": {...}}            one per chat history entry
+#   {"type": "checkpoint", "checkpoint", "metadata"}   without its messages
+#   {"type": "message", "message"}                one per graph message
+#   {"type": "writes", "task_id", "writes"}       pending writes, if any
+#
+# Checkpoint payloads are serialised with the checkpointer's own serde and
+# base64-encoded, so restoring them needs no LLM calls or graph replay. The
+# graph's messages are written as records of their own, so neither side ever
+# holds the whole conversation as a single encoded line.
+
+
+def _encode(serde, value: Any) -> List[str]:
+    kind, data = serde.dumps_typed(value)
+    return [kind, base64.b64encode(data).decode("ascii")]
+
+
+def _decode(serde, encoded: List[str]) -> Any:
+    kind, data = encoded
+    return serde.loads_typed((kind, base64.b64decode(data)))
+
+
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def export_session(path, session_id: str, chat_history: List[Dict[str, str]], sidekick=None) -> Path:
+    """Stream a session's chat history and latest graph checkpoint to ``path``"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        header = {"type": "header", "version": SNAPSHOT_VERSION, "session_id": session_id, "created": time.time()}
+        f.write(json.dumps(header) + "\n")
+
+        for message in chat_history:
+            f.write(json.dumps({"type": "chat", "message": message}, ensure_ascii=False) + "\n")
+
+        if sidekick is not None and sidekick.memory is not None:
+            saved = sidekick.memory.get_tuple(_thread_config(sidekick.sidekick_id))
+            if saved is not None:
+                serde = sidekick.memory.serde
+                channel_values = dict(saved.checkpoint.get("channel_values", {}))
+                messages = channel_values.pop("messages", [])
+                record = {
+                    "type": "checkpoint",
+                    "checkpoint": _encode(serde, {**saved.checkpoint, "channel_values": channel_values}),
+                    "metadata": _encode(serde, saved.metadata),
+                }
+                f.write(json.dumps(record) + "\n")
+                for message in messages:
+                    f.write(json.dumps({"type": "message", "message": _encode(serde, message)}) + "\n")
+
+                writes_by_task: Dict[str, List[Tuple[str, Any]]] = {}
+                for task_id, channel, value in saved.pending_writes or []:
+                    writes_by_task.setdefault(task_id, []).append((channel, value))
+                for task_id, writes in writes_by_task.items():
+                    f.write(json.dumps({"type": "writes", "task_id": task_id, "writes": _encode(serde, writes)}) + "\n")
+    return path
+
+
+def iter_snapshot(path) -> Iterator[Dict[str, Any]]:
+    """Yield snapshot records one at a time; accepts a path or a binary file object"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def restore_session(path, sidekick=None) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    """Load a snapshot, restoring the graph checkpoint into ``sidekick`` if given.
+
+    Returns the original session id and the chat history. The checkpoint is
+    written into the Sidekick's own thread, so the next turn continues from it.
+    """
+    session_id = None
+    chat_history: List[Dict[str, str]] = []
+    # The checkpoint is held back until its message records have been read
+    checkpoint = metadata = checkpoint_config = None
+
+    def put_checkpoint():
+        nonlocal checkpoint, checkpoint_config
+        if checkpoint is None:
+            return
+        checkpoint_config = sidekick.memory.put(
+            _thread_config(sidekick.sidekick_id),
+            checkpoint,
+            metadata,
+            checkpoint.get("channel_versions", {}),
+        )
+        sidekick.sync_message_offset(len(checkpoint["channel_values"].get("messages", [])))
+        checkpoint = None
+
+    for record in iter_snapshot(path):
+        kind = record.get("type")
+        if kind == "header":
+            if record.get("version") not in READABLE_VERSIONS:
+                raise ValueError(f"Unsupported snapshot version: {record.get('version')}")
+            session_id = record.get("session_id")
+        elif kind == "chat":
+            chat_history.append(record["message"])
+        elif sidekick is None:
+            continue
+        elif kind == "checkpoint":
+            put_checkpoint()
+            serde = sidekick.memory.serde
+            checkpoint = _decode(serde, record["checkpoint"])
+            metadata = _decode(serde, record["metadata"])
+            checkpoint.setdefault("channel_values", {})
+        elif kind == "message" and checkpoint is not None:
+            messages = checkpoint["channel_values"].setdefault("messages", [])
+            messages.append(_decode(sidekick.memory.serde, record["message"]))
+        elif kind == "writes":
+            put_checkpoint()
+            if checkpoint_config is not None:
+                writes = _decode(sidekick.memory.serde, record["writes"])
+                sidekick.memory.put_writes(checkpoint_config, writes, record["task_id"])
+
+    if sidekick is not None:
+        put_checkpoint()
+    return session_id, chat_history
+
+
+def snapshot_path(session_id: str) -> Path:
+    return SESSIONS_DIR / f"sidekick_session_{session_id[:8]}_{time.strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
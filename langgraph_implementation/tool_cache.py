@@ -0,0 +1,85 @@
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import metrics
+
+# Only tools without side effects may be memoized. Anything that sends,
+# writes, moves, deletes or drives the browser is deliberately absent.
+MEMOIZABLE_TOOLS = {
+    "search",
+    "wikipedia",
+    "read_file",
+    "list_directory",
+    "file_search",
+    "search_sandbox",
+    "read_tool_output",
+}
+
+# Results of these tools depend on the sandbox contents and are keyed on its version
+SANDBOX_DEPENDENT_TOOLS = {"read_file", "list_directory", "file_search", "search_sandbox", "read_tool_output"}
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def canonical_key(tool_name: str, args: Dict[str, Any]) -> str:
+    """Stable key for a tool call: tool name plus canonicalized arguments"""
+    return tool_name + ":" + json.dumps(_canonical(args or {}), sort_keys=True, separators=(",", ":"), default=str)
+
+
+class ToolCallCache:
+    """Run-scoped memoization of side-effect-free tool calls.
+
+    Reset at the start of every run. Entries for sandbox-dependent tools carry
+    the sandbox version they were computed against and are ignored once the
+    sandbox changes.
+    """
+
+    def __init__(self, sandbox_version: Callable[[], int], allowlist=None):
+        self.sandbox_version = sandbox_version
+        self.allowlist = set(MEMOIZABLE_TOOLS if allowlist is None else allowlist)
+        self._entries: Dict[str, Tuple[Optional[int], Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _version_for(self, tool_name: str) -> Optional[int]:
+        return self.sandbox_version() if tool_name in SANDBOX_DEPENDENT_TOOLS else None
+
+    def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Any]:
+        if tool_name not in self.allowlist:
+            return None
+        entry = self._entries.get(canonical_key(tool_name, args))
+        if entry is not None and entry[0] == self._version_for(tool_name):
+            self.hits += 1
+            metrics.increment("tool_cache.hits")
+            metrics.increment(f"tool_cache.hits.{tool_name}")
+            return entry[1]
+        self.misses += 1
+        metrics.increment("tool_cache.misses")
+        return None
+
+    def put(self, tool_name: str, args: Dict[str, Any], content: Any):
+        if tool_name in self.allowlist:
+            self._entries[canonical_key(tool_name, args)] = (self._version_for(tool_name), content)
+
+    def stats(self) -> Dict[str, float]:
+        """Hits and misses since the last reset, i.e. for the current or last run"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,171 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field
+
+from . import metrics
+from .output_budget import estimate_tokens
+from .wiki_index import tokenize
+
+REQUEST_TOOLS = "request_tools"
+
+# Tools that are only useful together are selected as a group
+TOOL_GROUPS: Dict[str, List[str]] = {
+    "browser": [
+        "fetch_page", "navigate_browser", "click_element", "extract_text", "extract_hyperlinks",
+        "get_elements", "current_webpage", "previous_webpage",
+    ],
+    "files": [
+        "read_file", "write_file", "list_directory", "copy_file", "move_file",
+        "file_delete", "file_search", "search_sandbox", "append_file", "patch_file", "replace_lines",
+    ],
+    "search": ["search"],
+    "wikipedia": ["wikipedia"],
+    "python": ["Python_REPL"],
+    "notify": ["send_push_notification"],
+}
+
+# Small, and needed whenever an earlier result was spilled to a file
+ALWAYS_TOOLS = {"read_tool_output"}
+
+# Used when nothing in the request points at a particular tool
+DEFAULT_GROUPS = ["search", "python"]
+
+# Cheap cues that a request needs a group even when it shares no words with the tool descriptions
+GROUP_HINTS: Dict[str, re.Pattern] = {
+    "browser": re.compile(r"https?://|www\.|\b(website|web ?page|browse|browser|click|navigate|visit|url|link)s?\b", re.I),
+    "files": re.compile(r"\b(files?|save|saved|write|read|append|patch|edit|folder|director(y|ies)|sandbox|documents?|csv|txt|markdown|json|notes?)\b", re.I),
+    "search": re.compile(r"\b(search|google|latest|news|current|today|recent|look up|price|weather|sources?|online|web)\b", re.I),
+    "wikipedia": re.compile(r"\b(wikipedia|wiki|biography|born|history of|who (is|was|were))\b", re.I),
+    "python": re.compile(
+        r"\d\s*[-+*/^%]\s*\d|\b(calculate|compute|math|equation|sum|average|mean|percent(age)?|interest|python|code|script|plot|convert|pi)\b",
+        re.I,
+    ),
+    "notify": re.compile(r"\b(notify|notification|push|alert|remind|ping)\b", re.I),
+}
+HINT_WEIGHT = 2.0
+
+# Boilerplate shared by tool descriptions that says nothing about what a tool does
+DESCRIPTION_STOPWORDS = {
+    "use", "used", "using", "tool", "tools", "want", "when", "useful", "input", "should", "get",
+    "result", "results", "pass", "specified", "given", "need", "one", "several",
+}
+
+
+class RequestToolsInput(BaseModel):
+    capability: str = Field(
+        description="What you need to do that your current tools can't, e.g. 'open a web page' or 'write a file'; use 'all' for every tool"
+    )
+
+
+def request_tools_tool() -> StructuredTool:
+    """Meta tool the worker calls to widen its tool set; handled by the tool node itself"""
+    return StructuredTool.from_function(
+        func=lambda capability: f"Requested tools for: {capability}",
+        name=REQUEST_TOOLS,
+        description=(
+            "Only some tools are available to you for this request. If you need a capability you don't have "
+            "(browsing, files, web search, Wikipedia, Python, notifications), call this to enable the matching tools."
+        ),
+        args_schema=RequestToolsInput,
+    )
+
+
+def schema_tokens(tool) -> int:
+    """Approximate prompt tokens a tool's JSON schema costs on every call"""
+    return estimate_tokens(json.dumps(convert_to_openai_tool(tool)))
+
+
+class ToolSelector:
+    """Picks the tools to bind for a turn by cheap local scoring.
+
+    Each group scores the request against its hint pattern plus the overlap of
+    request terms with its tools' names and descriptions, weighted by how
+    rare each term is across tools. The best groups are selected, with a small
+    default set when nothing matches; the worker can widen the set later.
+
+    Tool schemas sit at the front of every worker prompt, so a bound set that
+    changes from turn to turn defeats the provider's prefix cache. A selector
+    belongs to one session and, with ``grow_only``, only ever adds to the set
+    it has bound: each turn binds everything earlier turns needed plus what
+    this one needs. The prompt then changes only when a turn needs something
+    new, at the cost of binding tools a later turn may not use.
+    """
+
+    def __init__(self, tools: Sequence, max_groups: int = 3, grow_only: bool = True):
+        self.tool_names = [t.name for t in tools]
+        self.max_groups = max_groups
+        self.grow_only = grow_only
+        # Everything bound so far in this session
+        self._bound: Set[str] = set()
+        known = set(self.tool_names)
+        self.groups: Dict[str, List[str]] = {
+            group: [name for name in names if name in known] for group, names in TOOL_GROUPS.items()
+        }
+        grouped = {name for names in self.groups.values() for name in names}
+        # Tools outside the known groups (new or custom tools) stand alone
+        for name in self.tool_names:
+            if name not in grouped and name not in ALWAYS_TOOLS:
+                self.groups[name] = [name]
+        self.groups = {group: names for group, names in self.groups.items() if names}
+
+        descriptions = {t.name: f"{t.name.replace('_', ' ')} {t.description}" for t in tools}
+        self._terms = {
+            group: set(tokenize(" ".join(descriptions[name] for name in names))) - DESCRIPTION_STOPWORDS
+            for group, names in self.groups.items()
+        }
+        document_frequency: Dict[str, int] = {}
+        for terms in self._terms.values():
+            for term in terms:
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        self._weights = {term: 1.0 / df for term, df in document_frequency.items()}
+        self.schema_tokens = {t.name: schema_tokens(t) for t in tools}
+
+    def score(self, text: str) -> Dict[str, float]:
+        terms = set(tokenize(text))
+        scores = {}
+        for group, group_terms in self._terms.items():
+            score = sum(self._weights[t] for t in terms & group_terms)
+            hint = GROUP_HINTS.get(group)
+            if hint is not None and hint.search(text):
+                score += HINT_WEIGHT
+            if score > 0:
+                scores[group] = score
+        return scores
+
+    def _expand(self, groups: Iterable[str]) -> List[str]:
+        names = {name for group in groups for name in self.groups.get(group, [])}
+        names |= ALWAYS_TOOLS & set(self.tool_names)
+        return sorted(names)
+
+    def select(self, text: str) -> List[str]:
+        """Names of the tools to bind for a request"""
+        scores = self.score(text)
+        ranked = sorted(scores, key=scores.get, reverse=True)[: self.max_groups]
+        selected = self._bind(self._expand(ranked or [g for g in DEFAULT_GROUPS if g in self.groups]))
+        metrics.observe("tool_selection.bound_tools", len(selected))
+        metrics.observe("tool_selection.schema_tokens", sum(self.schema_tokens.get(n, 0) for n in selected))
+        return selected
+
+    def widen(self, current: Optional[Sequence[str]], capability: str) -> List[str]:
+        """Add the groups matching ``capability``; everything if it is 'all' or matches nothing new"""
+        metrics.increment("tool_selection.widened")
+        current = set(current if current is not None else self.tool_names)
+        if capability.strip().lower() not in ("all", "everything", "*"):
+            added = set(self._expand(self.score(capability))) - current
+            if added:
+                return self._bind(current | added)
+        return self._bind(self.tool_names)
+
+    def _bind(self, names: Iterable[str]) -> List[str]:
+        """Record ``names`` as bound; with ``grow_only`` the result also keeps every earlier tool"""
+        names = set(names)
+        if self.grow_only:
+            names |= self._bound
+        if names != self._bound:
+            metrics.increment("tool_selection.changed")
+        self._bound = names
+        return sorted(names)
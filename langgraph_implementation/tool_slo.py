@@ -0,0 +1,280 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+from . import metrics
+from .async_runtime import run_sync
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a tool call does not finish within its deadline"""
+
+    def __init__(self, tool: str, seconds: float):
+        super().__init__(f"no answer within the {seconds:g}s deadline")
+        self.tool = tool
+        self.seconds = seconds
+
+
+class PartialResult(ToolException):
+    """Raised by a tool to return a result cut short by its deadline.
+
+    The message is what the worker sees; the call is still reported as failed,
+    so the run's tool cache does not memoize the incomplete answer.
+    """
+
+
+@dataclass
+class ToolSLO:
+    # Hard limit for the whole tool call, in seconds
+    deadline: float
+    hedge: bool = True
+    # Attempts running longer than this percentile of recent latencies get a duplicate
+    percentile: float = 95.0
+    # Never hedge sooner than this, however fast the tool usually is
+    min_hedge_delay: float = 0.1
+
+    @classmethod
+    def from_env(cls, tool: str, default: "ToolSLO") -> "ToolSLO":
+        prefix = f"SIDEKICK_SLO_{tool.upper()}_"
+        return cls(
+            deadline=float(os.getenv(prefix + "DEADLINE", default.deadline)),
+            hedge=os.getenv(prefix + "HEDGE", str(default.hedge)).lower() == "true",
+            percentile=float(os.getenv(prefix + "PERCENTILE", default.percentile)),
+            min_hedge_delay=default.min_hedge_delay,
+        )
+
+
+# Tools that wait on slow external services
+DEFAULT_SLOS = {
+    "search": ToolSLO(deadline=10.0),
+    "wikipedia": ToolSLO(deadline=10.0),
+    # Includes the browser fallback for pages that need JavaScript
+    "fetch_page": ToolSLO(deadline=30.0),
+}
+
+
+class LatencyTracker:
+    """Rolling window of one tool's upstream latencies, with hedge accounting"""
+
+    def __init__(self, window: int = 200):
+        self.latencies: deque = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, pct: float) -> float:
+        with self._lock:
+            values = list(self.latencies)
+        return metrics.percentile(values, pct)
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def take_hedge(self, budget: float) -> bool:
+        """Count a hedge if it keeps hedges within ``budget`` of calls"""
+        with self._lock:
+            if self.hedges + 1 > budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def __len__(self) -> int:
+        return len(self.latencies)
+
+
+class ToolLatencySLOs:
+    """Per-tool latency tracking, hedged requests and deadlines for external tools.
+
+    Each upstream request (a search query, a page GET, a Wikipedia lookup) is
+    timed into a rolling window per tool. Once the window holds ``min_samples``
+    latencies, an attempt still running past the tool's p95 gets a duplicate,
+    and whichever answers first wins; the other is cancelled. Hedges are capped
+    at ``hedge_budget`` of the tool's calls, so a slow upstream is not sent
+    twice the load. Losing attempts are recorded with the time they ran, so
+    hedged calls still count as slow ones instead of hedging hiding the tail.
+
+    Deadlines bound the whole tool call; tools turn a missed deadline into a
+    partial answer (the queries that did finish, the page without its browser
+    rendering) rather than stalling the turn.
+    """
+
+    def __init__(
+        self,
+        slos: Optional[Dict[str, ToolSLO]] = None,
+        hedge_budget: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.slos = dict(DEFAULT_SLOS if slos is None else slos)
+        self.hedge_budget = hedge_budget
+        self.window = window
+        self.min_samples = min_samples
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ToolLatencySLOs":
+        return cls(
+            slos={tool: ToolSLO.from_env(tool, default) for tool, default in DEFAULT_SLOS.items()},
+            hedge_budget=float(os.getenv("SIDEKICK_HEDGE_BUDGET", "0.1")),
+        )
+
+    def slo(self, tool: str) -> Optional[ToolSLO]:
+        return self.slos.get(tool)
+
+    def deadline(self, tool: str) -> Optional[float]:
+        slo = self.slos.get(tool)
+        return slo.deadline if slo and slo.deadline > 0 else None
+
+    def tracker(self, tool: str) -> LatencyTracker:
+        with self._lock:
+            tracker = self._trackers.get(tool)
+            if tracker is None:
+                tracker = self._trackers[tool] = LatencyTracker(self.window)
+            return tracker
+
+    def hedge_delay(self, tool: str) -> Optional[float]:
+        """Seconds after which an attempt is duplicated, or None while hedging is off or warming up"""
+        slo = self.slos.get(tool)
+        tracker = self.tracker(tool)
+        if slo is None or not slo.hedge or len(tracker) < self.min_samples:
+            return None
+        return max(slo.min_hedge_delay, tracker.percentile(slo.percentile))
+
+    async def hedged(self, tool: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``attempt()``, starting a duplicate if it runs past the tool's hedge delay;
+        the first attempt to succeed wins. ``attempt`` must be safe to run twice."""
+        tracker = self.tracker(tool)
+        tracker.count("calls")
+        delay = self.hedge_delay(tool)
+        started = time.monotonic()
+        attempts: Dict[asyncio.Future, float] = {asyncio.ensure_future(attempt()): started}
+        primary = next(iter(attempts))
+        error: Optional[BaseException] = None
+        try:
+            while attempts:
+                timeout = None
+                if delay is not None and len(attempts) == 1 and primary in attempts:
+                    timeout = max(0.0, started + delay - time.monotonic())
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                now = time.monotonic()
+                for task in done:
+                    began = attempts.pop(task)
+                    if task.exception() is None:
+                        tracker.record(now - began)
+                        metrics.observe(f"slo.{tool}.seconds", now - started)
+                        if task is not primary:
+                            tracker.count("hedge_wins")
+                            metrics.increment(f"slo.{tool}.hedge_wins")
+                        return task.result()
+                    error = task.exception()
+                if not done and tracker.take_hedge(self.hedge_budget):
+                    metrics.increment(f"slo.{tool}.hedges")
+                    attempts[asyncio.ensure_future(attempt())] = now
+                # Without a hedge the primary keeps running; stop waiting on the delay either way
+                delay = None
+            raise error
+        finally:
+            now = time.monotonic()
+            for task, began in attempts.items():
+                task.cancel()
+                # A lower bound on its latency, but it keeps the tail in the window
+                tracker.record(now - began)
+
+    async def within_deadline(self, tool: str, aws: Iterable[Awaitable[Any]]) -> List[Any]:
+        """Results of ``aws`` in order, with exceptions in place of failures and a
+        ``DeadlineExceeded`` for each one still running at the tool's deadline"""
+        tasks = [asyncio.ensure_future(aw) for aw in aws]
+        if not tasks:
+            return []
+        deadline = self.deadline(tool)
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.missed(tool)
+        return [
+            (task.exception() or task.result()) if task in done else DeadlineExceeded(tool, deadline)
+            for task in tasks
+        ]
+
+    def missed(self, tool: str):
+        self.tracker(tool).count("deadline_misses")
+        metrics.increment(f"slo.{tool}.deadline_misses")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            trackers = dict(self._trackers)
+        return {
+            tool: {
+                "calls": tracker.calls,
+                "p50": tracker.percentile(50),
+                "p95": tracker.percentile(95),
+                "hedges": tracker.hedges,
+                "hedge_wins": tracker.hedge_wins,
+                "deadline_misses": tracker.deadline_misses,
+            }
+            for tool, tracker in trackers.items()
+        }
+
+
+def with_slo(tool: BaseTool) -> BaseTool:
+    """Wrap a blocking tool so each call is hedged and bounded by the tool's deadline.
+
+    Attempts run in threads, so a losing or late attempt cannot be stopped; it
+    finishes in the background and its answer is discarded.
+    """
+    slos = get_slos()
+    if slos.slo(tool.name) is None:
+        return tool
+
+    async def _call(**kwargs):
+        deadline = slos.deadline(tool.name)
+        try:
+            return await asyncio.wait_for(
+                slos.hedged(tool.name, lambda: asyncio.to_thread(tool.invoke, kwargs)), deadline
+            )
+        except asyncio.TimeoutError:
+            slos.missed(tool.name)
+            raise PartialResult(
+                f"{tool.name} gave no answer within {deadline:g}s. Continue with what you have, "
+                f"or try again with a more specific query"
+            )
+
+    def _run(**kwargs):
+        return run_sync(_call(**kwargs))
+
+    return StructuredTool.from_function(
+        func=_run,
+        coroutine=_call,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        handle_tool_error=True,
+    )
+
+
+_slos: Optional[ToolLatencySLOs] = None
+_slos_lock = threading.Lock()
+
+
+def get_slos() -> ToolLatencySLOs:
+    """Return the process-wide latency SLOs, configured from the environment"""
+    global _slos
+    with _slos_lock:
+        if _slos is None:
+            _slos = ToolLatencySLOs.from_env()
+        return _slos
@@ -0,0 +1,245 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+from pydantic import BaseModel, Field
+
+from . import metrics
+from .async_runtime import run_async
+from .page_extract import ExtractionResult, extract_readable_text
+from .tool_slo import DeadlineExceeded, get_slos
+
+MAX_PAGE_BYTES = 3_000_000
+# Not worth starting the browser with less of the deadline left than this
+MIN_BROWSER_SECONDS = 1.0
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+# Markers of client-rendered apps whose HTML is an empty shell
+_APP_SHELL_RE = re.compile(
+    r'<div[^>]+id=["\'](root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>|\bng-app\b|data-reactroot',
+    re.I,
+)
+_NOSCRIPT_RE = re.compile(r"<noscript[^>]*>[^<]*(enable|turn on|requires?)\s+javascript", re.I)
+_CHALLENGE_RE = re.compile(r"cf-browser-verification|challenge-platform|Just a moment\.\.\.|captcha", re.I)
+_SCRIPT_RE = re.compile(r"<script\b[^>]*>(.*?)</script>", re.I | re.S)
+
+
+class FetchPageInput(BaseModel):
+    url: str = Field(description="The URL of the page to read")
+    focus: Optional[str] = Field(
+        default=None,
+        description="Optional CSS selector (e.g. '#prices', 'table.results') or a few keywords to focus the extraction on",
+    )
+    max_chars: int = Field(default=6000, description="Maximum number of characters to return")
+
+
+def needs_javascript(html: str, extracted_chars: int, status_code: int = 200) -> Optional[str]:
+    """Reason to believe a page only renders its content with JavaScript, or None"""
+    if status_code in (403, 429, 503) and _CHALLENGE_RE.search(html):
+        return "bot challenge page"
+    if extracted_chars < 200:
+        if _APP_SHELL_RE.search(html):
+            return "empty client-side app shell"
+        if _NOSCRIPT_RE.search(html):
+            return "page asks for JavaScript"
+        script_chars = sum(len(s) for s in _SCRIPT_RE.findall(html))
+        if script_chars > 20 * max(extracted_chars, 1):
+            return "mostly scripts, little text"
+    return None
+
+
+@dataclass
+class FetchResult:
+    url: str
+    path: str
+    seconds: float
+    status: Optional[int] = None
+    reason: Optional[str] = None
+    extraction: Optional[ExtractionResult] = None
+    error: Optional[str] = None
+    # Cut short by the fetch_page deadline
+    partial: bool = False
+
+    def render(self) -> str:
+        via = f"[Fetched {self.url} via {self.path} in {self.seconds:.2f}s"
+        if self.status is not None:
+            via += f", status {self.status}"
+        if self.reason:
+            via += f"; {self.reason}"
+        via += "]"
+        if self.error:
+            return f"{via}\nError: {self.error}"
+        return f"{via}\n{self.extraction.render()}" if self.extraction else via
+
+
+class PageFetcher:
+    """Reads pages over a pooled HTTP client, falling back to the browser for JavaScript pages.
+
+    Static pages are fetched and reduced to their main text without touching
+    Chromium. Pages that look client-rendered (empty app shells, JavaScript
+    notices, script-heavy pages with no text, bot challenges) are loaded in the
+    Playwright browser instead, when one is available. Every fetch reports the
+    path that served it and its latency, and both are recorded in metrics.
+
+    Slow GETs are hedged, and the whole fetch is bounded by the ``fetch_page``
+    deadline: a browser fallback that would overrun it is skipped or cut off,
+    and the HTTP result is returned as it is.
+    """
+
+    def __init__(self, timeout: float = 15.0, max_connections: int = 20):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _ensure_client(self):
+        # Created lazily on the background loop that will own the connections
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml,*/*;q=0.8"},
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+
+    async def _get(self, url: str):
+        """(status, content type, final url, text) for ``url``, reading at most MAX_PAGE_BYTES"""
+        self._ensure_client()
+        async with self._client.stream("GET", url) as response:
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= MAX_PAGE_BYTES:
+                    break
+            encoding = response.encoding or "utf-8"
+            return (
+                response.status_code,
+                response.headers.get("content-type", ""),
+                str(response.url),
+                bytes(body).decode(encoding, errors="replace"),
+            )
+
+    async def fetch_raw(self, url: str):
+        """(status, content type, final url, text) for ``url`` over HTTP"""
+        return await run_async(self._get(url))
+
+    @staticmethod
+    def from_raw(url: str, raw, started: float, focus: Optional[str] = None, max_chars: int = 6000) -> FetchResult:
+        """Extract a fetched page; ``reason`` is set when it appears to need JavaScript"""
+        status, content_type, final_url, text = raw
+        if "html" not in content_type and not text.lstrip().startswith("<"):
+            # Plain text, JSON and the like need no parsing
+            extraction = ExtractionResult(text=text[:max_chars], source_chars=len(text), truncated=len(text) > max_chars)
+            return FetchResult(url=url, path="http", seconds=time.perf_counter() - started, status=status, extraction=extraction)
+
+        extraction = extract_readable_text(text, focus=focus, max_chars=max_chars, base_url=final_url)
+        # Links do not count as content here, so a shell full of links is still caught
+        reason = needs_javascript(text, len(extraction.text), status)
+        return FetchResult(
+            url=url, path="http", seconds=time.perf_counter() - started,
+            status=status, reason=reason, extraction=extraction,
+        )
+
+    async def fetch_http(self, url: str, focus: Optional[str] = None, max_chars: int = 6000) -> FetchResult:
+        """HTTP-only fetch; ``reason`` is set when the page appears to need JavaScript"""
+        started = time.perf_counter()
+        try:
+            raw = await get_slos().hedged("fetch_page", lambda: self.fetch_raw(url))
+        except Exception as e:
+            return FetchResult(url=url, path="http", seconds=time.perf_counter() - started, error=str(e))
+        return self.from_raw(url, raw, started, focus, max_chars)
+
+    async def fetch_browser(
+        self, browser, url: str, focus: Optional[str] = None, max_chars: int = 6000, timeout: Optional[float] = None
+    ) -> FetchResult:
+        """Load ``url`` in the browser's current page; must run on the browser's loop"""
+        from langchain_community.tools.playwright.utils import aget_current_page
+
+        started = time.perf_counter()
+        timeout = self.timeout * 2 if timeout is None else timeout
+        try:
+            page = await aget_current_page(browser)
+            response = await page.goto(url, wait_until="networkidle", timeout=timeout * 1000)
+            html = await page.content()
+        except Exception as e:
+            return FetchResult(url=url, path="browser", seconds=time.perf_counter() - started, error=str(e))
+        extraction = extract_readable_text(html, focus=focus, max_chars=max_chars, base_url=page.url)
+        return FetchResult(
+            url=url, path="browser", seconds=time.perf_counter() - started,
+            status=response.status if response else None, extraction=extraction,
+        )
+
+    async def fetch(self, url: str, focus: Optional[str] = None, max_chars: int = 6000, browser=None) -> FetchResult:
+        slos = get_slos()
+        deadline = slos.deadline("fetch_page")
+        started = time.perf_counter()
+        try:
+            raw, result = await asyncio.wait_for(self._fetch_http_or_prefetched(url, focus, max_chars), deadline)
+        except asyncio.TimeoutError:
+            slos.missed("fetch_page")
+            raw, result = None, FetchResult(
+                url=url, path="http", seconds=time.perf_counter() - started,
+                error=str(DeadlineExceeded("fetch_page", deadline)), partial=True,
+            )
+        if raw is not None:
+            result = self.from_raw(url, raw, started, focus, max_chars)
+            result.path = "prefetch"
+
+        remaining = deadline - (time.perf_counter() - started) if deadline else None
+        if (result.reason or result.error) and browser is not None and not result.partial:
+            if remaining is not None and remaining < MIN_BROWSER_SECONDS:
+                slos.missed("fetch_page")
+                result.partial = True
+                if result.reason:
+                    result.reason += "; no time left before the deadline to render it in the browser"
+            else:
+                fallback = await self.fetch_browser(browser, url, focus, max_chars, timeout=remaining)
+                if fallback.error and result.extraction is not None:
+                    # What HTTP returned is better than nothing
+                    result.reason += f"; browser rendering failed ({fallback.error}), content may be incomplete"
+                    result.partial = remaining is not None and time.perf_counter() - started >= deadline
+                    if result.partial:
+                        slos.missed("fetch_page")
+                else:
+                    fallback.reason = f"http path: {result.reason or result.error} ({result.seconds:.2f}s)"
+                    fallback.seconds += result.seconds
+                    result = fallback
+        elif result.reason:
+            result.reason += "; no browser available, content may be incomplete"
+
+        metrics.increment(f"fetch.path.{result.path}")
+        metrics.observe(f"fetch.seconds.{result.path}", result.seconds)
+        if result.error:
+            metrics.increment("fetch.errors")
+        return result
+
+    async def _fetch_http_or_prefetched(self, url: str, focus: Optional[str], max_chars: int):
+        """(prefetched raw page, None), or (None, HTTP fetch result)"""
+        from .prefetch import get_prefetcher
+
+        raw = await get_prefetcher().lookup(url)
+        if raw is not None:
+            return raw, None
+        return None, await self.fetch_http(url, focus, max_chars)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_fetcher: Optional[PageFetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> PageFetcher:
+    """Return the process-wide page fetcher"""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = PageFetcher(timeout=float(os.getenv("SIDEKICK_FETCH_TIMEOUT", "15")))
+        return _fetcher
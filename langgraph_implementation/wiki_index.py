@@ -0,0 +1,329 @@
+"""Offline Wikipedia snapshot index.
+
+Ingests a subset of a Wikipedia dump (MediaWiki XML, optionally bz2-compressed,
+or JSONL with ``title``/``text`` fields) into a compact on-disk inverted index
+and serves BM25-ranked article summaries from it.
+
+Index layout::
+
+    meta.json      document count, average length, BM25 parameters
+    lexicon.json   term -> [postings offset, document frequency]
+    postings.bin   uint32 (doc_id, term_frequency) pairs, memory-mapped
+    doclens.bin    uint32 token count per document
+    docs.jsonl     one {"title", "summary"} record per document
+    docs.idx       uint64 byte offset of each record in docs.jsonl
+
+Build an index with::
+
+    python -m langgraph_implementation.wiki_index build enwiki-subset.xml.bz2 wiki_index --limit 50000
+"""
+import argparse
+import bz2
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+# Dump reading
+
+_TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+_REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+_FILE_LINK_RE = re.compile(r"\[\[(?:File|Image|Category):[^\]]*\]\]", re.I)
+_LINK_RE = re.compile(r"\[\[(?:[^\]|]*\|)?([^\]]*)\]\]")
+_EXT_LINK_RE = re.compile(r"\[https?://\S+\s*([^\]]*)\]")
+_TABLE_RE = re.compile(r"\{\|.*?\|\}", re.S)
+
+
+def clean_wikitext(text: str) -> str:
+    """Reduce wikitext markup to readable plain text (best effort)"""
+    previous = None
+    while previous != text:
+        previous = text
+        text = _TEMPLATE_RE.sub("", text)
+    text = _TABLE_RE.sub("", text)
+    text = _REF_RE.sub("", text)
+    text = _FILE_LINK_RE.sub("", text)
+    text = _LINK_RE.sub(r"\1", text)
+    text = _EXT_LINK_RE.sub(r"\1", text)
+    text = _TAG_RE.sub("", text)
+    text = text.replace("'''", "").replace("''", "")
+    text = re.sub(r"^=+\s*(.*?)\s*=+\s*$", r"\1", text, flags=re.M)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def _open(path: str):
+    return bz2.open(path, "rb") if path.endswith(".bz2") else open(path, "rb")
+
+
+def iter_xml_dump(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (title, plain text) for main-namespace, non-redirect pages"""
+    with _open(path) as f:
+        title, ns, text, redirect = None, None, None, False
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = elem.text
+            elif tag == "ns":
+                ns = elem.text
+            elif tag == "redirect":
+                redirect = True
+            elif tag == "text":
+                text = elem.text or ""
+            elif tag == "page":
+                if title and ns == "0" and not redirect and text:
+                    yield title, clean_wikitext(text)
+                title, ns, text, redirect = None, None, None, False
+                # Drop the finished page from the tree, or the whole dump accumulates under the root
+                elem.clear()
+                root.clear()
+
+
+def iter_jsonl_dump(path: str) -> Iterator[Tuple[str, str]]:
+    with _open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["title"], record.get("text", "")
+
+
+def iter_dump(path: str) -> Iterator[Tuple[str, str]]:
+    name = path[:-4] if path.endswith(".bz2") else path
+    return iter_jsonl_dump(path) if name.endswith((".jsonl", ".json")) else iter_xml_dump(path)
+
+
+# Index building
+
+def build_index(
+    dump_path: str,
+    index_dir: str,
+    limit: Optional[int] = None,
+    summary_chars: int = 4000,
+    k1: float = 1.2,
+    b: float = 0.75,
+) -> Dict[str, float]:
+    """Ingest a dump subset into ``index_dir`` and return build statistics"""
+    started = time.time()
+    out = Path(index_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    # Flat (doc_id, tf) pairs per term, as uint32 rather than Python ints
+    postings: Dict[str, array] = defaultdict(lambda: array("I"))
+    doc_lengths = array("I")
+    doc_offsets = array("Q")
+
+    with open(out / "docs.jsonl", "wb") as docs:
+        for doc_id, (title, text) in enumerate(iter_dump(dump_path)):
+            if limit is not None and doc_id >= limit:
+                break
+            # Titles are weighted by repeating them once alongside the body
+            counts = Counter(tokenize(title) * 2 + tokenize(text))
+            for term, tf in counts.items():
+                postings[term].extend((doc_id, tf))
+            doc_lengths.append(sum(counts.values()))
+
+            doc_offsets.append(docs.tell())
+            record = {"title": title, "summary": text[:summary_chars]}
+            docs.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    lexicon = {}
+    position = 0
+    with open(out / "postings.bin", "wb") as f:
+        for term in sorted(postings):
+            pairs = postings.pop(term)
+            lexicon[term] = [position, len(pairs) // 2]
+            pairs.tofile(f)
+            position += len(pairs)
+
+    with open(out / "doclens.bin", "wb") as f:
+        doc_lengths.tofile(f)
+    with open(out / "docs.idx", "wb") as f:
+        doc_offsets.tofile(f)
+    with open(out / "lexicon.json", "w", encoding="utf-8") as f:
+        json.dump(lexicon, f, separators=(",", ":"))
+
+    n_docs = len(doc_lengths)
+    meta = {
+        "documents": n_docs,
+        "terms": len(lexicon),
+        "avgdl": (sum(doc_lengths) / n_docs) if n_docs else 0.0,
+        "k1": k1,
+        "b": b,
+        "byteorder": sys.byteorder,
+    }
+    with open(out / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    meta["seconds"] = round(time.time() - started, 2)
+    return meta
+
+
+# Querying
+
+class WikipediaIndex:
+    """Read side of the snapshot index; postings are memory-mapped, not loaded"""
+
+    def __init__(self, index_dir: str):
+        self.path = Path(index_dir)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("byteorder", sys.byteorder) != sys.byteorder:
+            raise ValueError("Wikipedia index was built on a machine with a different byte order")
+        with open(self.path / "lexicon.json", encoding="utf-8") as f:
+            self.lexicon: Dict[str, List[int]] = json.load(f)
+
+        self.doc_lengths = array("I")
+        with open(self.path / "doclens.bin", "rb") as f:
+            self.doc_lengths.frombytes(f.read())
+        self.doc_offsets = array("Q")
+        with open(self.path / "docs.idx", "rb") as f:
+            self.doc_offsets.frombytes(f.read())
+
+        self._postings_file = open(self.path / "postings.bin", "rb")
+        if os.fstat(self._postings_file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._postings = memoryview(self._mmap).cast("I")
+        else:
+            self._mmap = None
+            self._postings = memoryview(array("I"))
+        # Records are sliced out of a read-only mapping, which unlike a shared
+        # file position is safe for concurrent lookups from tool threads
+        self._docs_file = open(self.path / "docs.jsonl", "rb")
+        size = os.fstat(self._docs_file.fileno()).st_size
+        self._docs = mmap.mmap(self._docs_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def search(self, query: str, k: int = 3) -> List[Tuple[float, int]]:
+        """Return the top ``k`` (score, doc_id) pairs for ``query`` under BM25"""
+        n_docs = self.meta["documents"]
+        avgdl = self.meta["avgdl"] or 1.0
+        k1, b = self.meta["k1"], self.meta["b"]
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            entry = self.lexicon.get(term)
+            if not entry:
+                continue
+            start, df = entry
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            pairs = self._postings[start:start + 2 * df]
+            for i in range(0, len(pairs), 2):
+                doc_id, tf = pairs[i], pairs[i + 1]
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avgdl)
+                scores[doc_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, ((score, doc) for doc, score in scores.items()))
+
+    def document(self, doc_id: int) -> Dict[str, str]:
+        start = self.doc_offsets[doc_id]
+        end = self.doc_offsets[doc_id + 1] if doc_id + 1 < len(self.doc_offsets) else len(self._docs)
+        return json.loads(self._docs[start:end])
+
+    def close(self):
+        self._postings.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._postings_file.close()
+        if isinstance(self._docs, mmap.mmap):
+            self._docs.close()
+        self._docs_file.close()
+
+
+class LocalWikipediaWrapper:
+    """Drop-in replacement for WikipediaAPIWrapper backed by a snapshot index.
+
+    Output matches the live wrapper ("Page: ...\\nSummary: ..."). When
+    ``live_fallback`` is set, queries with no local hits go to the live API.
+    """
+
+    def __init__(
+        self,
+        index_dir: str,
+        top_k_results: int = 3,
+        doc_content_chars_max: int = 4000,
+        live_fallback: bool = False,
+    ):
+        self.index = WikipediaIndex(index_dir)
+        self.top_k_results = top_k_results
+        self.doc_content_chars_max = doc_content_chars_max
+        self.live_fallback = live_fallback
+        self._live = None
+
+    def run(self, query: str) -> str:
+        hits = self.index.search(query, k=self.top_k_results)
+        if not hits:
+            if self.live_fallback:
+                return self._live_wrapper().run(query)
+            return "No good Wikipedia Search Result was found"
+
+        summaries = []
+        for _, doc_id in hits:
+            doc = self.index.document(doc_id)
+            summaries.append(f"Page: {doc['title']}\nSummary: {doc['summary']}")
+        return "\n\n".join(summaries)[: self.doc_content_chars_max]
+
+    def _live_wrapper(self):
+        if self._live is None:
+            from langchain_community.utilities.wikipedia import WikipediaAPIWrapper
+            self._live = WikipediaAPIWrapper(
+                top_k_results=self.top_k_results,
+                doc_content_chars_max=self.doc_content_chars_max,
+            )
+        return self._live
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query an offline Wikipedia snapshot index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Ingest a dump subset into an index directory")
+    build.add_argument("dump", help="MediaWiki XML dump (.xml/.xml.bz2) or JSONL with title/text fields")
+    build.add_argument("index_dir")
+    build.add_argument("--limit", type=int, default=None, help="Maximum number of articles to ingest")
+    build.add_argument("--summary-chars", type=int, default=4000)
+
+    query = sub.add_parser("query", help="Run a query against an index")
+    query.add_argument("index_dir")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        stats = build_index(args.dump, args.index_dir, limit=args.limit, summary_chars=args.summary_chars)
+        print(f"Indexed {stats['documents']} articles, {stats['terms']} terms in {stats['seconds']}s")
+    else:
+        index = WikipediaIndex(args.index_dir)
+        started = time.perf_counter()
+        hits = index.search(args.text, k=args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for score, doc_id in hits:
+            print(f"{score:8.3f}  {index.document(doc_id)['title']}")
+        print(f"{len(hits)} results in {elapsed:.1f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
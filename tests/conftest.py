@@ -0,0 +1,29 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that give up on a slow response (cancelled or timed-out requests) are expected
+        pass
+
+
+@pytest.fixture
+def serve():
+    """Start a local HTTP server for a handler class and return its base URL"""
+    servers = []
+
+    def start(handler) -> str:
+        server = _QuietServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,175 @@
+import concurrent.futures
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import httpx
+import pytest
+
+from langgraph_implementation import metrics
+from langgraph_implementation.llm_gateway import BATCH, INTERACTIVE, GatewayTransport, LLMGateway, parse_duration
+
+
+class OpenAIStub:
+    """Chat-completions endpoint; replies are queued per test, then default to a plain 200"""
+
+    def __init__(self):
+        self.replies = []
+        self.delay = 0.0
+        self.bodies = []
+        self.lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.bodies.append(body)
+                    status, headers, usage = stub.replies.pop(0) if stub.replies else (200, {}, 10)
+                time.sleep(stub.delay)
+                data = json.dumps({
+                    "id": f"chatcmpl-{len(stub.bodies)}",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": usage, "completion_tokens": 0, "total_tokens": usage},
+                }).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def stub():
+    return OpenAIStub()
+
+
+@pytest.fixture
+def gateway():
+    return LLMGateway(requests_per_minute=6000, tokens_per_minute=100_000)
+
+
+@pytest.fixture
+def post(serve, stub, gateway):
+    url = serve(stub.handler()) + "/v1/chat/completions"
+    client = httpx.Client(transport=GatewayTransport(gateway), timeout=10)
+
+    def post(content: str = "hello", **extra) -> httpx.Response:
+        return client.post(url, json={"model": "gpt-4o-mini", "messages": [{"role": "user", "content": content}], **extra})
+
+    yield post
+    client.close()
+
+
+def test_interactive_calls_are_admitted_before_batch_ones():
+    gateway = LLMGateway(requests_per_minute=600, tokens_per_minute=10**9)
+    gateway._requests = 0
+    order = []
+
+    def call(level):
+        gateway.acquire(1, level)
+        order.append(level)
+
+    batch = [threading.Thread(target=call, args=(BATCH,)) for _ in range(3)]
+    for thread in batch:
+        thread.start()
+    time.sleep(0.05)
+    interactive = [threading.Thread(target=call, args=(INTERACTIVE,)) for _ in range(3)]
+    for thread in interactive:
+        thread.start()
+    for thread in batch + interactive:
+        thread.join()
+
+    # Batch callers queued first, but every interactive call goes ahead of them
+    assert order == [INTERACTIVE] * 3 + [BATCH] * 3
+
+
+@pytest.mark.parametrize("status, headers", [
+    (429, {"retry-after-ms": "400"}),
+    (429, {"retry-after": "0.4"}),
+    (429, {"x-ratelimit-reset-requests": "400ms"}),
+    (200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "400ms"}),
+    (200, {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "400ms"}),
+])
+def test_rate_limit_signals_pause_every_caller(post, stub, gateway, status, headers):
+    stub.replies.append((status, headers, 10))
+
+    assert post().status_code == status
+    started = time.monotonic()
+    assert post().status_code == 200
+
+    assert time.monotonic() - started >= 0.35
+
+
+def test_429_is_counted(post, stub):
+    metrics.reset()
+    stub.replies.append((429, {"retry-after-ms": "10"}, 10))
+
+    post()
+
+    assert metrics.snapshot()["counters"]["llm_gateway.rate_limited"] == 1
+
+
+def test_token_bucket_is_corrected_from_reported_usage(post, stub, gateway):
+    stub.replies.append((200, {}, 25))
+
+    # The estimate reserves max_tokens up front; the reply says only 25 were used
+    post(max_tokens=5000)
+
+    assert gateway.tpm - 25 - 1 < gateway._tokens <= gateway.tpm - 25 + 1
+
+
+def test_usage_above_the_estimate_is_charged(post, stub, gateway):
+    stub.replies.append((200, {}, 20_000))
+
+    post()
+
+    assert gateway._tokens < gateway.tpm - 19_000
+
+
+def test_identical_requests_in_flight_are_coalesced(post, stub):
+    stub.delay = 0.3
+    metrics.reset()
+
+    with concurrent.futures.ThreadPoolExecutor(5) as pool:
+        responses = list(pool.map(lambda _: post("same question"), range(5)))
+
+    assert len(stub.bodies) == 1
+    assert {response.json()["id"] for response in responses} == {"chatcmpl-1"}
+    assert metrics.snapshot()["counters"]["llm_gateway.coalesced"] == 4
+
+
+def test_different_requests_are_not_coalesced(post, stub):
+    stub.delay = 0.2
+
+    with concurrent.futures.ThreadPoolExecutor(3) as pool:
+        list(pool.map(lambda i: post(f"question {i}"), range(3)))
+
+    assert len(stub.bodies) == 3
+
+
+def test_streaming_requests_bypass_coalescing(post, stub):
+    stub.delay = 0.2
+
+    with concurrent.futures.ThreadPoolExecutor(3) as pool:
+        responses = list(pool.map(lambda _: post("same question", stream=True), range(3)))
+
+    assert len(stub.bodies) == 3
+    assert all(response.status_code == 200 for response in responses)
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("20ms", 0.02), ("1s", 1.0), ("6m0s", 360.0), ("1.5", 1.5), ("", None), ("soon", None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
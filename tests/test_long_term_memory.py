@@ -0,0 +1,98 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from langgraph_implementation import long_term_memory
+from langgraph_implementation.long_term_memory import VectorMemory, hashing_embedder
+from langgraph_implementation.sandbox_index import SandboxIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / "notes.txt").write_text("solar panels on the roof\n")
+    index = SandboxIndex(root=str(tmp_path))
+    index.refresh()
+    return index
+
+
+class CountingEmbedder:
+    """Hashing embedder that counts the texts it is asked to embed"""
+
+    def __init__(self):
+        self.embed = hashing_embedder()
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return self.embed(texts)
+
+
+def test_embedding_runs_outside_the_lock(index):
+    memory = VectorMemory(index=index)
+    held = []
+
+    def embed(texts):
+        held.append(memory._lock.locked())
+        return hashing_embedder()(texts)
+
+    memory.embed_fn = embed
+    memory.add_turn("How efficient are solar panels?", "About 20%.")
+    memory.sync_sandbox()
+    memory.search("solar")
+
+    assert held == [False, False, False]
+
+
+def test_a_slow_embedding_does_not_block_search(index):
+    memory = VectorMemory(embed_fn=hashing_embedder(), index=index)
+    memory.add_turn("solar panels", "on the roof")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_embed(texts):
+        started.set()
+        release.wait(5)
+        return hashing_embedder()(texts)
+
+    memory.embed_fn = slow_embed
+    writer = threading.Thread(target=memory.add_turn, args=("wind", "turbines"))
+    writer.start()
+    started.wait(5)
+    memory.embed_fn = hashing_embedder()
+
+    assert memory.search("solar panels")
+    release.set()
+    writer.join()
+
+
+def test_sync_follows_the_sandbox_index_without_walking(index, tmp_path, monkeypatch):
+    embedder = CountingEmbedder()
+    memory = VectorMemory(embed_fn=embedder, index=index)
+    assert memory.sync_sandbox() == 1
+
+    def no_walk(self, pattern):
+        raise AssertionError("memory sync walked the sandbox")
+
+    monkeypatch.setattr(Path, "rglob", no_walk)
+    embedder.texts.clear()
+    assert memory.sync_sandbox() == 0
+    assert embedder.texts == []
+
+    (tmp_path / "plan.md").write_text("battery storage plan\n")
+    index.update(tmp_path / "plan.md")
+    assert memory.sync_sandbox() == 1
+    assert embedder.texts == ["battery storage plan"]
+    assert memory.search("battery storage")[0][1]["source"] == "plan.md"
+
+    (tmp_path / "notes.txt").unlink()
+    index.remove(tmp_path / "notes.txt")
+    assert memory.sync_sandbox() == 0
+    assert all(record["source"] != "notes.txt" for _, record in memory.search("solar panels roof", min_score=-1))
+
+
+def test_hashing_is_the_default_without_an_api_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("SIDEKICK_EMBEDDINGS", raising=False)
+    monkeypatch.setattr(long_term_memory, "openai_embedder", lambda: pytest.fail("OpenAI embedder chosen"))
+
+    long_term_memory.default_embedder()
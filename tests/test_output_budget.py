@@ -0,0 +1,54 @@
+import pytest
+
+from langgraph_implementation.output_budget import OutputGovernor
+
+
+@pytest.fixture
+def governor(tmp_path):
+    (tmp_path / "sandbox").mkdir()
+    return OutputGovernor(max_tokens=10, root=tmp_path / "sandbox", spill_root=tmp_path / "tool_outputs", max_session_bytes=300)
+
+
+def reference(preview: str) -> str:
+    return preview.split("'")[1]
+
+
+def test_spills_go_outside_the_sandbox_and_page_back(governor, tmp_path):
+    content = "é" * 100 + "x" * 100
+
+    ref = reference(governor.govern("search", content, session="session-1"))
+
+    assert ref.startswith("tool_outputs/session-1/search_")
+    assert list((tmp_path / "sandbox").iterdir()) == []
+    pages = [governor.read_page(ref, page).split("\n", 1)[1] for page in range(1, 9)]
+    assert "".join(pages) == content
+
+
+def test_small_outputs_are_not_spilled(governor, tmp_path):
+    assert governor.govern("search", "short", session="s") == "short"
+    assert not (tmp_path / "tool_outputs").exists()
+
+
+def test_each_session_keeps_at_most_max_session_bytes(governor, tmp_path):
+    for i in range(5):
+        governor.govern("search", str(i) * 120, session="s")
+
+    sizes = [path.stat().st_size for path in (tmp_path / "tool_outputs" / "s").iterdir()]
+    assert len(sizes) == 2 and sum(sizes) <= 300
+
+
+def test_discard_removes_only_that_session(governor, tmp_path):
+    kept = reference(governor.govern("search", "a" * 100, session="kept"))
+    governor.govern("search", "b" * 100, session="gone")
+
+    governor.discard("gone")
+
+    assert not (tmp_path / "tool_outputs" / "gone").exists()
+    assert governor.read_page(kept).startswith(f"[{kept} page 1 of ")
+
+
+def test_references_cannot_escape_their_store(governor, tmp_path):
+    (tmp_path / "secret.txt").write_text("secret")
+
+    assert governor.read_page("tool_outputs/../../secret.txt").startswith("Error:")
+    assert governor.read_page("../secret.txt").startswith("Error:")
@@ -0,0 +1,35 @@
+import pytest
+
+from langgraph_implementation.page_extract import MAX_LINKS, extract_readable_text
+
+
+def page(paragraphs: int, links: int = MAX_LINKS) -> str:
+    body = "".join(f"<p>Paragraph {i} about solar panel efficiency and storage.</p>" for i in range(paragraphs))
+    anchors = "".join(f'<p><a href="https://example.com/articles/{i}">Further reading number {i}</a></p>' for i in range(links))
+    return f"<html><body><article>{body}{anchors}</article></body></html>"
+
+
+def rendered_body(result) -> str:
+    return result.render().split("\n\n", 1)[1]
+
+
+@pytest.mark.parametrize("paragraphs", [0, 5, 40, 400])
+def test_text_and_links_fit_within_max_chars(paragraphs):
+    result = extract_readable_text(page(paragraphs), max_chars=1500)
+
+    assert len(rendered_body(result)) == result.output_chars <= 1500
+
+
+def test_links_fill_the_budget_left_by_the_text():
+    short = extract_readable_text(page(2), max_chars=6000)
+    long = extract_readable_text(page(85), max_chars=6000)
+
+    assert len(short.links) == MAX_LINKS and not short.truncated
+    assert 0 < len(long.links) < MAX_LINKS and long.truncated
+
+
+def test_text_is_kept_ahead_of_links():
+    result = extract_readable_text(page(400), max_chars=1500)
+
+    assert result.links == []
+    assert result.text.startswith("Paragraph 0")
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+
+from langgraph_implementation.sandbox_index import SandboxIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    (tmp_path / "notes.txt").write_text("solar panels on the roof\nwind turbines offshore\n")
+    index = SandboxIndex(root=str(tmp_path))
+    index.refresh()
+    return index
+
+
+def paths(results):
+    return [result["path"] for result in results]
+
+
+def test_search_uses_the_index_without_walking_the_sandbox(index, monkeypatch):
+    def no_walk(self, pattern):
+        raise AssertionError("search walked the sandbox")
+
+    monkeypatch.setattr(Path, "rglob", no_walk)
+
+    assert paths(index.search("solar")) == ["notes.txt"]
+
+
+def test_writes_through_update_are_searchable_immediately(index, tmp_path):
+    (tmp_path / "plan.md").write_text("battery storage plan\n")
+    index.update(tmp_path / "plan.md")
+
+    assert paths(index.search("battery")) == ["plan.md"]
+
+
+def test_untracked_writes_are_picked_up_once_marked_dirty(index, tmp_path):
+    (tmp_path / "repl.txt").write_text("geothermal output\n")
+
+    assert index.search("geothermal") == []
+    index.mark_dirty()
+    assert paths(index.search("geothermal")) == ["repl.txt"]
+
+
+def test_refresh_bumps_the_version_once_per_changed_file(index, tmp_path):
+    before = index.version
+    (tmp_path / "a.txt").write_text("alpha\n")
+    (tmp_path / "b.txt").write_text("beta\n")
+    (tmp_path / "notes.txt").unlink()
+
+    assert index.refresh() == 3
+    assert index.version == before + 3
+    assert index.refresh() == 0
+    assert index.version == before + 3
@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from langgraph_implementation.async_runtime import run_sync
+from langgraph_implementation.search import MultiQuerySearch, format_results
+from langgraph_implementation import tool_slo
+from langgraph_implementation.tool_slo import ToolLatencySLOs, ToolSLO, get_slos
+
+
+class SerperStub:
+    """Serper-compatible search endpoint; each query's reply is configured per test"""
+
+    def __init__(self):
+        self.replies = {}
+        self.delay = 0.0
+        self.starts = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub.lock:
+                    stub.starts.append(time.monotonic())
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    status, body, delay = stub.replies.get(payload["q"], (200, {"organic": []}, None))
+                    time.sleep(stub.delay if delay is None else delay)
+                    data = json.dumps(body).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def organic(*links):
+    return {"organic": [{"title": f"Title {link}", "link": link, "snippet": f"About {link}"} for link in links]}
+
+
+@pytest.fixture(autouse=True)
+def fresh_slos(monkeypatch):
+    # Latency history from earlier tests would otherwise start hedging requests
+    monkeypatch.setattr(tool_slo, "_slos", ToolLatencySLOs())
+
+
+@pytest.fixture
+def stub():
+    return SerperStub()
+
+
+@pytest.fixture
+def make_searcher(serve, stub):
+    url = serve(stub.handler())
+    searchers = []
+
+    def make(**kwargs) -> MultiQuerySearch:
+        kwargs.setdefault("rate_limit", 0)
+        searcher = MultiQuerySearch(api_key="test", url=url, **kwargs)
+        searchers.append(searcher)
+        return searcher
+
+    yield make
+    for searcher in searchers:
+        run_sync(searcher.aclose())
+
+
+def test_concurrency_is_bounded(make_searcher, stub):
+    stub.delay = 0.2
+    searcher = make_searcher(max_concurrency=2)
+
+    started = time.monotonic()
+    merged = searcher.search([f"query {i}" for i in range(6)])
+    elapsed = time.monotonic() - started
+
+    assert merged["errors"] == []
+    assert len(stub.starts) == 6
+    assert stub.max_active == 2
+    # Three waves of two
+    assert elapsed >= 0.55
+
+
+def test_queries_run_in_parallel_up_to_the_limit(make_searcher, stub):
+    stub.delay = 0.3
+    searcher = make_searcher(max_concurrency=4)
+
+    started = time.monotonic()
+    searcher.search([f"query {i}" for i in range(4)])
+
+    assert stub.max_active == 4
+    assert time.monotonic() - started < 0.9
+
+
+def test_rate_limit_spaces_request_starts(make_searcher, stub):
+    searcher = make_searcher(max_concurrency=5, rate_limit=10)
+
+    searcher.search([f"query {i}" for i in range(5)])
+
+    starts = sorted(stub.starts)
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert len(starts) == 5
+    assert min(gaps) >= 0.08
+    assert starts[-1] - starts[0] >= 0.35
+
+
+def test_results_are_merged_and_deduplicated_by_url(make_searcher, stub):
+    stub.replies["solar efficiency"] = (200, {
+        "answerBox": {"answer": "About 22%"},
+        **organic("https://example.com/solar", "https://a.example/one"),
+    }, None)
+    stub.replies["solar records"] = (200, organic("https://EXAMPLE.com/solar/", "https://b.example/two"), None)
+    searcher = make_searcher()
+
+    merged = searcher.search(["solar efficiency", "  ", "solar records"])
+
+    assert merged["answers"] == [{"query": "solar efficiency", "answer": "About 22%"}]
+    links = [result["link"] for result in merged["results"]]
+    assert len(links) == 3
+    # The URL both queries found comes first, under the first query's spelling
+    assert links[0] == "https://example.com/solar"
+    assert merged["results"][0]["queries"] == ["solar efficiency", "solar records"]
+    assert "(matched: solar efficiency; solar records)" in format_results(merged)
+
+
+def test_failed_query_does_not_lose_the_others(make_searcher, stub):
+    stub.replies["good"] = (200, organic("https://example.com/good"), None)
+    stub.replies["broken"] = (500, {"error": "upstream"}, None)
+    searcher = make_searcher()
+
+    merged = searcher.search(["good", "broken"])
+
+    assert [result["link"] for result in merged["results"]] == ["https://example.com/good"]
+    assert len(merged["errors"]) == 1
+    assert merged["errors"][0].startswith("broken: ")
+    assert merged["partial"] is False
+    assert "Search failed for broken" in format_results(merged)
+
+
+def test_queries_past_the_deadline_are_reported_as_partial(make_searcher, stub, monkeypatch):
+    monkeypatch.setitem(get_slos().slos, "search", ToolSLO(deadline=0.5, hedge=False))
+    stub.replies["fast"] = (200, organic("https://example.com/fast"), 0.0)
+    stub.replies["slow"] = (200, organic("https://example.com/slow"), 3.0)
+    searcher = make_searcher()
+
+    started = time.monotonic()
+    merged = searcher.search(["fast", "slow"])
+
+    assert time.monotonic() - started < 2.0
+    assert merged["partial"] is True
+    assert [result["link"] for result in merged["results"]] == ["https://example.com/fast"]
+    assert merged["errors"] == ["slow: no answer within the 0.5s deadline"]
+
+
+def test_blank_queries_make_no_requests(make_searcher, stub):
+    searcher = make_searcher()
+
+    assert searcher.search(["", "   "]) == {"answers": [], "results": [], "errors": []}
+    assert stub.starts == []
@@ -0,0 +1,55 @@
+import pytest
+from starlette.testclient import TestClient
+
+from langgraph_implementation import resource_manager
+from langgraph_implementation.resource_manager import ResourceManager, SessionBusy
+from langgraph_implementation.server import create_app
+
+
+class FakeSidekick:
+    def __init__(self):
+        self.cleaned_up = False
+
+    def cleanup(self):
+        self.cleaned_up = True
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = ResourceManager(persist=False)
+    monkeypatch.setattr(resource_manager, "_manager", manager)
+    return manager
+
+
+@pytest.fixture
+def client(manager):
+    with TestClient(create_app()) as client:
+        yield client
+
+
+def test_deleting_a_busy_session_is_refused(manager, client):
+    sidekick = FakeSidekick()
+    manager.register("s1", sidekick)
+
+    with manager._active("s1", None):
+        response = client.delete("/sessions/s1")
+
+    assert response.status_code == 409
+    assert not sidekick.cleaned_up
+    assert manager.get("s1") is sidekick
+    assert client.delete("/sessions/s1").status_code == 204
+    assert sidekick.cleaned_up
+    assert manager.get("s1") is None
+
+
+def test_deleting_an_unknown_session_is_404(client):
+    assert client.delete("/sessions/missing").status_code == 404
+
+
+def test_close_refuses_a_session_mid_turn(manager):
+    manager.register("s1", FakeSidekick())
+
+    with manager._active("s1", None):
+        with pytest.raises(SessionBusy):
+            manager.close("s1")
+    manager.close("s1")
@@ -0,0 +1,41 @@
+from pathlib import Path
+
+from langgraph_implementation import sandbox_index
+from langgraph_implementation.personal_assistant import Sidekick
+from langgraph_implementation.sandbox_index import SandboxIndex
+from langgraph_implementation.tool_cache import ToolCallCache
+
+
+def test_sandbox_reads_are_invalidated_by_a_version_bump():
+    version = [0]
+    cache = ToolCallCache(sandbox_version=lambda: version[0])
+    cache.put("read_file", {"file_path": "a.txt"}, "old")
+    cache.put("search", {"queries": ["solar"]}, "results")
+
+    assert cache.get("read_file", {"file_path": "a.txt"}) == "old"
+    version[0] += 1
+    assert cache.get("read_file", {"file_path": "a.txt"}) is None
+    # Tools that do not read the sandbox ignore its version
+    assert cache.get("search", {"queries": ["  solar "]}) == "results"
+    assert cache.stats()["hits"] == 2
+
+
+def test_side_effecting_tools_are_never_cached():
+    cache = ToolCallCache(sandbox_version=lambda: 0)
+    cache.put("write_file", {"file_path": "a.txt", "text": "x"}, "written")
+
+    assert cache.get("write_file", {"file_path": "a.txt", "text": "x"}) is None
+
+
+def test_cache_lookups_do_not_walk_the_sandbox(tmp_path, monkeypatch):
+    index = SandboxIndex(root=str(tmp_path))
+    monkeypatch.setattr(sandbox_index, "_index", index)
+
+    def no_walk(self, pattern):
+        raise AssertionError("cache lookup walked the sandbox")
+
+    monkeypatch.setattr(Path, "rglob", no_walk)
+    cache = ToolCallCache(sandbox_version=Sidekick._sandbox_version)
+    cache.put("read_file", {"file_path": "a.txt"}, "content")
+
+    assert cache.get("read_file", {"file_path": "a.txt"}) == "content"
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from langchain_core.tools import StructuredTool
+
+from langgraph_implementation import tool_slo
+from langgraph_implementation.async_runtime import run_sync
+from langgraph_implementation.search import MultiQuerySearch
+from langgraph_implementation.tool_slo import ToolLatencySLOs, ToolSLO, with_slo
+from langgraph_implementation.web_fetch import PageFetcher
+
+INJECTED_DELAY = 2.0
+
+
+class SlowFirstHandler(BaseHTTPRequestHandler):
+    """Answers the first request after INJECTED_DELAY and every later one at once"""
+
+    lock = threading.Lock()
+    requests = 0
+
+    def _reply(self, content_type: str, body: bytes):
+        with self.lock:
+            type(self).requests += 1
+            first = type(self).requests == 1
+        if first:
+            time.sleep(INJECTED_DELAY)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        organic = [{"title": "Solar", "link": "https://example.com/solar", "snippet": "Efficiency"}]
+        self._reply("application/json", json.dumps({"organic": organic}).encode())
+
+    def do_GET(self):
+        self._reply("text/plain", b"plain page text")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_first(serve):
+    handler = type("Handler", (SlowFirstHandler,), {"requests": 0, "lock": threading.Lock()})
+    return handler, serve(handler)
+
+
+@pytest.fixture
+def slos(monkeypatch):
+    slos = ToolLatencySLOs(hedge_budget=1.0)
+    monkeypatch.setattr(tool_slo, "_slos", slos)
+    return slos
+
+
+def warm_up(slos: ToolLatencySLOs, tool: str, latency: float = 0.01, samples: int = None):
+    for _ in range(slos.min_samples if samples is None else samples):
+        slos.tracker(tool).record(latency)
+
+
+def test_slow_search_is_hedged_and_the_duplicate_wins(slos, slow_first):
+    handler, url = slow_first
+    warm_up(slos, "search")
+    searcher = MultiQuerySearch(api_key="test", url=url, rate_limit=0)
+
+    started = time.monotonic()
+    merged = searcher.search(["solar efficiency"])
+    elapsed = time.monotonic() - started
+    run_sync(searcher.aclose())
+
+    assert [result["link"] for result in merged["results"]] == ["https://example.com/solar"]
+    assert elapsed < INJECTED_DELAY / 2
+    assert handler.requests == 2
+    stats = slos.stats()["search"]
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+def test_slow_page_fetch_is_hedged_and_the_duplicate_wins(slos, slow_first):
+    handler, url = slow_first
+    warm_up(slos, "fetch_page")
+    fetcher = PageFetcher(timeout=5)
+
+    started = time.monotonic()
+    result = run_sync(fetcher.fetch(f"{url}/page"))
+    elapsed = time.monotonic() - started
+    run_sync(fetcher.aclose())
+
+    assert result.extraction.text == "plain page text"
+    assert elapsed < INJECTED_DELAY / 2
+    assert slos.stats()["fetch_page"]["hedge_wins"] == 1
+
+
+def test_no_hedging_before_min_samples(slos, slow_first):
+    handler, url = slow_first
+    warm_up(slos, "search", samples=slos.min_samples - 1)
+    searcher = MultiQuerySearch(api_key="test", url=url, rate_limit=0)
+
+    started = time.monotonic()
+    searcher.search(["solar efficiency"])
+    elapsed = time.monotonic() - started
+    run_sync(searcher.aclose())
+
+    assert elapsed >= INJECTED_DELAY
+    assert handler.requests == 1
+    assert slos.stats()["search"]["hedges"] == 0
+
+
+def test_losing_attempt_is_cancelled(slos):
+    warm_up(slos, "search")
+    attempts = []
+
+    async def attempt():
+        index = len(attempts)
+        attempts.append("running")
+        try:
+            await asyncio.sleep(INJECTED_DELAY if index == 0 else 0)
+            attempts[index] = "finished"
+            return index
+        except asyncio.CancelledError:
+            attempts[index] = "cancelled"
+            raise
+
+    async def run():
+        winner = await slos.hedged("search", attempt)
+        await asyncio.sleep(0)
+        return winner
+
+    assert asyncio.run(run()) == 1
+    assert attempts == ["cancelled", "finished"]
+    # The loser's time so far is kept, so hedging does not hide the tail
+    assert len(slos.tracker("search")) == slos.min_samples + 2
+
+
+def test_hedges_are_capped_by_the_budget():
+    # A window large enough that the slow calls below do not move p95
+    slos = ToolLatencySLOs(slos={"search": ToolSLO(deadline=10, min_hedge_delay=0.01)}, hedge_budget=0.1, window=1000)
+    warm_up(slos, "search", latency=0.001, samples=1000)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+
+    async def run():
+        for _ in range(20):
+            await slos.hedged("search", slow)
+
+    asyncio.run(run())
+
+    stats = slos.stats()["search"]
+    assert stats["calls"] == 20
+    # Every call ran past p95, but only 10% of them may be duplicated
+    assert stats["hedges"] == 2
+
+
+def test_blocking_tool_past_its_deadline_returns_a_partial_result(monkeypatch):
+    slos = ToolLatencySLOs(slos={"wikipedia": ToolSLO(deadline=0.3, hedge=False)})
+    monkeypatch.setattr(tool_slo, "_slos", slos)
+
+    def lookup(query: str) -> str:
+        time.sleep(1.0)
+        return "Page: Solar power"
+
+    tool = with_slo(StructuredTool.from_function(func=lookup, name="wikipedia", description="Look up a page"))
+
+    started = time.monotonic()
+    result = tool.invoke({"query": "solar"})
+
+    assert time.monotonic() - started < 0.9
+    assert result.startswith("wikipedia gave no answer within 0.3s")
+    assert slos.stats()["wikipedia"]["deadline_misses"] == 1
+
+
+def test_tools_without_an_slo_are_not_wrapped(monkeypatch):
+    monkeypatch.setattr(tool_slo, "_slos", ToolLatencySLOs())
+    tool = StructuredTool.from_function(func=lambda query: query, name="Python_REPL", description="Run code")
+
+    assert with_slo(tool) is tool
+
+
+def test_slos_are_configured_from_the_environment(monkeypatch):
+    monkeypatch.setenv("SIDEKICK_SLO_SEARCH_DEADLINE", "3")
+    monkeypatch.setenv("SIDEKICK_SLO_SEARCH_HEDGE", "false")
+    monkeypatch.setenv("SIDEKICK_SLO_FETCH_PAGE_PERCENTILE", "90")
+    monkeypatch.setenv("SIDEKICK_HEDGE_BUDGET", "0.25")
+
+    slos = ToolLatencySLOs.from_env()
+
+    assert slos.deadline("search") == 3.0
+    assert slos.slo("search").hedge is False
+    assert slos.slo("fetch_page").percentile == 90.0
+    assert slos.slo("wikipedia") == tool_slo.DEFAULT_SLOS["wikipedia"]
+    assert slos.hedge_budget == 0.25
+    warm_up(slos, "search")
+    assert slos.hedge_delay("search") is None
@@ -0,0 +1,227 @@
+import json
+import socket
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from langgraph_implementation import metrics, tool_slo
+from langgraph_implementation.async_runtime import run_sync
+from langgraph_implementation.tool_slo import ToolLatencySLOs, ToolSLO, get_slos
+from langgraph_implementation.web_fetch import PageFetcher, needs_javascript
+
+PARAGRAPH = "Solar panel efficiency has climbed steadily as manufacturers move to new cell designs. "
+
+ARTICLE = f"""<html><head><title>Solar</title></head><body>
+<nav><a href="/">Home</a> <a href="/news">News</a></nav>
+<article><h1>Solar efficiency</h1>{''.join(f'<p>{PARAGRAPH}</p>' for _ in range(5))}</article>
+<footer>Copyright</footer>
+</body></html>"""
+
+APP_SHELL = """<html><head><title>App</title></head><body>
+<div id="root"></div>
+<script src="/static/bundle.js"></script>
+</body></html>"""
+
+RENDERED_APP = f"<html><body><main>{''.join(f'<p>{PARAGRAPH}</p>' for _ in range(5))}</main></body></html>"
+
+PAGES = {
+    "/article": (200, "text/html; charset=utf-8", ARTICLE),
+    "/app": (200, "text/html", APP_SHELL),
+    "/notes.txt": (200, "text/plain", "line one\nline two\n" * 10),
+    "/data.json": (200, "application/json", json.dumps({"efficiency": 0.22, "unit": "fraction"})),
+    "/missing": (404, "text/html", "<html><body><h1>Not found</h1></body></html>"),
+}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(3)
+            status, content_type, body = PAGES["/article"]
+        else:
+            status, content_type, body = PAGES.get(self.path, PAGES["/missing"])
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePage:
+    def __init__(self, html: str, fail: bool):
+        self.html = html
+        self.fail = fail
+        self.url = ""
+
+    async def goto(self, url, wait_until=None, timeout=None):
+        if self.fail:
+            raise RuntimeError("browser crashed")
+        self.url = url
+        return type("Response", (), {"status": 200})()
+
+    async def content(self):
+        return self.html
+
+
+class FakeBrowser:
+    """Just enough of a Playwright browser for the fetcher's fallback"""
+
+    def __init__(self, html: str = RENDERED_APP, fail: bool = False):
+        self.page = FakePage(html, fail)
+        self.contexts = []
+        self.loads = 0
+
+    async def new_context(self):
+        browser = self
+
+        class Context:
+            async def new_page(self):
+                browser.loads += 1
+                return browser.page
+
+        return Context()
+
+
+@pytest.fixture(autouse=True)
+def fresh_slos(monkeypatch):
+    # Latency history from earlier tests would otherwise start hedging requests
+    monkeypatch.setattr(tool_slo, "_slos", ToolLatencySLOs())
+
+
+@pytest.fixture
+def site(serve):
+    return serve(PageHandler)
+
+
+@pytest.fixture
+def fetch():
+    fetcher = PageFetcher(timeout=5)
+
+    def fetch(url, **kwargs):
+        return run_sync(fetcher.fetch(url, **kwargs))
+
+    yield fetch
+    run_sync(fetcher.aclose())
+
+
+def test_static_html_is_extracted_over_http(site, fetch):
+    browser = FakeBrowser()
+
+    result = fetch(f"{site}/article", browser=browser)
+
+    assert result.path == "http"
+    assert result.status == 200
+    assert result.reason is None and result.error is None
+    assert PARAGRAPH.strip() in result.extraction.text
+    assert "Copyright" not in result.extraction.text
+    # Static pages never start the browser
+    assert browser.loads == 0
+    assert result.render().startswith(f"[Fetched {site}/article via http in ")
+
+
+def test_app_shell_falls_back_to_the_browser(site, fetch):
+    browser = FakeBrowser()
+
+    result = fetch(f"{site}/app", browser=browser)
+
+    assert browser.loads == 1
+    assert result.path == "browser"
+    assert result.reason.startswith("http path: empty client-side app shell")
+    assert PARAGRAPH.strip() in result.extraction.text
+
+
+def test_app_shell_without_a_browser_keeps_the_http_result(site, fetch):
+    result = fetch(f"{site}/app")
+
+    assert result.path == "http"
+    assert result.reason == "empty client-side app shell; no browser available, content may be incomplete"
+
+
+def test_failed_browser_fallback_keeps_the_http_extraction(site, fetch):
+    result = fetch(f"{site}/app", browser=FakeBrowser(fail=True))
+
+    assert result.path == "http"
+    assert result.error is None
+    assert result.extraction is not None
+    assert "browser rendering failed (browser crashed)" in result.reason
+    assert result.partial is False
+
+
+@pytest.mark.parametrize("html, status, reason", [
+    (APP_SHELL, 200, "empty client-side app shell"),
+    ("<html><body><noscript>You need to enable JavaScript to run this app.</noscript></body></html>", 200,
+     "page asks for JavaScript"),
+    ("<html><body><p>Hi</p><script>" + "var x = 1;" * 500 + "</script></body></html>", 200,
+     "mostly scripts, little text"),
+    ("<html><title>Just a moment...</title></html>", 503, "bot challenge page"),
+    (ARTICLE, 200, None),
+])
+def test_needs_javascript(html, status, reason):
+    extracted = 10 if reason else 2000
+    assert needs_javascript(html, extracted, status) == reason
+
+
+def test_app_shell_with_enough_text_is_not_flagged():
+    assert needs_javascript(APP_SHELL, 500) is None
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/notes.txt", "line one\nline two\n"),
+    ("/data.json", '{"efficiency": 0.22'),
+])
+def test_non_html_content_is_returned_as_is(site, fetch, path, expected):
+    browser = FakeBrowser()
+
+    result = fetch(f"{site}{path}", browser=browser)
+
+    assert result.path == "http"
+    assert result.reason is None
+    assert result.extraction.text.startswith(expected)
+    assert browser.loads == 0
+
+
+def test_non_html_content_is_truncated_to_max_chars(site, fetch):
+    result = fetch(f"{site}/notes.txt", max_chars=20)
+
+    assert result.extraction.text == ("line one\nline two\n" * 2)[:20]
+    assert result.extraction.truncated is True
+
+
+def test_http_error_status_is_reported(site, fetch):
+    result = fetch(f"{site}/missing")
+
+    assert result.status == 404
+    assert result.error is None
+    assert "[Fetched" in result.render() and "status 404" in result.render()
+
+
+def test_connection_error_is_returned_not_raised(fetch):
+    # Nothing listens on a port that was just released
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    metrics.reset()
+
+    result = fetch(f"http://127.0.0.1:{port}/page")
+
+    assert result.path == "http"
+    assert result.error
+    assert result.extraction is None
+    assert result.render().endswith(f"Error: {result.error}")
+    assert metrics.snapshot()["counters"]["fetch.errors"] == 1
+
+
+def test_fetch_past_the_deadline_is_partial(site, fetch, monkeypatch):
+    monkeypatch.setitem(get_slos().slos, "fetch_page", ToolSLO(deadline=0.5, hedge=False))
+
+    started = time.monotonic()
+    result = fetch(f"{site}/slow", browser=FakeBrowser())
+
+    assert time.monotonic() - started < 2.0
+    assert result.partial is True
+    assert result.error == "no answer within the 0.5s deadline"